@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Benchmark of the startup time of short-lived Python processes using PyChemia.
+
+Each statement is executed on a new interpreter several times, the time reported is the median wall time of the whole
+process and the number of modules is the size of sys.modules at the end. The first line is the interpreter alone and
+the last one imports all the subpackages, as 'import pychemia' used to do.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 10] [--statement 'import pychemia.code.vasp']
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+STATEMENTS = ['pass',
+              'import numpy',
+              'import pychemia',
+              'from pychemia import Structure',
+              'from pychemia.utils.periodic import covalent_radius',
+              'from pychemia.crystal import CrystalSymmetry',
+              'from pychemia.code.vasp import VaspXML',
+              'from pychemia.population import RelaxStructures',
+              'import pychemia; [getattr(pychemia, x) for x in dir(pychemia)]; '
+              '[getattr(pychemia.code, x) for x in dir(pychemia.code)]']
+
+
+def run(statement, repeat):
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = root + os.pathsep + env.get('PYTHONPATH', '')
+    code = statement + '\nimport sys\nprint(len(sys.modules))'
+    times = []
+    nmodules = 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.check_output([sys.executable, '-c', code], env=env, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+        nmodules = int(output.split()[-1])
+    return np.median(times), nmodules
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='Number of processes for each statement')
+    parser.add_argument('--statement', action='append', help='Statements to measure instead of the default ones')
+    args = parser.parse_args(argv)
+
+    statements = STATEMENTS if args.statement is None else args.statement
+    print('%10s %8s   %s' % ('Time [ms]', 'Modules', 'Statement'))
+    for statement in statements:
+        elapsed, nmodules = run(statement, args.repeat)
+        label = statement if len(statement) < 60 else statement[:57] + '...'
+        print('%10.1f %8d   %s' % (1000 * elapsed, nmodules, label))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
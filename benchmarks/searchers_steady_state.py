@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+"""
+Benchmark of the synchronous (generational) searchers against their steady-state versions.
+
+The candidates are points for one of the test functions in pychemia.utils.metaheuristics, their evaluation is
+simulated by a pool of workers where each evaluation takes a random time (log-normal distribution), so some
+evaluations are much slower than the others, like the relaxations of structures.
+The searchers receive the completions from the simulated pool as events, the time reported is the simulated time
+when the target value is reached (or the search stops) and the utilization is the fraction of that time the
+workers were busy.
+
+Usage:
+    python benchmarks/searchers_steady_state.py [--function Sphere] [--ndim 3] [--workers 16] [--repeat 5]
+"""
+
+import argparse
+import contextlib
+import heapq
+import io
+import os
+import random
+import sys
+
+import numpy as np
+
+# The benchmark runs the PyChemia of this source tree
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pychemia.population import RealFunction
+from pychemia.searcher import FireFly, GeneticAlgorithm, HarmonySearch, ParticleSwarm, PollingEvents
+from pychemia.utils import metaheuristics
+
+
+class SimulatedPopulation(RealFunction):
+    """
+    RealFunction where each candidate is considered evaluated only when a simulated worker finishes with it
+    """
+
+    def __init__(self, function, ndim, limits):
+        RealFunction.__init__(self, function, ndim, limits)
+        self.finished = set()
+        self.scheduled = set()
+        self.waiting = []
+
+    def evaluate_entry(self, ident):
+        RealFunction.evaluate_entry(self, ident)
+        if ident not in self.scheduled:
+            self.scheduled.add(ident)
+            self.waiting.append(ident)
+
+    def is_evaluated(self, i):
+        return i in self.finished
+
+
+class SimulatedEvaluator(PollingEvents):
+    """
+    Pool of workers evaluating the active candidates of a SimulatedPopulation in order of creation
+    """
+
+    def __init__(self, population, nworkers, sigma=0.75, seed=0):
+        self.population = population
+        self.nworkers = nworkers
+        self.sigma = sigma
+        self.rng = np.random.RandomState(seed)
+        self.clock = 0.0
+        self.busy_time = 0.0
+        self.running = []
+
+    def dispatch(self):
+        actives = set(self.population.actives)
+        waiting = []
+        for ident in self.population.waiting:
+            if len(self.running) < self.nworkers and ident in actives:
+                duration = self.rng.lognormal(0.0, self.sigma)
+                self.busy_time += duration
+                heapq.heappush(self.running, (self.clock + duration, ident))
+            else:
+                waiting.append(ident)
+        self.population.waiting = waiting
+
+    def wait(self, timeout):
+        self.dispatch()
+        if len(self.running) == 0:
+            raise RuntimeError('Searcher waiting for candidates that are not active')
+        self.clock, ident = heapq.heappop(self.running)
+        self.population.finished.add(ident)
+        return [ident]
+
+    @property
+    def utilization(self):
+        # Evaluations still running count only up to the current time
+        pending = sum([finish - self.clock for finish, ident in self.running])
+        return (self.busy_time - pending) / (self.nworkers * self.clock)
+
+
+def run(searcher_class, function, ndim, nworkers, target, steady_state, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    popu = SimulatedPopulation(function.function, ndim, function.domain)
+    searcher = searcher_class(popu, generation_size=nworkers, stabilization_limit=10)
+    searcher.target_value = target
+    searcher.events = SimulatedEvaluator(popu, nworkers, seed=seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if steady_state:
+            searcher.run_steady_state(max_evaluations=100 * nworkers)
+        else:
+            searcher.run()
+    return (searcher.events.clock, len(popu.finished), popu.value(popu.best_candidate),
+            searcher.events.utilization)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--function', default='Sphere', help='Test function from pychemia.utils.metaheuristics')
+    parser.add_argument('--ndim', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=16, help='Number of workers and generation size')
+    parser.add_argument('--target', type=float, default=1E-3)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    function = getattr(metaheuristics, args.function)()
+    target = function.fminimum(args.ndim) + args.target
+    print('Function: %s  ndim: %d  workers: %d  target: %.3e' % (args.function, args.ndim, args.workers, target))
+    print('%-18s %-12s %10s %10s %12s %12s' % ('Searcher', 'Mode', 'Time', 'Evals', 'Best', 'Utilization'))
+    for searcher_class in [HarmonySearch, ParticleSwarm, GeneticAlgorithm, FireFly]:
+        for steady_state in [False, True]:
+            results = np.array([run(searcher_class, function, args.ndim, args.workers, target, steady_state, seed)
+                                for seed in range(args.repeat)])
+            mode = 'steady-state' if steady_state else 'synchronous'
+            print('%-18s %-12s %10.1f %10.0f %12.3e %11.1f%%' % (searcher_class.__name__, mode,
+                                                                  np.median(results[:, 0]),
+                                                                  np.median(results[:, 1]),
+                                                                  np.median(results[:, 2]),
+                                                                  100 * np.median(results[:, 3])))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
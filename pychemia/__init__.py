@@ -9,6 +9,7 @@ composition, and perform a structural search using several metaheuristic global
 import sys
 import logging
 import importlib
+import importlib.util
 
 from pychemia.version import version as __version__
 from pychemia.version import author as __author__
@@ -17,93 +18,94 @@ from pychemia.version import email as __email__
 from pychemia.version import status as __status__
 from pychemia.version import date as __date__
 
-# Mandatory dependencies
-########################
-
-# These check have more sense during develompent
-# Installing with pip will fulfill these dependencies
-
-spec = importlib.util.find_spec("scipy")
-HAS_SCIPY = spec is not None
-
-# Versions 1.8.x or before used to be pyspglib
-# Removed on (2019-12-11)
-# try:
-#     try:
-#         import spglib as spg
-#     except ImportError:
-#         from pyspglib import spglib as spg
-#     HAS_SPGLIB = True
-# except ImportError:
-#     HAS_SPGLIB = False
-
-spec = importlib.util.find_spec("spglib")
-HAS_SPGLIB = spec is not None
-
-spec = importlib.util.find_spec("matplotlib")
-HAS_MATPLOTLIB = spec is not None
-
-if HAS_MATPLOTLIB and 'matplotlib' not in sys.modules:
-    import matplotlib
-
-    matplotlib.use('agg')
-
-spec = importlib.util.find_spec("matplotlib")
-HAS_MATPLOTLIB = spec is not None
-
-spec = importlib.util.find_spec("psutil")
-HAS_PSUTIL = spec is not None
+pcm_log = logging.getLogger(__name__)
+pcm_log.addHandler(logging.NullHandler())
 
-# Optional Dependencies
-#######################
+# Dependencies
+##############
+# The flags HAS_* are evaluated the first time they are used, looking for the package without importing it.
+# Mandatory dependencies: scipy, spglib, matplotlib and psutil, installing with pip will fulfill them.
+# Versions 1.8.x or before of spglib used to be pyspglib, removed on (2019-12-11)
+
+_dependencies = {'HAS_SCIPY': 'scipy',
+                 'HAS_SPGLIB': 'spglib',
+                 'HAS_MATPLOTLIB': 'matplotlib',
+                 'HAS_PSUTIL': 'psutil',
+                 'HAS_MAYAVI': 'mayavi',
+                 'HAS_VTK': 'vtk',
+                 'HAS_PYHULL': 'pyhull',
+                 'HAS_NETWORKX': 'networkx',
+                 'HAS_PYMONGO': 'pymongo',
+                 'HAS_GRIDFS': 'gridfs',
+                 'HAS_ASE': 'ase',
+                 'HAS_PYMATGEN': 'pymatgen',
+                 'HAS_H5PY': 'h5py'}
+
+
+def _has_dependency(flag):
+    ret = importlib.util.find_spec(_dependencies[flag]) is not None
+    if ret and flag == 'HAS_PYMONGO':
+        import pymongo
+        ret = pymongo.version_tuple[0] >= 3
+    return ret
+
+
+def use_agg_backend():
+    """
+    Selects the non-interactive backend 'agg' for matplotlib. The modules that plot call it before importing
+    matplotlib, the backend is only selected when matplotlib was not imported before, so the backend chosen by
+    the user is kept.
+    """
+    if 'matplotlib' not in sys.modules:
+        import matplotlib
+        matplotlib.use('agg')
 
-spec = importlib.util.find_spec("mayavi")
-HAS_MAYAVI = spec is not None
 
-spec = importlib.util.find_spec("vtk")
-HAS_VTK = spec is not None
+def lazy_import(name, submodules, attributes=None):
+    """
+    Creates the functions __getattr__ and __dir__ for a package that imports its submodules only when they are used
+    for the first time. See PEP 562.
 
-spec = importlib.util.find_spec("pyhull")
-HAS_PYHULL = spec is not None
+    :param name: (str) Name of the package, usually __name__
+    :param submodules: (list) Submodules accessible as attributes of the package
+    :param attributes: (dict) Objects accessible from the package, the values are the submodules defining them
+    :return: (tuple) Functions __getattr__ and __dir__ for the package
+    """
+    submodules = set(submodules)
+    attributes = dict(attributes or {})
 
-spec = importlib.util.find_spec("networkx")
-HAS_NETWORKX = spec is not None
+    def __getattr__(attr):
+        if attr in submodules:
+            return importlib.import_module(name + '.' + attr)
+        if attr in attributes:
+            value = getattr(importlib.import_module(name + '.' + attributes[attr]), attr)
+            # Stored on the package, so the next access does not call __getattr__
+            setattr(sys.modules[name], attr, value)
+            return value
+        raise AttributeError("module '%s' has no attribute '%s'" % (name, attr))
 
-spec = importlib.util.find_spec("pymongo")
-HAS_PYMONGO = spec is not None
+    def __dir__():
+        return sorted(set(vars(sys.modules[name])) | submodules | set(attributes))
 
-if HAS_PYMONGO:
-    import pymongo
+    return __getattr__, __dir__
 
-    if pymongo.version_tuple[0] < 3:
-        HAS_PYMONGO = False
-    else:
-        HAS_PYMONGO = True
 
-spec = importlib.util.find_spec("gridfs")
-HAS_GRIDFS = spec is not None
+_getattr, _dir = lazy_import(__name__,
+                             ['analysis', 'core', 'db', 'crystal', 'io', 'runner', 'searcher', 'utils', 'web', 'code',
+                              'population', 'visual', 'evaluator'],
+                             {'Structure': 'core', 'Composition': 'core', 'Element': 'core',
+                              'structure_from_file': 'core.from_file'})
 
-spec = importlib.util.find_spec("ase")
-HAS_ASE = spec is not None
 
-spec = importlib.util.find_spec("pymatgen")
-HAS_PYMATGEN = spec is not None
+def __getattr__(attr):
+    if attr in _dependencies:
+        globals()[attr] = _has_dependency(attr)
+        return globals()[attr]
+    return _getattr(attr)
 
-pcm_log = logging.getLogger(__name__)
-pcm_log.addHandler(logging.NullHandler())
 
-from .core import Structure, Composition, Element
-from . import analysis
-from . import db
-from . import crystal
-from . import io
-from . import runner
-from . import searcher
-from . import utils
-from . import web
-from . import code
-from . import population
-from .core.from_file import structure_from_file
+def __dir__():
+    return sorted(set(_dir()) | set(_dependencies))
 
 
 def info():
@@ -122,7 +124,7 @@ def info():
     print('Python version=' + sys.version + '\n')
 
     for modui in ['numpy', 'scipy', 'spglib', 'matplotlib', 'pymongo', 'psutil',
-                  'nose', 'coverage', 'pyhull', 'pymatgen',
+                  'nose', 'coverage', 'pyhull', 'pymatgen', 'h5py',
                   'networkx', 'ase', 'mayavi', 'qmpy', ]:
         if modui == 'numpy':
             print("Mandatory dependencies:")
@@ -8,7 +8,9 @@ methods applied for structural search.
 
 from .analysis import StructureAnalysis
 from .changer import StructureChanger
-from .matching import StructureMatch
+from .matching import StructureMatch, match_atoms_many
+from .bonds import BondNetwork
 from .cluster import ClusterAnalysis, ClusterMatch
+from .fingerprint import FingerprintCache, structure_hash
 from .surface import rotate_along_indices
 from . import splitting
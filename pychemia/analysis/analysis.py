@@ -4,11 +4,12 @@ import sys
 
 import numpy as np
 import numpy.linalg
-import functools
 
 from pychemia import Structure, pcm_log
-from pychemia.utils.mathematics import integral_gaussian
-from pychemia.utils.periodic import atomic_number, covalent_radius, valence, atomic_symbol
+from pychemia.utils.mathematics import gaussian_histogram
+from pychemia.utils.periodic import atomic_number, covalent_radius, valence, atomic_symbol, covalent_radii_array, \
+    valences_array
+from .bonds import BondNetwork
 from collections import OrderedDict
 
 
@@ -41,6 +42,7 @@ class StructureAnalysis:
         self._distances = None
         self._all_distances = None
         self._pairs = None
+        self._pair_arrays = None
         self._supercell = supercell
         self._radius = radius
         # log.debug('Supercell : ' + str(self._supercell))
@@ -56,6 +58,7 @@ class StructureAnalysis:
         if value != self._radius:
             self._distances = None
             self._pairs = None
+            self._pair_arrays = None
             self._all_distances = None
         self._radius = value
 
@@ -73,38 +76,29 @@ class StructureAnalysis:
 
             if self.structure.is_periodic:
                 pcm_log.debug('Computing distances from scratch...')
+                natom = self.structure.natom
+                lattice = self.structure.lattice
+                limits = lattice.limits_for_distance2
+                different_atoms = np.array(list(itertools.combinations(range(natom), 2)), dtype=int).reshape((-1, 2))
+                same_atom = np.repeat(np.arange(natom), 2).reshape((-1, 2))
+                # The distances between one atom and its own images are restricted to the default radius of
+                # Lattice.distance2
+                batches = [lattice.pair_distances(self.structure.reduced, radius=self.radius, pairs=different_atoms,
+                                                  limits=limits),
+                           lattice.pair_distances(self.structure.reduced, radius=20, pairs=same_atom, limits=limits)]
                 pairs_dict = {}
                 distances_list = []
-                index = 0
-                for i, j in itertools.combinations(range(self.structure.natom), 2):
-                    if index % 100 == 0:
-                        pcm_log.debug('Computing distance between atoms %d and %d' % (i, j))
-                    ret = self.structure.lattice.distance2(self.structure.reduced[i], self.structure.reduced[j],
-                                                           radius=self.radius)
-                    for k in ret:
-                        if str(i) not in pairs_dict:
-                            pairs_dict[str(i)] = [index]
-                        else:
-                            pairs_dict[str(i)].append(index)
-                        if str(j) not in pairs_dict:
-                            pairs_dict[str(j)] = [index]
-                        else:
-                            pairs_dict[str(j)].append(index)
-                        ret[k]['pair'] = (i, j)
-                        distances_list.append(ret[k])
-                        index += 1
-                for i in range(self.structure.natom):
-                    ret = self.structure.lattice.distance2(self.structure.reduced[i], self.structure.reduced[i])
-                    for k in ret:
-                        if str(i) not in pairs_dict:
-                            pairs_dict[str(i)] = [index]
-                        else:
-                            pairs_dict[str(i)].append(index)
-                        ret[k]['pair'] = (i, i)
-                        distances_list.append(ret[k])
-                        index += 1
+                for batch in batches:
+                    for i, j, vector, distance in zip(batch['i'], batch['j'], batch['vector'], batch['distance']):
+                        index = len(distances_list)
+                        pairs_dict.setdefault(str(i), []).append(index)
+                        if j != i:
+                            pairs_dict.setdefault(str(j), []).append(index)
+                        distances_list.append({'distance': float(distance), 'image': vector, 'pair': (int(i), int(j))})
                 self._pairs = pairs_dict
                 self._distances = distances_list
+                self._pair_arrays = tuple(np.concatenate([batch[x] for batch in batches])
+                                          for x in ['i', 'j', 'distance'])
             else:
                 dm = self.structure.distance_matrix()
                 dm += np.eye(len(dm)) * max(dm.flatten())
@@ -140,21 +134,35 @@ class StructureAnalysis:
 
     def all_distances_by_species(self):
 
-        all_distances = self.all_distances()
         ret = OrderedDict()
 
         atom_numbers = atomic_number(self.structure.species)
         a = list(itertools.combinations_with_replacement(atom_numbers, 2))
         keys = sorted([tuple(sorted(list(x))) for x in a])
+
+        if self.structure.is_periodic:
+            # All the distances inside the sphere computed at once, the limits are the same used by
+            # Lattice.distances_in_sphere
+            lattice = self.structure.lattice
+            limits = np.ceil(self.radius * np.array(lattice.reciprocal().lengths)).astype(int)
+            ret_pairs = lattice.pair_distances(self.structure.reduced, radius=self.radius, limits=limits)
+            numbers = np.array(atomic_number(self.structure.symbols)).reshape(-1)
+            number_i = numbers[ret_pairs['i']]
+            number_j = numbers[ret_pairs['j']]
+            low = np.minimum(number_i, number_j)
+            high = np.maximum(number_i, number_j)
+            for key in keys:
+                ret[key] = np.sort(ret_pairs['distance'][(low == key[0]) & (high == key[1])])
+            return ret
+
+        all_distances = self.all_distances()
         for key in keys:
             ret[key] = []
 
+        symbols = self.structure.symbols
         for ipair in all_distances:
-            key = tuple(sorted(atomic_number([self.structure.symbols[ipair[0]], self.structure.symbols[ipair[1]]])))
-            if self.structure.is_periodic:
-                ret[key] = np.concatenate((ret[key], all_distances[ipair]['distance']))
-            else:
-                ret[key].append(all_distances[ipair])
+            key = tuple(sorted(atomic_number([symbols[ipair[0]], symbols[ipair[1]]])))
+            ret[key].append(all_distances[ipair])
 
         # Sorting arrays
         for key in ret:
@@ -169,52 +177,53 @@ class StructureAnalysis:
         nbins = int((self.radius + 5 * delta) / delta)
         discrete_rdf_x = np.arange(0, nbins * delta, delta)
         for spec_pair in dist_spec:
-            discrete_rdf[spec_pair] = np.zeros(nbins)
             positive_distances = dist_spec[spec_pair][dist_spec[spec_pair] > 0]
-            # log.debug('Pair %s' % str(spec_pair))
-            for Rij in positive_distances:
-                # Integrating for bin from - 8*sigma to +8*sigma centered on Rij
-                # Values outside this range are negligible
-                imin = int(max(0, (Rij - 8 * sigma) / delta))
-                imax = int(min(len(discrete_rdf_x), (Rij + 8 * sigma) / delta))
-                # log.debug('Computing for distance %7.3f for indices between %d and %d' % (Rij, imin, imax))
-                for i in range(imin, imax):
-                    x = discrete_rdf_x[i]
-                    if not integrated:
-                        discrete_rdf[spec_pair][i] += np.exp(-((x - Rij) ** 2) / (2 * sigma * sigma)) / (
-                            4 * math.pi * Rij * Rij)
-                    else:
-                        discrete_rdf[spec_pair][i] += integral_gaussian(x, x + delta, Rij, sigma) / (
-                            4 * math.pi * Rij * Rij)
+            # Gaussians are considered from -8*sigma to +8*sigma centered on each distance
+            # Values outside this range are negligible
+            discrete_rdf[spec_pair] = gaussian_histogram(positive_distances, delta=delta, sigma=sigma, nbins=nbins,
+                                                         weights=1.0 / (4 * math.pi * positive_distances ** 2),
+                                                         integrated=integrated)
 
         return discrete_rdf_x, discrete_rdf
 
-    def fp_oganov(self, delta=0.01, sigma=0.01):
+    def fp_oganov(self, delta=0.01, sigma=0.01, cache=None):
+        """
+        Computes the fingerprint of Oganov & Valle for the structure, one function for each pair of species
+
+        :param delta: (float) Size of the bins
+        :param sigma: (float) Standard deviation of the gaussian associated to each distance
+        :param cache: (pychemia.analysis.FingerprintCache) If given, the fingerprint is loaded from the cache when
+                      present or stored on it after being computed
+        :return: (tuple) The bins and an OrderedDict with a fingerprint for each pair of atomic numbers
+        """
+        if cache is not None:
+            ret = cache.get(self.structure, radius=self.radius, delta=delta, sigma=sigma)
+            if ret is not None:
+                return ret
+
         struc_dist_x, struc_dist = self.structure_distances(delta=delta, sigma=sigma)
-        fp_oganov = struc_dist.copy()
+        fp_oganov = OrderedDict()
         vol = self.structure.volume
         for spec_pair in struc_dist:
-            for i in range(len(struc_dist[spec_pair])):
-                specie0 = atomic_symbol(spec_pair[0])
-                specie1 = atomic_symbol(spec_pair[1])
-                number_atoms0 = self.structure.composition[specie0]
-                number_atoms1 = self.structure.composition[specie1]
-                fp_oganov[spec_pair][i] *= vol / (delta * number_atoms0 * number_atoms1)
-                fp_oganov[spec_pair][i] -= 1
+            number_atoms0 = self.structure.composition[atomic_symbol(spec_pair[0])]
+            number_atoms1 = self.structure.composition[atomic_symbol(spec_pair[1])]
+            fp_oganov[spec_pair] = struc_dist[spec_pair] * vol / (delta * number_atoms0 * number_atoms1) - 1
+
+        if cache is not None:
+            cache.set(self.structure, struc_dist_x, fp_oganov, radius=self.radius, delta=delta, sigma=sigma)
         return struc_dist_x, fp_oganov
 
     def bonds_coordination(self, initial_cutoff_radius=0.8, use_laplacian=True, jump=0.01, tol=1E-15):
 
         cutoff_radius = initial_cutoff_radius
         ad = self.all_distances()
+        radii = covalent_radii_array[self.structure.numbers]
         bonds = {}
         while True:
             laplacian = np.zeros((self.structure.natom, self.structure.natom), dtype=np.int8)
 
             for pair in ad:
-                atom1 = self.structure.symbols[pair[0]]
-                atom2 = self.structure.symbols[pair[1]]
-                sum_covalent_radius = sum(covalent_radius([atom1, atom2]))
+                sum_covalent_radius = radii[pair[0]] + radii[pair[1]]
                 condition = np.bitwise_and(ad[pair]['distance'] < cutoff_radius * sum_covalent_radius,
                                            ad[pair]['distance'] > 0)
                 bonds[pair] = ad[pair]['distance'][condition]
@@ -248,13 +257,15 @@ class StructureAnalysis:
                                verbose=False, tol=1E-15, jump=0.01, use_jump=True):
         """
         Computes simultaneously the bonds for all atoms and the coordination
-        number using a multiplicative tolerance for the sum of covalent radius
-
-        :param use_jump:
-        :param jump:
-        :param tol:
-        :param verbose:
-        :param use_laplacian:
+        number using a multiplicative tolerance for the sum of covalent radius.
+        The tolerance is increased in steps of 'jump' until all the atoms are connected, the distances are computed
+        once and the final tolerance is found with a BondNetwork.
+
+        :param use_jump: (bool) If False, the tolerance is increased only until at least two atoms are bonded
+        :param jump: (float) Increment of the tolerance
+        :param tol: (float) Not used, the connectivity is computed exactly
+        :param verbose: (bool) Print some info about the bonds computed
+        :param use_laplacian: (bool) If True, the tolerance is increased until all the atoms are connected
         :param initial_cutoff_radius: (float) Tolerance factor (default is 1.2)
         :param ensure_conectivity: (bool) If True the tolerance of each bond is
                adjusted to ensure that each atom is connected at least once
@@ -266,93 +277,49 @@ class StructureAnalysis:
         if verbose:
             print('Number of distances computed: ', len(distances_list))
 
-        cutoff_radius = initial_cutoff_radius
-        bonds = None
-        coordination = None
-        tolerances = None
-
-        while True:
-            if verbose:
-                print('Current cutoff radius : ', cutoff_radius)
-            bonds = []
-            tolerances = []
-            for i in range(self.structure.natom):
-                tole = cutoff_radius
-                while True:
-                    tmp_bonds = []
-                    min_proportion = sys.float_info.max
-                    for j in bonds_dict[str(i)]:
-                        atom1 = self.structure.symbols[distances_list[j]['pair'][0]]
-                        atom2 = self.structure.symbols[distances_list[j]['pair'][1]]
-                        sum_covalent_radius = sum(covalent_radius([atom1, atom2]))
-                        distance = distances_list[j]['distance']
-                        if distance == 0.0:
-                            continue
-                        proportion = distance / sum_covalent_radius
-                        min_proportion = min(min_proportion, proportion)
-                        if proportion <= tole:
-                            tmp_bonds.append(j)
-                    if len(tmp_bonds) == 0 and ensure_conectivity:
-                        tole = min_proportion
-                        cutoff_radius = tole
-                    else:
-                        bonds.append(tmp_bonds)
-                        tolerances.append(min_proportion)
-                        break
-
-            if use_laplacian:
-                size = (self.structure.natom, self.structure.natom)
-                laplacian = np.zeros(size, dtype=np.int8)
-                for listibonds in bonds:
-                    for ibond in listibonds:
-                        data = distances_list[ibond]
-                        i = data['pair'][0]
-                        j = data['pair'][1]
-                        laplacian[i, j] = -1
-                        laplacian[j, i] = -1
-                        # print '%d %d' % (i,j)
-                for i in range(self.structure.natom):
-                    laplacian[i, i] = 0
-                    laplacian[i, i] = -sum(laplacian[i])
-                if verbose:
-                    print(laplacian)
-                if np.max(np.abs(laplacian)) == 0:
-                    cutoff_radius += jump
-                    if verbose:
-                        print('The laplacian is all zero')
-                        print('Increasing cutoff radius by ', jump, 'A\n')
-                    continue
-
-                # if verbose:
-                # print laplacian
-                # evals, evecs = scipy.sparse.linalg.eigsh(laplacian)
-                ev = numpy.linalg.eigvalsh(laplacian)
-                if verbose:
-                    print('Number of Eigenvalues close to zero :', sum(ev < tol))
-                    print('Lowest Eigenvalues :', ev)
-                    # print 'Lowest Eigenvalues :', evals
+        i, j, distances = self._pair_arrays
+        network = BondNetwork(self.structure.natom, i, j, distances, covalent_radii_array[self.structure.numbers])
+        tolerances, cutoff_radius = network.sweep(initial_cutoff_radius, jump=jump,
+                                                  ensure_conectivity=ensure_conectivity,
+                                                  use_laplacian=use_laplacian, use_jump=use_jump)
+        if verbose:
+            print('Final cutoff radius : ', cutoff_radius)
 
-                if sum(ev < tol) > 1 and use_jump:
-                    cutoff_radius += jump
-                    if verbose:
-                        print('Increasing cutoff radius by ', jump, 'A\n')
-                else:
-                    increase = False
-                    for i in bonds:
-                        if sum(i) == 0 and use_jump:
-                            increase = True
-                    if increase:
-                        cutoff_radius += jump
-                        if verbose:
-                            print('Increasing cutoff radius by', jump, 'A\n')
-                    else:
-                        break
-            else:
-                break
+        bonds = network.bond_lists(tolerances)
+        coordination = [len(x) for x in bonds]
+        min_proportions = np.where(np.isfinite(network.min_proportions), network.min_proportions,
+                                   sys.float_info.max).tolist()
+        return bonds, coordination, distances_list, min_proportions, cutoff_radius
 
-        if bonds is not None:
-            coordination = [len(x) for x in bonds]
-        return bonds, coordination, distances_list, tolerances, cutoff_radius
+    def bond_network(self, initial_cutoff_radius=0.8, ensure_conectivity=False, use_laplacian=True, jump=0.01,
+                     use_jump=True):
+        """
+        Network with the distances needed to compute the bonds with the tolerance of get_bonds_coordination.
+        Only the distances up to the bond lengths are computed, the radius is increased when needed up to the radius
+        of the analysis.
+
+        :param initial_cutoff_radius: (float) Initial tolerance factor
+        :param ensure_conectivity: (bool) If True each atom is connected at least once
+        :param use_laplacian: (bool) If True, the tolerance is increased until all the atoms are connected
+        :param jump: (float) Increment of the tolerance
+        :param use_jump: (bool) If False, the tolerance is increased only until at least two atoms are bonded
+        :return: (tuple) The BondNetwork, the tolerance for each atom and the final tolerance
+        """
+        max_bond = 2 * np.max(covalent_radii_array[self.structure.numbers])
+        radius = min(self.radius, 2 * max_bond)
+        while True:
+            network = BondNetwork.from_structure(self.structure, radius)
+            try:
+                tolerances, cutoff_radius = network.sweep(initial_cutoff_radius, jump=jump,
+                                                          ensure_conectivity=ensure_conectivity,
+                                                          use_laplacian=use_laplacian, use_jump=use_jump)
+                # All the bonds are shorter than the distances computed
+                if np.max(tolerances) * max_bond <= radius or radius >= self.radius:
+                    return network, tolerances, cutoff_radius
+            except ValueError:
+                if radius >= self.radius:
+                    raise
+            radius = min(2 * radius, self.radius)
 
     def hardness_XX(self, initial_cutoff_radius=0.8, use_laplacian=True):
         """
@@ -386,13 +353,14 @@ class StructureAnalysis:
         f = 1.0 - (self.structure.nspecies * f_n ** (1.0 / self.structure.nspecies) / f_d) ** 2
 
         diff_bonds = [x for x in bonds if len(bonds[x]) > 0]
+        symbols = self.structure.symbols
 
         for pair in diff_bonds:
             i1 = pair[0]
             i2 = pair[1]
 
-            ei = valence(self.structure.symbols[i1]) / covalent_radius(self.structure.symbols[i1])
-            ej = valence(self.structure.symbols[i2]) / covalent_radius(self.structure.symbols[i2])
+            ei = valence(symbols[i1]) / covalent_radius(symbols[i1])
+            ej = valence(symbols[i2]) / covalent_radius(symbols[i2])
 
             for dij in bonds[pair]:
                 sij = math.sqrt(ei * ej) / (coordination[i1] * coordination[i2]) / dij
@@ -425,7 +393,7 @@ class StructureAnalysis:
         :param verbose: (bool) To print some debug info
         :param initial_cutoff_radius: (float)
         :param use_laplacian: (bool) If True, the Laplacian method is used
-        :param tol: (float) Tolerance for considering two atoms bonded
+        :param tol: (float) Not used, the connectivity is computed exactly
 
         :rtype : (float)
         """
@@ -433,18 +401,16 @@ class StructureAnalysis:
             print('''Only internal connectivity can be ensure, for complete connectivity in the crystal you must use a
                   supercell at of (2,2,2)''')
 
-        bonds, coordination, all_distances, tolerances, cutoff_radius = \
-            self.get_bonds_coordination(initial_cutoff_radius=initial_cutoff_radius,
-                                        ensure_conectivity=ensure_conectivity,
-                                        use_laplacian=use_laplacian, verbose=verbose, use_jump=use_jump, tol=tol)
+        network, tolerances, cutoff_radius = self.bond_network(initial_cutoff_radius=initial_cutoff_radius,
+                                                               ensure_conectivity=ensure_conectivity,
+                                                               use_laplacian=use_laplacian, use_jump=use_jump)
+        coordination = network.coordination(tolerances)
 
         if verbose:
             print('Structure coordination : ', coordination)
 
         sigma = 3.0
         c_hard = 1300.0
-        x = 1.
-        tot = 0.0
         f_d = 0.0
         f_n = 1.0
         atomicnumbers = atomic_number(self.structure.species)
@@ -456,44 +422,31 @@ class StructureAnalysis:
             f_d += valence(i) / covalent_radius(i)
             f_n *= valence(i) / covalent_radius(i)
 
-        # if verbose:
-        # print 'fd', f_d
-        #    print 'fn', f_n
-        #    print atomicnumbers
         if f_d == 0:
             return 0.0
         f = 1.0 - (len(atomicnumbers) * f_n ** (1.0 / len(atomicnumbers)) / f_d) ** 2
 
         # Selection of different bonds
-        diff_bonds = np.unique(np.array(functools.reduce(lambda xx, y: xx + y, bonds)))
+        bonded = network.bonded(tolerances)
+        i1 = network.i[bonded]
+        i2 = network.j[bonded]
         if verbose:
-            print('Number of different bonds : ', len(diff_bonds))
-
-        for i in diff_bonds:
-            i1 = all_distances[i]['pair'][0]
-            i2 = all_distances[i]['pair'][1]
+            print('Number of different bonds : ', len(i1))
+        if len(i1) == 0:
+            raise ValueError('No bonds found within the cutoff radius %f, the hardness is not defined' % cutoff_radius)
 
-            ei = valence(self.structure.symbols[i1]) / covalent_radius(self.structure.symbols[i1])
-            ej = valence(self.structure.symbols[i2]) / covalent_radius(self.structure.symbols[i2])
-            # print 'bond ->', sqrt(ei * ej), (coordination[i1] * coordination[i2]), all_distances[i]['distance']
-
-            sij = math.sqrt(ei * ej) / (coordination[i1] * coordination[i2]) / all_distances[i]['distance']
-            num_i_j_bonds = len([j for j in diff_bonds if i1 in all_distances[j]['pair'] and
-                                 i2 in all_distances[j]['pair']])
-            # print 'sij', sij
-            # print 'num_i_j_bonds', num_i_j_bonds
-            tot += num_i_j_bonds
-            x *= sij
-            # print 'x', x
+        numbers = self.structure.numbers
+        electronegativity = valences_array[numbers] / covalent_radii_array[numbers]
+        sij = np.sqrt(electronegativity[i1] * electronegativity[i2]) / (coordination[i1] * coordination[i2]) / \
+            network.distances[bonded]
 
         vol = self.structure.volume
         if verbose:
             print("Structure volume:", vol)
-            # print("f:", f)
-            # print("x:", x)
 
-        # print 'len_bonds', len(diff_bonds
-        hardness_value = c_hard / vol * (len(diff_bonds) * x ** (1. / (len(diff_bonds)))) * math.exp(-sigma * f)
+        # The geometric mean of sij is computed with logarithms, the product underflows for many bonds
+        hardness_value = c_hard / vol * (len(sij) * np.exp(np.mean(np.log(sij)))) * math.exp(-sigma * f)
+        coordination = coordination.tolist()
 
         return round(hardness_value, 3), cutoff_radius, coordination
 
@@ -518,6 +471,7 @@ class StructureAnalysis:
             print('Testing with %s of atoms in cell' % n)
             print('Starting with R_cut = %s' % radius)
 
+        symbols = self.structure.symbols
         while True:
             size = (n, n)
             lap_m = np.zeros(size)
@@ -531,18 +485,14 @@ class StructureAnalysis:
                     if dis < radius:
                         if len(dis_dic) != 0:
                             for kstr, kj in dis_dic.items():
-                                tstr = "%s%s" % (self.structure.symbols[i],
-                                                 self.structure.symbols[j])
+                                tstr = "%s%s" % (symbols[i], symbols[j])
                                 if abs(kj[0] - dis) < tolerance and tstr in kstr:
                                     dis_dic[kstr][1] += 1
                                     found = True
                                     break
                         if not found:
                             ndifbonds += 1
-                            kstr = "%s%s%s%s" % (self.structure.symbols[i],
-                                                 self.structure.symbols[j],
-                                                 self.structure.symbols[i],
-                                                 ndifbonds)
+                            kstr = "%s%s%s%s" % (symbols[i], symbols[j], symbols[i], ndifbonds)
                             dis_dic[kstr] = [dis, 1, [i, j]]
 
                         lap_m[i][j] = -1
@@ -592,8 +542,7 @@ class StructureAnalysis:
         :rtype : (float)
         """
 
-        superc = self.structure.copy()
-        superc.supercell(2, 2, 2)
+        superc = self.structure.supercell((2, 2, 2))
         structure_analisys = StructureAnalysis(superc)
 
         natom = superc.natom
@@ -613,7 +562,8 @@ class StructureAnalysis:
         f_d = 0.0
         f_n = 1.0
         dic_atms = {}
-        for i in superc.symbols:
+        superc_symbols = superc.symbols
+        for i in superc_symbols:
             dic_atms[i] = atomic_number(i)
 
         for i in dic_atms.keys():
@@ -631,8 +581,8 @@ class StructureAnalysis:
             i1 = dis_dic[i][2][0]
             i2 = dis_dic[i][2][1]
 
-            ei = valence(superc.symbols[i1]) / covalent_radius(superc.symbols[i1])
-            ej = valence(superc.symbols[i2]) / covalent_radius(superc.symbols[i2])
+            ei = valence(superc_symbols[i1]) / covalent_radius(superc_symbols[i1])
+            ej = valence(superc_symbols[i2]) / covalent_radius(superc_symbols[i2])
 
             sij = math.sqrt(ei * ej) / (coord[i1] * coord[i2]) / dis_dic[i][0]
 
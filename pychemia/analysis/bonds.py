@@ -0,0 +1,225 @@
+"""
+Bonds between atoms defined by a tolerance over the sum of their covalent radius.
+The distances between pairs of atoms are computed once and stored with their proportion to the sum of covalent
+radius, the bonds for any tolerance and the smallest tolerance that connects all the atoms are obtained from those
+arrays without computing the distances again.
+"""
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
+from pychemia.utils.periodic import covalent_radii_array
+
+
+class BondNetwork:
+    """
+    Network of bonds of a structure, each pair of atoms i <= j at distance d (including periodic images) is bonded
+    for a tolerance t if d <= t * (r_i + r_j) where r are the covalent radius
+
+    >>> import pychemia
+    >>> cell = [[0, 2.82, 2.82], [2.82, 0, 2.82], [2.82, 2.82, 0]]
+    >>> st = pychemia.Structure(symbols=['Na', 'Cl'], cell=cell, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+    >>> network = BondNetwork.from_structure(st, radius=6.0)
+    >>> round(network.connectivity_tolerance(), 4)
+    1.0522
+    >>> network.coordination(1.1).tolist()
+    [6, 6]
+    >>> network.bond_matrix(1.1).toarray().tolist()
+    [[0, 6], [6, 0]]
+    """
+
+    def __init__(self, natom, i, j, distances, radii):
+        """
+        Creates the network from the distances between pairs of atoms
+
+        :param natom: (int) Number of atoms
+        :param i: (numpy.ndarray) Index of the first atom of each pair
+        :param j: (numpy.ndarray) Index of the second atom of each pair, i <= j
+        :param distances: (numpy.ndarray) Distance for each pair, the pairs at zero distance are never bonded
+        :param radii: (numpy.ndarray) Covalent radius of each atom
+        """
+        self.natom = int(natom)
+        self.i = np.asarray(i, dtype=int)
+        self.j = np.asarray(j, dtype=int)
+        self.distances = np.asarray(distances, dtype=float)
+        self.radii = np.asarray(radii, dtype=float)
+        self.proportions = self.distances / (self.radii[self.i] + self.radii[self.j])
+        self.proportions[self.distances <= 0] = np.inf
+
+        # Smallest proportion for the pairs involving each atom
+        self.min_proportions = np.full(self.natom, np.inf)
+        np.minimum.at(self.min_proportions, self.i, self.proportions)
+        np.minimum.at(self.min_proportions, self.j, self.proportions)
+
+        # Smallest proportion for each pair of different atoms, the weights of the graph of atoms
+        different = (self.i != self.j) & np.isfinite(self.proportions)
+        key = self.i[different] * self.natom + self.j[different]
+        proportions = self.proportions[different]
+        order = np.lexsort((proportions, key))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = key[order][1:] != key[order][:-1]
+        order = order[first]
+        self._weights = scipy.sparse.csr_matrix((proportions[order], (key[order] // self.natom,
+                                                                      key[order] % self.natom)),
+                                                shape=(self.natom, self.natom))
+
+    @staticmethod
+    def from_structure(structure, radius):
+        """
+        Creates the network for all the pairs of atoms closer than a given radius
+
+        :param structure: (Structure) Periodic or finite structure
+        :param radius: (float) Maximal distance computed between two atoms
+        :return: (BondNetwork)
+        """
+        radii = covalent_radii_array[structure.numbers]
+        if structure.is_periodic:
+            ret = structure.lattice.pair_distances(structure.reduced, radius=radius)
+            i, j, distances = ret['i'], ret['j'], ret['distance']
+        else:
+            i, j = np.triu_indices(structure.natom, 1)
+            distances = structure.distance_matrix()[i, j]
+            inside = distances <= radius
+            i, j, distances = i[inside], j[inside], distances[inside]
+        return BondNetwork(structure.natom, i, j, distances, radii)
+
+    @property
+    def max_distance(self):
+        """
+        Largest distance between the pairs of atoms in the network
+        """
+        return np.max(self.distances, initial=0.0)
+
+    def connectivity_tolerance(self):
+        """
+        Smallest tolerance for which all the atoms are connected by bonds, computed as the largest weight on the
+        minimum spanning tree of the graph of atoms
+
+        :return: (float) The tolerance, infinite if the atoms cannot be connected with the pairs in the network
+        """
+        if self.natom == 1:
+            return 0.0
+        tree = scipy.sparse.csgraph.minimum_spanning_tree(self._weights)
+        if tree.nnz < self.natom - 1:
+            return np.inf
+        return float(np.max(tree.data))
+
+    def _edges(self, tolerances):
+        # Pairs bonded according to the tolerance of the first atom and according to the tolerance of the second atom
+        tolerances = np.broadcast_to(np.asarray(tolerances, dtype=float), (self.natom,))
+        on_i = self.proportions <= tolerances[self.i]
+        on_j = (self.proportions <= tolerances[self.j]) & (self.i != self.j)
+        return on_i, on_j
+
+    def is_connected(self, tolerances):
+        """
+        Checks if all the atoms are connected by bonds
+
+        :param tolerances: (float, numpy.ndarray) Tolerance for all the atoms or for each atom, a pair is bonded if
+                           any of its atoms has the pair inside its tolerance
+        :return: (bool)
+        """
+        on_i, on_j = self._edges(tolerances)
+        bonded = on_i | on_j
+        graph = scipy.sparse.csr_matrix((np.ones(np.sum(bonded)), (self.i[bonded], self.j[bonded])),
+                                        shape=(self.natom, self.natom))
+        return scipy.sparse.csgraph.connected_components(graph, directed=False, return_labels=False) == 1
+
+    def bonded(self, tolerances):
+        """
+        Pairs in the network that are bonds
+
+        :param tolerances: (float, numpy.ndarray) Tolerance for all the atoms or for each atom
+        :return: (numpy.ndarray) Boolean array with one value for each pair
+        """
+        on_i, on_j = self._edges(tolerances)
+        return on_i | on_j
+
+    def coordination(self, tolerances):
+        """
+        Number of bonds of each atom, including the bonds with its own periodic images
+
+        :param tolerances: (float, numpy.ndarray) Tolerance for all the atoms or for each atom
+        :return: (numpy.ndarray)
+        """
+        on_i, on_j = self._edges(tolerances)
+        return (np.bincount(self.i[on_i], minlength=self.natom) +
+                np.bincount(self.j[on_j], minlength=self.natom)).astype(int)
+
+    def bond_lists(self, tolerances):
+        """
+        Indices of the pairs bonded to each atom, for each atom the pairs inside its tolerance
+
+        :param tolerances: (float, numpy.ndarray) Tolerance for all the atoms or for each atom
+        :return: (list) One list of indices of pairs for each atom
+        """
+        on_i, on_j = self._edges(tolerances)
+        index = np.concatenate((np.nonzero(on_i)[0], np.nonzero(on_j)[0]))
+        owner = np.concatenate((self.i[on_i], self.j[on_j]))
+        order = np.lexsort((index, owner))
+        splits = np.cumsum(np.bincount(owner, minlength=self.natom))[:-1]
+        return [x.tolist() for x in np.split(index[order], splits)]
+
+    def bond_matrix(self, tolerances):
+        """
+        Sparse matrix with the number of bonds between each pair of atoms, bonds with periodic images of the same
+        atom are on the diagonal
+
+        :param tolerances: (float, numpy.ndarray) Tolerance for all the atoms or for each atom
+        :return: (scipy.sparse.csr_matrix) Symmetric matrix with shape (natom, natom)
+        """
+        bonded = self.bonded(tolerances)
+        i, j = self.i[bonded], self.j[bonded]
+        different = i != j
+        rows = np.concatenate((i, j[different]))
+        cols = np.concatenate((j, i[different]))
+        # Duplicated entries are summed
+        return scipy.sparse.csr_matrix((np.ones(len(rows), dtype=int), (rows, cols)), shape=(self.natom, self.natom))
+
+    def sweep(self, initial_tolerance, jump=0.01, ensure_conectivity=False, use_laplacian=True, use_jump=True):
+        """
+        Increases the tolerance from an initial value in steps of 'jump' until the atoms are connected, the result is
+        the same as recomputing the bonds for each step but only the thresholds are evaluated.
+
+        :param initial_tolerance: (float) Initial tolerance
+        :param jump: (float) Increment of the tolerance
+        :param ensure_conectivity: (bool) On the first step each atom without bonds gets the bonds with its closest
+                                   neighbors, increasing the tolerance for the following atoms
+        :param use_laplacian: (bool) Increases the tolerance until all the atoms are connected, otherwise only the
+                              first step is done
+        :param use_jump: (bool) If False, the tolerance is increased only until at least two atoms are bonded
+        :return: (tuple) Tolerance for each atom and final tolerance
+        """
+        tolerance = initial_tolerance
+        if ensure_conectivity:
+            tolerances = np.maximum(tolerance, np.maximum.accumulate(self.min_proportions))
+            tolerance = tolerances[-1]
+            if not use_laplacian or self._accepts(tolerances, use_jump):
+                return tolerances, tolerance
+            tolerance += jump
+        elif not use_laplacian:
+            return np.full(self.natom, float(tolerance)), tolerance
+
+        # The steps after the first one use the same tolerance for all the atoms
+        if self.natom == 1:
+            target = 0.0
+        else:
+            # At least one bond between different atoms is needed
+            target = self._weights.data.min(initial=np.inf)
+        if use_jump:
+            target = max(target, self.connectivity_tolerance(), np.max(self.min_proportions))
+        if not np.isfinite(target):
+            raise ValueError('The atoms cannot be connected with the distances computed')
+        while tolerance < target:
+            tolerance += jump
+        return np.full(self.natom, float(tolerance)), tolerance
+
+    def _accepts(self, tolerances, use_jump):
+        # Conditions to stop increasing the tolerance
+        on_i, on_j = self._edges(tolerances)
+        if self.natom > 1 and not np.any((on_i | on_j) & (self.i != self.j)):
+            return False
+        if use_jump:
+            return self.is_connected(tolerances) and np.all(self.coordination(tolerances) > 0)
+        return True
@@ -14,8 +14,10 @@ class StructureChanger:
 
     def permutator(self, pair):
 
-        self.new_structure.symbols[pair[0]] = self.old_structure.symbols[pair[1]]
-        self.new_structure.symbols[pair[1]] = self.old_structure.symbols[pair[0]]
+        symbols = list(self.new_structure.symbols)
+        symbols[pair[0]] = self.old_structure.symbols[pair[1]]
+        symbols[pair[1]] = self.old_structure.symbols[pair[0]]
+        self.new_structure.symbols = symbols
 
         self.operations.append({'permutator': (pair[0], pair[1])})
 
@@ -68,8 +70,9 @@ class StructureChanger:
 
     def move_one_atom(self, index, vector):
 
-        self.new_structure.positions[index] += vector
-        self.new_structure.positions2reduced()
+        positions = np.array(self.new_structure.positions)
+        positions[index] += vector
+        self.new_structure.set_positions(positions)
 
         self.operations.append({'move_one_atom': (index, vector)})
 
@@ -96,8 +99,9 @@ class StructureChanger:
         else:
             fspec = forbidden_species
 
+        symbols = self.new_structure.symbols
         for iatom in range(len(self.old_structure)):
-            if iatom not in findices and self.new_structure.symbols[iatom] not in fspec:
+            if iatom not in findices and symbols[iatom] not in fspec:
                 self.random_move_one_atom(epsilon)
 
     def random_change(self, epsilon):
@@ -2,8 +2,8 @@ import math
 import numpy as np
 import scipy.spatial
 import itertools
-from pychemia.utils.mathematics import integral_gaussian
-from pychemia.utils.periodic import atomic_number
+from pychemia.utils.mathematics import gaussian_histogram
+from .matching import match_atoms_many
 
 __author__ = "Guillermo Avendano-Franco"
 
@@ -60,21 +60,12 @@ class ClusterAnalysis:
             nbins = 10000
         discrete_rdf_x = np.arange(0, nbins * delta, delta)
         for spec_pair in dist_spec:
-            discrete_rdf[spec_pair] = np.zeros(nbins)
-            for Rij in dist_spec[spec_pair]:
-                # Integrating for bin from - 8*sigma to +8*sigma centered on Rij
-                # Values outside this range are negligible
-                imin = int(max(0, (Rij - 8 * sigma) / delta))
-                imax = int(min(len(discrete_rdf_x), (Rij + 8 * sigma) / delta))
-                # log.debug('Computing for distance %7.3f for indices between %d and %d' % (Rij, imin, imax))
-                for i in range(imin, imax):
-                    x = discrete_rdf_x[i]
-                    if not integrated:
-                        discrete_rdf[spec_pair][i] += np.exp(-((x - Rij) ** 2) / (2 * sigma * sigma)) / (
-                            4 * math.pi * Rij * Rij)
-                    else:
-                        discrete_rdf[spec_pair][i] += integral_gaussian(x, x + delta, Rij, sigma) / (
-                            4 * math.pi * Rij * Rij)
+            # Gaussians are considered from -8*sigma to +8*sigma centered on each distance
+            # Values outside this range are negligible
+            distances = dist_spec[spec_pair]
+            discrete_rdf[spec_pair] = gaussian_histogram(distances, delta=delta, sigma=sigma, nbins=nbins,
+                                                         weights=1.0 / (4 * math.pi * distances ** 2),
+                                                         integrated=integrated)
 
         return discrete_rdf_x, discrete_rdf
 
@@ -102,30 +93,8 @@ class ClusterMatch:
         assert self.structure1.symbols == self.structure2.symbols
 
     def match(self):
-
-        species = self.structure1.species
-        species = list(np.array(species)[np.array(atomic_number(species)).argsort()])
-
-        permutation = np.zeros(len(self.structure1.positions), dtype=int)
-        num = 0
-        for ispecie in species:
-
-            pos1 = self.structure1.positions[np.array(self.structure1.symbols) == ispecie]
-            pos2 = self.structure2.positions[np.array(self.structure2.symbols) == ispecie]
-            dm = scipy.spatial.distance_matrix(pos1, pos2)
-
-            match_list = np.zeros(len(pos1))
-            maxdis = np.max(dm.flatten())
-            for i in range(len(pos1)):
-                match = dm[i, :].argmin()
-                # print " %3s %3d %9.3f %9.3f %9.3f" % (ispecie, match, np.linalg.norm(pos1[i]),
-                # np.linalg.norm(pos1[match]), dm[i,match])
-                match_list[i] = match
-                dm[:, match] = maxdis + 1
-
-            match_list += num
-            permutation[num:num + len(pos1)] = match_list
-            num += len(pos1)
-
-        # print permutation
-        self.structure2.sort_sites_using_list(permutation)
+        """
+        Sorts the atoms of the second structure to minimize the sum of displacements between associated atoms
+        """
+        permutations, distances = match_atoms_many(self.structure1, [self.structure2])
+        self.structure2.sort_sites_using_list(permutations[0])
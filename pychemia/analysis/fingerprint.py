@@ -0,0 +1,150 @@
+"""
+Persistent storage of structural fingerprints.
+Fingerprints are stored on disk in a directory where each file is named after a hash of the structure and the
+parameters used to compute the fingerprint, so the same fingerprint is never computed twice.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from pychemia import pcm_log
+
+
+def structure_hash(structure, decimals=6):
+    """
+    Computes a hash of the geometry of a structure.
+    The hash depends on the atomic symbols, the periodicity, the cell and the positions (reduced for periodic
+    structures) rounded to a given number of decimals
+
+    :param structure: (pychemia.Structure) The structure
+    :param decimals: (int) Number of decimals considered for the cell and the positions
+    :return: (str) The SHA1 hash as a hexadecimal string
+
+    >>> from pychemia import Structure
+    >>> st1 = Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+    >>> st2 = Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5 + 1E-9]])
+    >>> structure_hash(st1) == structure_hash(st2)
+    True
+    >>> st3 = Structure(symbols=['Na', 'Cl'], cell=5.65, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+    >>> structure_hash(st1) == structure_hash(st3)
+    False
+    """
+    hasher = hashlib.sha1()
+    hasher.update(' '.join(structure.symbols).encode())
+    hasher.update(str(list(structure.periodicity)).encode())
+    if structure.is_periodic:
+        arrays = [structure.cell, structure.reduced]
+    else:
+        arrays = [structure.positions]
+    for array in arrays:
+        # Adding zero avoids different hashes for -0.0 and 0.0
+        hasher.update(np.ascontiguousarray(np.round(array, decimals) + 0.0, dtype=np.float64).tobytes())
+    return hasher.hexdigest()
+
+
+class FingerprintCache:
+    """
+    Content-addressed cache of fingerprints.
+    Each fingerprint is stored in a compressed numpy file (.npz) on a directory, the name of the file is computed
+    from the hash of the structure and the parameters of the fingerprint. A copy of the fingerprints used is kept
+    in memory too.
+    The default directory is taken from the environment variable PYCHEMIA_FINGERPRINTS or '~/.pychemia/fingerprints'
+    """
+
+    def __init__(self, path=None, decimals=6):
+        """
+        Creates a cache of fingerprints stored in a given directory
+
+        :param path: (str) Directory where the fingerprints are stored, it will be created if it does not exist
+        :param decimals: (int) Number of decimals considered to compute the hash of the structures
+
+        >>> import tempfile
+        >>> from pychemia import Structure
+        >>> from pychemia.analysis import StructureAnalysis
+        >>> cache = FingerprintCache(tempfile.mkdtemp())
+        >>> st = Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+        >>> x, fp = StructureAnalysis(st, radius=10).fp_oganov(delta=0.1, sigma=0.1, cache=cache)
+        >>> len(cache)
+        1
+        >>> x2, fp2 = FingerprintCache(cache.path).get(st, radius=10, delta=0.1, sigma=0.1)
+        >>> list(fp2.keys())
+        [(11, 11), (11, 17), (17, 17)]
+        >>> all([np.allclose(fp[key], fp2[key]) for key in fp])
+        True
+        """
+        if path is None:
+            path = os.environ.get('PYCHEMIA_FINGERPRINTS',
+                                  os.path.join(os.path.expanduser('~'), '.pychemia', 'fingerprints'))
+        self.path = path
+        self.decimals = decimals
+        self._memory = {}
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def __len__(self):
+        return len([x for x in os.listdir(self.path) if x.endswith('.npz')])
+
+    def key(self, structure, **parameters):
+        """
+        Identifier for a fingerprint computed for a structure with a given set of parameters
+
+        :param structure: (pychemia.Structure) The structure
+        :param parameters: Parameters used to compute the fingerprint (radius, delta, sigma, ...)
+        :return: (str)
+        """
+        hasher = hashlib.sha1(structure_hash(structure, self.decimals).encode())
+        for name in sorted(parameters):
+            hasher.update(('%s=%r' % (name, parameters[name])).encode())
+        return hasher.hexdigest()
+
+    def filename(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, structure, **parameters):
+        """
+        Returns the fingerprint stored for a structure and a set of parameters
+
+        :param structure: (pychemia.Structure) The structure
+        :param parameters: Parameters used to compute the fingerprint (radius, delta, sigma, ...)
+        :return: (tuple) The bins and an OrderedDict with the fingerprints for each pair of atomic numbers,
+                 None if the fingerprint is not in the cache
+        """
+        key = self.key(structure, **parameters)
+        if key in self._memory:
+            return self._memory[key]
+        filename = self.filename(key)
+        if not os.path.isfile(filename):
+            return None
+        try:
+            data = np.load(filename)
+            x = data['x']
+            fingerprint = OrderedDict()
+            for pair, values in zip(data['pairs'], data['values']):
+                fingerprint[tuple(int(i) for i in pair)] = values
+        except (IOError, ValueError, KeyError) as exc:
+            pcm_log.debug('Could not read fingerprint %s: %s' % (filename, str(exc)))
+            return None
+        self._memory[key] = (x, fingerprint)
+        return x, fingerprint
+
+    def set(self, structure, x, fingerprint, **parameters):
+        """
+        Stores the fingerprint for a structure and a set of parameters
+
+        :param structure: (pychemia.Structure) The structure
+        :param x: (numpy.ndarray) The bins of the fingerprint
+        :param fingerprint: (dict) The values of the fingerprint for each pair of atomic numbers
+        :param parameters: Parameters used to compute the fingerprint (radius, delta, sigma, ...)
+        """
+        key = self.key(structure, **parameters)
+        pairs = np.array(list(fingerprint.keys()), dtype=int).reshape((-1, 2))
+        values = np.array([fingerprint[pair] for pair in fingerprint]).reshape((len(pairs), -1))
+        # Writing into a temporal file and renaming, avoids partial files read by concurrent processes
+        tmpname = self.filename(key + '.%d.tmp' % os.getpid())
+        with open(tmpname, 'wb') as wf:
+            np.savez_compressed(wf, x=x, pairs=pairs, values=values)
+        os.replace(tmpname, self.filename(key))
+        self._memory[key] = (x, fingerprint)
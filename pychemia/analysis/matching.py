@@ -1,7 +1,8 @@
+import itertools
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 from pychemia.utils.mathematics import lcm, shortest_triple_set
 from pychemia import Structure
-import itertools
 
 
 class StructureMatch:
@@ -47,74 +48,26 @@ class StructureMatch:
         assert (self.structure1.symbols == self.structure2.symbols)
 
     def match_atoms(self):
-
+        """
+        Sorts the atoms of the second structure so each atom is associated with the atom of the same species on the
+        first structure and the sum of distances between associated atoms is minimal. The distances are computed on
+        the lattice of the first structure.
+        """
         if self.structure1.natom != self.structure2.natom:
             raise ValueError('Match the size first')
 
-        best = {}
-        for specie in self.structure1.species:
-            selection = np.array(self.structure1.symbols) == specie
-
-            distance_matrix, close_images = self.base_lattice.minimal_distances(self.structure1.reduced[selection],
-                                                                                self.structure2.reduced[selection])
-
-            min_trace = 1E10
-            best[specie] = None
-            if self.structure1.natom < 7:
-                for i in itertools.permutations(range(len(distance_matrix))):
-                    if distance_matrix[:, np.array(i)].trace() < min_trace:
-                        min_trace = distance_matrix[:, np.array(i)].trace()
-                        best[specie] = i
-            else:
-                # Only consider permutations of 2 positions
-                if len(distance_matrix) > 1:
-                    for ipar in itertools.permutations(range(len(distance_matrix)), 2):
-                        i = list(range(len(distance_matrix)))
-                        i[ipar[0]] = ipar[1]
-                        i[ipar[1]] = ipar[0]
-                        if distance_matrix[:, np.array(i)].trace() < min_trace:
-                            min_trace = distance_matrix[:, np.array(i)].trace()
-                            best[specie] = i
-                    for ipar in itertools.permutations(range(len(distance_matrix)), 4):
-                        i = list(range(len(distance_matrix)))
-                        i[ipar[0]] = ipar[1]
-                        i[ipar[1]] = ipar[0]
-                        i[ipar[2]] = ipar[3]
-                        i[ipar[3]] = ipar[2]
-                        if distance_matrix[:, np.array(i)].trace() < min_trace:
-                            min_trace = distance_matrix[:, np.array(i)].trace()
-                            best[specie] = i
-                else:
-                    best[specie] = [0]
-
-            print('For specie %s best permutation is %s' % (specie, str(best[specie])))
-
-        best_permutation = np.zeros(self.structure1.natom, dtype=int)
-        index = 0
-        while index < self.structure1.natom:
-            specie = self.structure1.symbols[index]
-            selection = np.array(self.structure1.symbols) == specie
-            best_permutation[selection] = index + np.array(best[specie])
-            index += len(best[specie])
-
-        self.structure2.sort_sites_using_list(best_permutation)
+        permutations, distances = match_atoms_many(self.structure1, [self.structure2])
+        self.structure2.sort_sites_using_list(permutations[0])
 
     def reduced_displacement(self):
 
         assert (self.structure1.symbols == self.structure2.symbols)
         assert (self.structure1.nsites == self.structure2.nsites)
         assert (self.structure1.natom == self.structure2.natom)
-        ret = np.zeros((self.structure1.nsites, 3))
-
         distance_matrix, close_images = self.base_lattice.minimal_distances(self.structure1.reduced,
                                                                             self.structure2.reduced)
-
-        for i in range(self.structure1.nsites):
-            x1 = self.structure1.reduced[i]
-            x2 = self.structure2.reduced[i] + close_images[i, i]
-            ret[i] = x2 - x1
-
-        return ret
+        index = np.arange(self.structure1.nsites)
+        return self.structure2.reduced + close_images[index, index] - self.structure1.reduced
 
     def cell_displacement(self):
 
@@ -123,8 +76,67 @@ class StructureMatch:
     def cartesian_distances(self):
 
         rd = self.reduced_displacement()
-        ret = np.zeros(self.structure1.nsites)
-        for i in range(self.structure1.nsites):
-            ret[i] = np.dot(np.dot(rd[i], self.base_lattice.metric), rd[i])
-            ret[i] = np.sqrt(ret[i])
-        return ret
+        return np.sqrt(np.einsum('ij,jk,ik->i', rd, self.base_lattice.metric, rd))
+
+
+def match_atoms_many(reference, structures, chunk_size=1000000):
+    """
+    Finds for many structures the association of their atoms with the atoms of a reference structure that minimizes
+    the sum of distances between associated atoms. Each species is solved independently as a linear assignment
+    problem with the Hungarian algorithm (scipy.optimize.linear_sum_assignment).
+    The structures must have the same symbols as the reference and in the same order, like after 'match_size' and
+    'match_shape' of StructureMatch. For crystals the distances are computed with the lattice of the reference and
+    the minimal image convention, for clusters with the cartesian positions.
+
+    :param reference: (Structure) Reference structure
+    :param structures: (list) Structures matched against the reference
+    :param chunk_size: (int) Maximal number of distances computed simultaneously
+    :return: (tuple) Permutations with shape (nstructures, natom), where the atom permutations[k, i] of the
+             structure k is associated with the atom i of the reference, and the sum of distances between associated
+             atoms for each structure
+
+    >>> st = Structure(symbols=['H', 'H', 'O'], positions=[[0, 0, 0], [1, 0, 0], [0, 2, 0]])
+    >>> st2 = Structure(symbols=['H', 'H', 'O'], positions=[[1.1, 0, 0], [0, 0, 0], [0, 2, 0]])
+    >>> permutations, distances = match_atoms_many(st, [st, st2])
+    >>> permutations.tolist()
+    [[0, 1, 2], [1, 0, 2]]
+    >>> distances.round(6).tolist()
+    [0.0, 0.1]
+    """
+    symbols = np.array(reference.symbols)
+    for structure in structures:
+        if structure.symbols != reference.symbols:
+            raise ValueError('The structures must have the same atoms as the reference in the same order')
+    if reference.is_periodic:
+        coordinates = np.array([x.reduced for x in structures], dtype=float).reshape((-1, reference.natom, 3))
+    else:
+        coordinates = np.array([x.positions for x in structures], dtype=float).reshape((-1, reference.natom, 3))
+
+    permutations = np.tile(np.arange(reference.natom), (len(structures), 1))
+    distances = np.zeros(len(structures))
+    for specie in reference.species:
+        index = np.nonzero(symbols == specie)[0]
+        matrices = _distance_matrices(reference, coordinates[:, index], index, chunk_size)
+        for k in range(len(structures)):
+            rows, cols = linear_sum_assignment(matrices[k])
+            permutations[k, index[rows]] = index[cols]
+            distances[k] += np.sum(matrices[k][rows, cols])
+    return permutations, distances
+
+
+def _distance_matrices(reference, coordinates, index, chunk_size):
+    # Distances between the atoms 'index' of the reference and the coordinates of each structure, with shape
+    # (nstructures, len(index), len(index))
+    if not reference.is_periodic:
+        diff = coordinates[:, None, :, :] - reference.positions[index][None, :, None, :]
+        return np.sqrt(np.sum(diff * diff, axis=3))
+    images = np.array(list(itertools.product([-1, 0, 1], repeat=3)))
+    cartesian_images = np.dot(images, reference.cell)
+    ret = np.zeros((len(coordinates), len(index), len(index)))
+    step = max(1, int(chunk_size // (len(images) * len(index) ** 2)))
+    for start in range(0, len(coordinates), step):
+        diff = coordinates[start:start + step, None, :, :] - reference.reduced[index][None, :, None, :]
+        diff -= np.rint(diff)
+        vectors = np.dot(diff, reference.cell)[..., None, :] + cartesian_images
+        ret[start:start + step] = np.sqrt(np.min(np.sum(vectors * vectors, axis=-1), axis=-1))
+    return ret
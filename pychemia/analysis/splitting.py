@@ -98,6 +98,8 @@ class SplitMatch:
         symbols2 = self.structures[1].natom * ['U']
 
         nsites = self.structures[0].nsites
+        old_symbols1 = self.structures[0].symbols
+        old_symbols2 = self.structures[1].symbols
 
         index1 = 0
         index2 = 0
@@ -105,13 +107,13 @@ class SplitMatch:
         for i in range(nsites):
             if i in self.split_sites[0][grp0]:
                 newreduced1[index1] = self.structures[0].reduced[i, :]
-                symbols1[index1] = self.structures[0].symbols[i]
+                symbols1[index1] = old_symbols1[i]
                 index1 += 1
             else:
                 pos = self.structures[0].reduced[i, permsel1]
                 # print i,' - ', self.structures[0].reduced[i], '==>', pos
                 newreduced2[index2] = pos
-                symbols2[index2] = self.structures[0].symbols[i]
+                symbols2[index2] = old_symbols1[i]
                 index2 += 1
 
         # print '1 Reduced\n', newreduced1
@@ -123,13 +125,13 @@ class SplitMatch:
         for i in range(nsites):
             if i in self.split_sites[1][grp1]:
                 newreduced2[index2] = self.structures[1].reduced[i, :]
-                symbols2[index2] = self.structures[1].symbols[i]
+                symbols2[index2] = old_symbols2[i]
                 index2 += 1
             else:
                 pos = self.structures[1].reduced[i, permsel1]
                 # print i,' - ', self.structures[1].reduced[i], '==>', pos
                 newreduced1[index1] = pos
-                symbols1[index1] = self.structures[1].symbols[i]
+                symbols1[index1] = old_symbols2[i]
                 index1 += 1
 
         cell1 = np.array(self.structures[0].cell)
@@ -289,17 +291,19 @@ def do_mixing(structure1, structure2, cut_planes1, cut_planes2, matching, match_
 
     index1 = matching[match_index]['plane_indices1'][0]
     index2 = matching[match_index]['plane_indices1'][1]
+    symbols1 = structure1.symbols
+    symbols2 = structure2.symbols
 
     reduced11 = np.array([structure1.reduced[x] for x in partition1[0]])
     reduced11[:, dim1] = (reduced11[:, dim1] - cut_planes1[dim1][index1] + 1.0) % 1.0
     reduced11[:, dim1] -= np.min(reduced11[:, dim1])
-    symbols = [structure1.symbols[x] for x in partition1[0]]
+    symbols = [symbols1[x] for x in partition1[0]]
     st11 = Structure(reduced=reduced11, cell=structure1.cell, symbols=symbols)
 
     reduced12 = np.array([structure1.reduced[x] for x in partition1[1]])
     reduced12[:, dim1] = (reduced12[:, dim1] - cut_planes1[dim1][index2] + 1.0) % 1.0
     reduced12[:, dim1] -= np.min(reduced12[:, dim1])
-    symbols = [structure1.symbols[x] for x in partition1[1]]
+    symbols = [symbols1[x] for x in partition1[1]]
     st12 = Structure(reduced=reduced12, cell=structure1.cell, symbols=symbols)
 
     index1 = matching[match_index]['plane_indices2'][0]
@@ -308,13 +312,13 @@ def do_mixing(structure1, structure2, cut_planes1, cut_planes2, matching, match_
     reduced21 = np.array([structure2.reduced[x] for x in partition2[0]])
     reduced21[:, dim2] = (reduced21[:, dim2] - cut_planes2[dim2][index1] + 1.0) % 1.0
     reduced21[:, dim2] -= np.min(reduced21[:, dim2])
-    symbols = [structure2.symbols[x] for x in partition2[0]]
+    symbols = [symbols2[x] for x in partition2[0]]
     st21 = Structure(reduced=reduced21, cell=structure2.cell, symbols=symbols)
 
     reduced22 = np.array([structure2.reduced[x] for x in partition2[1]])
     reduced22[:, dim2] = (reduced22[:, dim2] - cut_planes2[dim2][index2] + 1.0) % 1.0
     reduced22[:, dim2] -= np.min(reduced22[:, dim2])
-    symbols = [structure2.symbols[x] for x in partition2[1]]
+    symbols = [symbols2[x] for x in partition2[1]]
     st22 = Structure(reduced=reduced22, cell=structure2.cell, symbols=symbols)
 
     return st11, st12, st21, st22
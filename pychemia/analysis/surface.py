@@ -141,14 +141,14 @@ def get_surface_atoms_new(structure, use_covalent_radius=False):
     dln = scipy.spatial.Delaunay(structure.positions)
 
     if use_covalent_radius:
+        symbols = structure.symbols
         simplices = []
         for j in dln.simplices:
             discard = False
             for ifacet in list(itertools.combinations(j, 3)):
                 for ipair in itertools.combinations(ifacet, 2):
                     distance = np.linalg.norm(structure.positions[ipair[0]] - structure.positions[ipair[1]])
-                    cov_distance = covalent_radius(structure.symbols[ipair[0]]) + covalent_radius(
-                        structure.symbols[ipair[1]])
+                    cov_distance = covalent_radius(symbols[ipair[0]]) + covalent_radius(symbols[ipair[1]])
                     if distance > 3.0*cov_distance:
                         print('Distance: %f Cov-distance: %f' % (distance, cov_distance))
                         discard = True
@@ -257,14 +257,15 @@ def get_facets(structure, surface, seed, distance_tolerance=2.0):
 
     selected_facets = []
     mintol = 1E5
+    symbols = structure.symbols
     for x in facets:
         dm = scipy.spatial.distance_matrix(pos[x], pos[x])
         maxdist = max(dm.flatten())
         pair = np.where(dm == maxdist)
         atom1 = x[pair[0][0]]
         atom2 = x[pair[1][0]]
-        covrad1 = pychemia.utils.periodic.covalent_radius(structure.symbols[surface[atom1]])
-        covrad2 = pychemia.utils.periodic.covalent_radius(structure.symbols[surface[atom2]])
+        covrad1 = pychemia.utils.periodic.covalent_radius(symbols[surface[atom1]])
+        covrad2 = pychemia.utils.periodic.covalent_radius(symbols[surface[atom2]])
         if maxdist / (covrad1 + covrad2) < mintol:
             mintol = maxdist / (covrad1 + covrad2)
         if maxdist < distance_tolerance * (covrad1 + covrad2):
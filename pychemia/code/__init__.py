@@ -4,17 +4,11 @@ Currently there are implementations for *ABINIT*, *DFTB+*, *Fireball*, an intern
 LennardJones 'calculator', *Octopus* and *VASP*.
 
 """
-from .relaxator import Relaxator
-from . import vasp
-from . import dftb
-from . import lennardjones
-from . import fireball
-from . import sprkkr
-from . import phonopy
-from . import new_fireball
-from . import siesta
-from . import elk
-from . import abinit
-from . import octopus
+from pychemia import lazy_import
+
+# Each code is imported the first time it is used
+__getattr__, __dir__ = lazy_import(__name__, ['vasp', 'dftb', 'lennardjones', 'fireball', 'sprkkr', 'phonopy',
+                                              'new_fireball', 'siesta', 'elk', 'abinit', 'octopus'],
+                                   {'Relaxator': 'relaxator'})
 
 # __all__ = filter(lambda s: not s.startswith('_'), dir())
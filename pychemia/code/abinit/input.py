@@ -373,6 +373,8 @@ class AbinitInput(CodeInput):
         Show the 3 projections of the molecule in a single
         figure
         """
+        from pychemia import use_agg_backend
+        use_agg_backend()
         import matplotlib.patches as mpatches
         from matplotlib.collections import PatchCollection
         from matplotlib.pylab import subplots
@@ -396,8 +398,9 @@ class AbinitInput(CodeInput):
         for j in range(3):
 
             patches = []
+            symbols = structure.symbols
             for i in range(structure.natom):
-                radius = 0.5 * covalent_radius(atomic_number(structure.symbols[i]))
+                radius = 0.5 * covalent_radius(atomic_number(symbols[i]))
                 pos = structure.positions[i]
                 art = mpatches.Circle((pos[proj[j][0]], pos[proj[j][1]]), radius, fc='g', ec='g')
                 patches.append(art)
@@ -5,7 +5,7 @@ from ..abinit import AbinitJob
 from ...tasks import Task
 from ...relaxator import Relaxator
 from pychemia.crystal import KPoints
-from pychemia import pcm_log
+from pychemia import pcm_log, use_agg_backend
 
 __author__ = 'Guillermo Avendano-Franco'
 
@@ -52,6 +52,7 @@ class IonRelaxation(Relaxator, Task):
     def plot(self, filedir=None, file_format='pdf'):
         if filedir is None:
             filedir = self.workdir
+        use_agg_backend()
         import matplotlib.pyplot as plt
         plt.switch_backend('agg')
 
@@ -40,6 +40,8 @@ class StaticCalculation(Task):
         if not self.finished:
             print('The task is not finished')
             return
+        from pychemia import use_agg_backend
+        use_agg_backend()
         import matplotlib.pyplot as plt
         plt.switch_backend('agg')
         plt.figure(figsize=(8, 6))
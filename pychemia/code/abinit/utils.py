@@ -101,6 +101,8 @@ def split_varname(varname):
 
 
 def plot_simple(variables, varname):
+    from pychemia import use_agg_backend
+    use_agg_backend()
     from matplotlib.pylab import subplots
     from numpy import arange, mean, apply_along_axis, linalg
     from math import sqrt
@@ -122,8 +122,8 @@ class Relaxation(Relaxator):
 
                     # lets change the positions if the score have lowered to -10
                     if score == -10 and self.forced:
-                        dftb.structure.positions += 0.2 * np.random.rand(dftb.structure.natom, 3) - 0.1
-                        dftb.structure.positions2reduced()
+                        displacement = 0.2 * np.random.rand(dftb.structure.natom, 3) - 0.1
+                        dftb.structure.set_positions(dftb.structure.positions + displacement)
                         dftb.structure.set_cell(1.1 * dftb.structure.cell)
                     if score == -1 and self.forced:
                         dftb.structure = dftb.structure.random_cell(dftb.structure.composition)
@@ -262,6 +262,7 @@ def read_geometry_bas(filename):
 def write_geometry_bas(structure, filename):
     wf = open(filename, 'w')
     wf.write('%3d\n' % structure.natom)
+    symbols = structure.symbols
     for i in range(structure.natom):
         if structure.is_periodic:
             x = structure.reduced[i, 0]
@@ -271,7 +272,7 @@ def write_geometry_bas(structure, filename):
             x = structure.positions[i, 0]
             y = structure.positions[i, 1]
             z = structure.positions[i, 2]
-        wf.write('%3d %13.7f %13.7f %13.7f\n' % (atomic_number(structure.symbols[i]), x, y, z))
+        wf.write('%3d %13.7f %13.7f %13.7f\n' % (atomic_number(symbols[i]), x, y, z))
     wf.close()
 
 
@@ -5,5 +5,5 @@ Includes class LennardJones and several methods to relax and compute forces and
 # import pyximport
 # pyximport.install()
 
-from .lj import LennardJones, lj_compact_evaluate
-from .lj_utils import lj_energy, lj_forces, lj_gradient
+from .lj import LennardJones, lj_compact_evaluate, lj_compact_evaluate_batch, lj_relax_batch
+from .lj_utils import lj_energy, lj_forces, lj_gradient, lj_energy_gradient, lj_energy_gradient_batch
@@ -6,16 +6,25 @@ import scipy.optimize
 import scipy.spatial
 from pychemia import pcm_log
 from pychemia.utils.mathematics import length_vectors
-from pychemia.utils.periodic import mass
+from pychemia.utils.periodic import mass, atomic_symbols
 
-from .lj_utils import lj_energy, lj_forces, lj_gradient
+from .lj_utils import lj_energy, lj_energy_gradient, lj_energy_gradient_batch, lj_forces
 
 
 
 
 
 class LennardJones:
-    def __init__(self, structure, ljparams=None, cp=0.0):
+    def __init__(self, structure, ljparams=None, cp=0.0, cutoff=None):
+        """
+        Lennard-Jones potential for a cluster
+
+        :param structure: (pychemia.Structure) The cluster
+        :param ljparams: (dict) Parameters 'sigma' and 'epsilon' for each pair of species as 'A-B', with the species
+                         sorted alphabetically. By default sigma=1 and epsilon=1 for all pairs
+        :param cp: (float) Constant of an harmonic potential that compacts the cluster
+        :param cutoff: (float) Only pairs of atoms closer than the cutoff interact. All the pairs interact by default
+        """
         self.initial_structure = structure
         self.structure = structure.copy()
 
@@ -26,15 +35,21 @@ class LennardJones:
                     ljparams[i + "-" + j] = {"sigma": 1.0, "epsilon": 1.0}
         self.ljparams = ljparams
         self.cp = cp
-        self.sigmas = np.zeros((structure.natom, structure.natom))
-        self.epsilons = np.zeros((structure.natom, structure.natom))
-        for i in range(structure.natom):
-            for j in range(structure.natom):
-                self.sigmas[i, j], self.epsilons[i, j] = self.get_sigma_epsilon(i, j)
+        self.cutoff = cutoff
+        # The parameters are looked up once for each pair of species and expanded to all the pairs of atoms
+        species = sorted(set(self.structure.symbols))
+        table = np.zeros((2, len(species), len(species)))
+        for i in range(len(species)):
+            for j in range(len(species)):
+                key = "-".join(sorted([species[i], species[j]]))
+                table[:, i, j] = float(ljparams[key]["sigma"]), float(ljparams[key]["epsilon"])
+        index = np.array([species.index(x) for x in self.structure.symbols], dtype=int)
+        self.sigmas = table[0][np.ix_(index, index)]
+        self.epsilons = table[1][np.ix_(index, index)]
 
     def get_forces(self):
         return lj_forces(
-            self.structure.positions, self.sigmas, self.epsilons, self.cp
+            self.structure.positions, self.sigmas, self.epsilons, self.cp, self.cutoff
         ).reshape((-1, 3))
 
     def get_magnitude_forces(self):
@@ -43,9 +58,8 @@ class LennardJones:
     def steepest_descent(self, dt=1, tolerance=1e-3):
         forces = self.get_forces()
         while np.max(self.get_magnitude_forces()) > tolerance:
-            for i in range(self.structure.natom):
-                imass = mass(self.structure.symbols[i])
-                self.structure.positions[i] += 0.5 * forces[i] / imass * dt ** 2
+            masses = np.array(mass(self.structure.symbols)).reshape((-1, 1))
+            self.structure.set_positions(self.structure.positions + 0.5 * forces / masses * dt ** 2)
 
             forces = self.get_forces()
             maxforce = np.max(self.get_magnitude_forces())
@@ -56,8 +70,8 @@ class LennardJones:
             )
 
     def get_sigma_epsilon(self, i, j):
-        specie1 = self.structure.symbols[i]
-        specie2 = self.structure.symbols[j]
+        specie1 = atomic_symbols[self.structure.numbers[i]]
+        specie2 = atomic_symbols[self.structure.numbers[j]]
         sort_species = [specie1, specie2]
         sort_species.sort()
 
@@ -67,17 +81,20 @@ class LennardJones:
         return float(sigma), float(epsilon)
 
     def get_energy(self):
-        return lj_energy(self.structure.positions, self.sigmas, self.epsilons, self.cp)
+        return lj_energy(self.structure.positions, self.sigmas, self.epsilons, self.cp, self.cutoff)
 
     def local_minimization(
         self, method="BFGS", gtol=1e-4, soft_max_ncalls=5, hard_max_ncalls=20
     ):
 
         if method in ["Nelder-Mead", "Powell"]:
+            function = lj_energy
             jac = None
             options = {"maxiter": 100, "disp": False}
         else:
-            jac = lj_gradient
+            # Energy and gradient are computed together
+            function = lj_energy_gradient
+            jac = True
             options = {"gtol": 0.1 * gtol, "disp": False}
 
         x0 = self.structure.positions.flatten()
@@ -89,9 +106,9 @@ class LennardJones:
         while True:
 
             res = scipy.optimize.minimize(
-                lj_energy,
+                function,
                 x0,
-                args=(self.sigmas, self.epsilons, self.cp),
+                args=(self.sigmas, self.epsilons, self.cp, self.cutoff),
                 method=method,
                 jac=jac,
                 options=options,
@@ -166,3 +183,128 @@ def lj_compact_evaluate(structure, gtol, minimal_density):
     relax = lj.local_minimization(gtol=gtol)
     # Return relaxed positions, forces and energy
     return relax.x.reshape((-1, 3)), relax.jac.reshape((-1, 3)), relax.fun
+
+
+def lj_relax_batch(positions, sigmas, epsilons, cp=0.0, gtol=1e-3, max_steps=20000, dt=0.02, dt_max=0.2,
+                   max_step_size=0.1):
+    """
+    Relaxes simultaneously several Lennard-Jones clusters using the FIRE algorithm (Bitzek et al. PRL 97, 170201)
+    vectorized over the clusters. The clusters can have different number of atoms, they are padded with atoms
+    far away that do not interact. Each cluster stops moving once its maximal force is lower than 'gtol'.
+
+    :param positions: (list) Positions of the atoms for each cluster
+    :param sigmas: (list) Matrix with the parameter sigma for each pair of atoms, for each cluster
+    :param epsilons: (list) Matrix with the parameter epsilon for each pair of atoms, for each cluster
+    :param cp: (float, list) Constant of the harmonic potential that compacts the clusters, one value for all
+               of them or one for each cluster
+    :param gtol: (float) Target for the maximal force over the atoms
+    :param max_steps: (int) Maximal number of FIRE steps
+    :param dt: (float) Initial time step
+    :param dt_max: (float) Maximal time step
+    :param max_step_size: (float) Maximal displacement of one atom on a single step
+    :return: (tuple) Lists with the relaxed positions and the gradients for each cluster, and arrays with the
+             energies and the maximal forces
+    """
+    ncluster = len(positions)
+    natoms = [len(np.array(x).reshape((-1, 3))) for x in positions]
+    nmax = max(natoms)
+    pos = np.zeros((ncluster, nmax, 3))
+    pair_sigmas = np.ones((ncluster, nmax, nmax))
+    pair_epsilons = np.zeros((ncluster, nmax, nmax))
+    mask = np.zeros((ncluster, nmax, 1))
+    for k in range(ncluster):
+        n = natoms[k]
+        pos[k, :n] = np.array(positions[k]).reshape((-1, 3))
+        # Padding atoms are placed far away on a line and their epsilon is zero
+        pos[k, n:, 0] = 1E3 * (1 + np.arange(nmax - n)) + np.max(np.abs(pos[k, :n]))
+        pair_sigmas[k, :n, :n] = sigmas[k]
+        pair_epsilons[k, :n, :n] = epsilons[k]
+        mask[k, :n] = 1.0
+    cp = np.zeros(ncluster) + cp
+
+    def evaluate(index):
+        ens, grads = lj_energy_gradient_batch(pos[index], pair_sigmas[index], pair_epsilons[index])
+        ens += 0.5 * cp[index] * np.sum(mask[index] * pos[index] ** 2, axis=(1, 2))
+        grads = (grads.reshape((-1, nmax, 3)) + cp[index, None, None] * pos[index]) * mask[index]
+        return ens, grads
+
+    # FIRE parameters
+    nmin = 5
+    finc = 1.1
+    fdec = 0.5
+    alpha0 = 0.1
+    falpha = 0.99
+
+    energies, gradients = evaluate(np.arange(ncluster))
+    maxforces = np.max(np.linalg.norm(gradients, axis=2), axis=1)
+    velocities = np.zeros_like(pos)
+    dts = np.full(ncluster, float(dt))
+    alphas = np.full(ncluster, alpha0)
+    npositive = np.zeros(ncluster, dtype=int)
+
+    for step in range(max_steps):
+        index = np.nonzero(maxforces > gtol)[0]
+        if len(index) == 0:
+            break
+        forces = -gradients[index]
+        vel = velocities[index]
+        power = np.sum(forces * vel, axis=(1, 2))
+        fnorm = np.linalg.norm(forces.reshape((len(index), -1)), axis=1)
+        vnorm = np.linalg.norm(vel.reshape((len(index), -1)), axis=1)
+        alpha = alphas[index]
+        vel = (1.0 - alpha)[:, None, None] * vel + (alpha * vnorm / np.maximum(fnorm, 1E-300))[:, None, None] * forces
+
+        positive = power > 0
+        npositive[index] = np.where(positive, npositive[index] + 1, 0)
+        grow = positive & (npositive[index] > nmin)
+        dts[index] = np.where(grow, np.minimum(dts[index] * finc, dt_max), dts[index])
+        alphas[index] = np.where(grow, alpha * falpha, alpha)
+        dts[index] = np.where(positive, dts[index], dts[index] * fdec)
+        alphas[index] = np.where(positive, alphas[index], alpha0)
+        vel[~positive] = 0.0
+
+        vel += dts[index, None, None] * forces
+        displacement = dts[index, None, None] * vel
+        lengths = np.linalg.norm(displacement, axis=2, keepdims=True)
+        displacement *= np.minimum(1.0, max_step_size / np.maximum(lengths, 1E-300))
+        pos[index] += displacement * mask[index]
+        velocities[index] = vel
+
+        energies[index], gradients[index] = evaluate(index)
+        maxforces[index] = np.max(np.linalg.norm(gradients[index], axis=2), axis=1)
+    else:
+        pcm_log.debug("FIRE could not reach target forces for %d clusters" % np.sum(maxforces > gtol))
+
+    return ([pos[k, :natoms[k]].copy() for k in range(ncluster)],
+            [gradients[k, :natoms[k]].copy() for k in range(ncluster)], energies, maxforces)
+
+
+def lj_compact_evaluate_batch(structures, gtol, minimal_density):
+    """
+    Batch version of 'lj_compact_evaluate' where all the clusters are relaxed simultaneously with
+    'lj_relax_batch'. Clusters with a density lower than 'minimal_density' are first relaxed adding an harmonic
+    potential of increasing strength.
+
+    :param structures: (list) Clusters as pychemia.Structure objects, their positions are changed
+    :param gtol: (float) Target for the maximal force over the atoms
+    :param minimal_density: (float) Minimal density for the clusters
+    :return: (list) For each cluster, a tuple with relaxed positions, gradient and energy
+    """
+    potentials = [LennardJones(structure) for structure in structures]
+    sigmas = [lj.sigmas for lj in potentials]
+    epsilons = [lj.epsilons for lj in potentials]
+
+    for k in range(1, 11):
+        index = [i for i in range(len(structures)) if structures[i].density < minimal_density]
+        if len(index) == 0:
+            break
+        pcm_log.debug("Compacting %d clusters with cp=%d" % (len(index), k))
+        positions, gradients, energies, maxforces = lj_relax_batch([structures[i].positions for i in index],
+                                                                   [sigmas[i] for i in index],
+                                                                   [epsilons[i] for i in index], cp=k, gtol=gtol)
+        for i, new_positions in zip(index, positions):
+            structures[i].set_positions(new_positions)
+
+    positions, gradients, energies, maxforces = lj_relax_batch([structure.positions for structure in structures],
+                                                               sigmas, epsilons, gtol=gtol)
+    return [(positions[i], gradients[i], float(energies[i])) for i in range(len(structures))]
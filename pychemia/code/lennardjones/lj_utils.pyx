@@ -1,50 +1,141 @@
 # cython: language_level=3
 
 import numpy as np
+import scipy.spatial
 
 
-def lj_forces(pos, sigmas, epsilons, cp=0.0):
-    #cdef int n, i, j
-    #cdef float distance, magnitude
-    pos = np.array(pos).reshape((-1, 3))
-    n = len(pos)
-    ret = np.zeros((n, 3))
-    for i in range(n - 1):
-        for j in range(i + 1, n):
-            vector = pos[j] - pos[i]
-            distance = np.linalg.norm(vector)
-            if distance < 1E-8:
-                print('ERROR: Too small distance between atoms')
-                distance = 1E-8
-            sr6 = (sigmas[i, j] / distance) ** 6
-            magnitude = 24 * epsilons[i, j] / distance * (2.0 * sr6 ** 2 - sr6)
-            ret[i] -= magnitude * vector / distance
-            ret[j] += magnitude * vector / distance
+def _lj_pairs(pos, sigmas, epsilons, cutoff=None):
+    """
+    Pairs of atoms i < j considered for the interaction, all of them or only those closer than 'cutoff'
+
+    :return: (tuple) Arrays i, j, vectors from i to j, distances, sigmas and epsilons for each pair
+    """
+    if cutoff is None:
+        i, j = np.triu_indices(len(pos), 1)
+    else:
+        pairs = scipy.spatial.cKDTree(pos).query_pairs(cutoff, output_type='ndarray').reshape((-1, 2))
+        i, j = np.min(pairs, axis=1), np.max(pairs, axis=1)
+    vectors = pos[j] - pos[i]
+    distances = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+    return i, j, vectors, distances, np.asarray(sigmas)[i, j], np.asarray(epsilons)[i, j]
+
+
+def _lj_pair_energies(distances, sigmas, epsilons, cutoff=None):
+    # Pairs at (almost) zero distance do not contribute to the energy
+    valid = distances > 1E-10
+    sr6 = (sigmas / np.where(valid, distances, 1.0)) ** 6
+    energies = np.where(valid, 4 * epsilons * (sr6 ** 2 - sr6), 0.0)
+    if cutoff is not None:
+        # Shift the potential so the energy is continuous at the cutoff
+        sr6 = (sigmas / cutoff) ** 6
+        energies -= np.where(valid, 4 * epsilons * (sr6 ** 2 - sr6), 0.0)
+    return energies
+
+
+def _lj_pair_forces(vectors, distances, sigmas, epsilons):
+    # Force over atom j for each pair, the force over atom i is the opposite
+    if np.any(distances < 1E-8):
+        print('ERROR: Too small distance between atoms')
+        distances = np.maximum(distances, 1E-8)
+    sr6 = (sigmas / distances) ** 6
+    magnitude = 24 * epsilons / distances * (2.0 * sr6 ** 2 - sr6)
+    return (magnitude / distances)[..., None] * vectors
+
+
+def lj_energy_gradient(pos, sigmas, epsilons, cp=0.0, cutoff=None):
+    """
+    Energy and gradient of the energy for a Lennard-Jones cluster computed together in a single pass over the pairs
+    of atoms
+
+    :param pos: (numpy.ndarray) Positions of the atoms, any shape that can be reshaped to (natom, 3)
+    :param sigmas: (numpy.ndarray) Matrix with the parameter sigma for each pair of atoms
+    :param epsilons: (numpy.ndarray) Matrix with the parameter epsilon for each pair of atoms
+    :param cp: (float) Constant of an harmonic potential that compacts the cluster
+    :param cutoff: (float) Only pairs of atoms closer than the cutoff interact, the potential is shifted to be zero
+                   at the cutoff. All the pairs interact by default
+    :return: (tuple) Energy and the gradient as a flat array of size 3*natom
+
+    >>> pos = [[0, 0, 0], [1.1, 0, 0], [0, 1.2, 0]]
+    >>> sigmas = np.ones((3, 3))
+    >>> energy, gradient = lj_energy_gradient(pos, sigmas, sigmas)
+    >>> bool(np.isclose(energy, lj_energy(pos, sigmas, sigmas)))
+    True
+    >>> bool(np.allclose(gradient, -lj_forces(pos, sigmas, sigmas)))
+    True
+    """
+    pos = np.array(pos, dtype=float).reshape((-1, 3))
+    natom = len(pos)
+    i, j, vectors, distances, pair_sigmas, pair_epsilons = _lj_pairs(pos, sigmas, epsilons, cutoff)
+    energy = np.sum(_lj_pair_energies(distances, pair_sigmas, pair_epsilons, cutoff))
+    pair_forces = _lj_pair_forces(vectors, distances, pair_sigmas, pair_epsilons)
+    forces = np.zeros((natom, 3))
+    for k in range(3):
+        forces[:, k] = np.bincount(j, pair_forces[:, k], natom) - np.bincount(i, pair_forces[:, k], natom)
     if cp > 0.0:
-        for i in range(n):
-            ret[i] -= cp * pos[i]
-    return ret.flatten()
-
-
-def lj_gradient(pos, sigmas, epsilons, cp=0.0):
-    return -lj_forces(pos, sigmas, epsilons, cp)
-
-
-def lj_energy(pos, sigmas, epsilons, cp=0.0):
-    #cdef int n, i, j
-    #cdef float distance, sr6, ret
-    pos = np.array(pos).reshape((-1, 3))
-    ret = 0
-    n = len(pos)
-    for i in range(n - 1):
-        for j in range(i + 1, n):
-            vector = pos[j] - pos[i]
-            distance = np.linalg.norm(vector)
-            if distance > 1E-10:
-                sr6 = (sigmas[i, j] / distance) ** 6
-                ret += 4 * epsilons[i, j] * (sr6 ** 2 - sr6)
+        forces -= cp * pos
+        energy += 0.5 * cp * np.sum(pos * pos)
+    return float(energy), -forces.flatten()
+
+
+def lj_energy_gradient_batch(positions, sigmas, epsilons, cp=0.0):
+    """
+    Energies and gradients for many clusters with the same atoms evaluated at once
+
+    :param positions: (numpy.ndarray) Positions for all the clusters with shape (ncluster, natom, 3)
+    :param sigmas: (numpy.ndarray) Matrix with the parameter sigma for each pair of atoms, common to all the
+                   clusters with shape (natom, natom) or one for each cluster with shape (ncluster, natom, natom)
+    :param epsilons: (numpy.ndarray) Matrix with the parameter epsilon for each pair of atoms, with the same
+                     shapes as sigmas
+    :param cp: (float) Constant of an harmonic potential that compacts the clusters
+    :return: (tuple) Array of energies with shape (ncluster,) and gradients with shape (ncluster, 3*natom)
+
+    >>> rng = np.random.RandomState(1)
+    >>> positions = 3 * rng.rand(4, 5, 3)
+    >>> sigmas = np.ones((5, 5))
+    >>> energies, gradients = lj_energy_gradient_batch(positions, sigmas, sigmas, cp=0.1)
+    >>> bool(np.allclose(energies, [lj_energy(x, sigmas, sigmas, 0.1) for x in positions]))
+    True
+    >>> bool(np.allclose(gradients, [lj_gradient(x, sigmas, sigmas, 0.1) for x in positions]))
+    True
+    """
+    positions = np.array(positions, dtype=float)
+    ncluster = len(positions)
+    positions = positions.reshape((ncluster, -1, 3))
+    natom = positions.shape[1]
+    i, j = np.triu_indices(natom, 1)
+    vectors = positions[:, j] - positions[:, i]
+    distances = np.sqrt(np.einsum('kij,kij->ki', vectors, vectors))
+    pair_sigmas = np.asarray(sigmas)[..., i, j]
+    pair_epsilons = np.asarray(epsilons)[..., i, j]
+    energies = np.sum(_lj_pair_energies(distances, pair_sigmas, pair_epsilons), axis=1)
+    pair_forces = _lj_pair_forces(vectors, distances, pair_sigmas, pair_epsilons)
+    # Accumulate the forces of all the clusters with a single bincount per direction
+    offsets = natom * np.arange(ncluster)[:, None]
+    index_i = (i + offsets).flatten()
+    index_j = (j + offsets).flatten()
+    forces = np.zeros((ncluster * natom, 3))
+    for k in range(3):
+        values = pair_forces[:, :, k].flatten()
+        forces[:, k] = np.bincount(index_j, values, ncluster * natom) - np.bincount(index_i, values, ncluster * natom)
+    forces = forces.reshape((ncluster, natom, 3))
     if cp > 0.0:
-        for i in range(n):
-            ret += 0.5 * cp * np.linalg.norm(pos[i]) ** 2
-    return ret
+        forces -= cp * positions
+        energies += 0.5 * cp * np.sum(positions * positions, axis=(1, 2))
+    return energies, -forces.reshape((ncluster, -1))
+
+
+def lj_forces(pos, sigmas, epsilons, cp=0.0, cutoff=None):
+    return -lj_energy_gradient(pos, sigmas, epsilons, cp, cutoff)[1]
 
+
+def lj_gradient(pos, sigmas, epsilons, cp=0.0, cutoff=None):
+    return lj_energy_gradient(pos, sigmas, epsilons, cp, cutoff)[1]
+
+
+def lj_energy(pos, sigmas, epsilons, cp=0.0, cutoff=None):
+    pos = np.array(pos, dtype=float).reshape((-1, 3))
+    i, j, vectors, distances, pair_sigmas, pair_epsilons = _lj_pairs(pos, sigmas, epsilons, cutoff)
+    ret = np.sum(_lj_pair_energies(distances, pair_sigmas, pair_epsilons, cutoff))
+    if cp > 0.0:
+        ret += 0.5 * cp * np.sum(pos * pos)
+    return float(ret)
@@ -62,9 +62,10 @@ class CodeSPRKKR:
         wf.write("number of atom types NT\n")
         wf.write(" %2d\n" % self.structure.natom)
         wf.write(" IT  ZT  TXTT  NAT  CONC  IQAT (sites occupied)\n")
+        symbols = self.structure.symbols
         for i in range(self.structure.natom):
-            atomic_z = pychemia.utils.periodic.atomic_number(self.structure.symbols[i])
-            wf.write(" %2d %3d %6s %7d %5.3f %2d\n" % (i+1, atomic_z, self.structure.symbols[i], 1, 1.0, i+1))
+            atomic_z = pychemia.utils.periodic.atomic_number(symbols[i])
+            wf.write(" %2d %3d %6s %7d %5.3f %2d\n" % (i+1, atomic_z, symbols[i], 1, 1.0, i+1))
         wf.close()
 
     def write_pot(self):
@@ -178,9 +179,10 @@ MESH-TYPE EXPONENTIAL
 TYPES
    IT     TXTT        ZT     NCORT     NVALT    NSEMCORSHLT
 """
+        symbols = self.structure.symbols
         for i in range(natom):
-            atomic_z = pychemia.utils.periodic.atomic_number(self.structure.symbols[i])
-            ret += " %2d %6s %5d %7d %5d %2d\n" % (i+1, self.structure.symbols[i], atomic_z, 18, 8-i, 0)
+            atomic_z = pychemia.utils.periodic.atomic_number(symbols[i])
+            ret += " %2d %6s %5d %7d %5d %2d\n" % (i+1, symbols[i], atomic_z, 18, 8-i, 0)
 
         wf = open(name + '.pot', 'w')
         wf.write(ret)
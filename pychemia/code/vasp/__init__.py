@@ -10,7 +10,7 @@ https://www.vasp.at/
 from .kpoints import read_kpoints, write_kpoints
 from .poscar import read_poscar, write_poscar, write_potcar, get_potcar_info
 from .incar import read_incar, write_incar
-from .outcar import VaspOutput, read_vasp_stdout
+from .outcar import VaspOutput, OutcarReader, read_vasp_stdout
 from .vasp import VaspJob, VaspAnalyser
 from .doscar import VaspDoscar
 from .queue import write_from_queue
@@ -18,4 +18,4 @@ from . import task
 from .input import VaspInput
 from .output import VaspOutput
 from .vaspxml import VaspXML
-from .xml_output import parse_vasprun
+from .xml_output import parse_vasprun, iter_vasprun
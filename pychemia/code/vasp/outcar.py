@@ -1,7 +1,19 @@
 import os
 import re
+import mmap
+import numpy as np
 from .output import VaspOutput
 
+# The ionic step ends with the free energy after the forces
+_STEP_END = re.compile(rb'FREE ENERGIE OF THE ION-ELECTRON SYSTEM \(eV\)\s*-+'
+                       rb'\s*free\s+energy\s+TOTEN\s*=\s*([-.\dE+]+)\s*eV'
+                       rb'\s*energy\s+without\s+entropy\s*=\s*[-.\dE+]+\s*energy\(sigma->0\)\s*=\s*[-.\dE+]+[^\n]*\n')
+_POSITION_FORCE = re.compile(rb'TOTAL-FORCE \(eV/Angst\)\s*-*\s*([-.\d\s]+)\s+-{2}')
+_STRESS = re.compile(rb'in\s+kB ([-*.\s\d]+)external')
+_ENERGY = re.compile(rb'Iteration\s*(\d+)\s*\(\s*(\d+)\)[-+*/=():.\s\d\w]+>0\)\s*=\s*([-.\d]+)')
+_NIONS = re.compile(rb'NIONS\s*=\s*(\d+)')
+_FINISHED = b'General timing and accounting informations for this job'
+
 
 def read_vasp_stdout(filename):
     if not os.path.isfile(filename):
@@ -37,3 +49,177 @@ def read_vasp_stdout(filename):
         counter += 1
 
     return {'iterations': number_of_scf_per_ionic_iter, 'energies': final_energy_after_scf, 'data': ret}
+
+
+class OutcarReader:
+    """
+    Incremental reader of the ionic steps in the OUTCAR of a running VASP job.
+    The file is memory-mapped and the byte offset after the last complete ionic step is stored, each call to update
+    parses only the steps appended since the previous call. The positions, forces, stress and free energy of each
+    ionic step are stored on arrays that grow with the number of steps, with the same values and units as VaspOutput.
+    If the file is replaced or truncated, as when a new run starts on the same directory, it is read again from the
+    beginning.
+    """
+
+    _arrays = ('positions', 'forces', 'stress', 'free_energies')
+
+    def __init__(self, filename='OUTCAR'):
+        """
+        Creates the reader and parses the ionic steps already in the file, the file may not exist yet
+
+        :param filename: (str) Path to the OUTCAR
+        """
+        self.filename = filename
+        self.reset()
+        self.update()
+
+    def reset(self):
+        """
+        Forgets all the ionic steps read, the next update reads the file from the beginning
+        """
+        self.offset = 0
+        self.natom = None
+        self.finished = False
+        # Electronic steps as in VaspOutput: [ionic step, electronic step, energy(sigma->0)]
+        self.energies = []
+        self._head = b''
+        self._inode = None
+        self._data = dict.fromkeys(self._arrays)
+        self._sizes = dict.fromkeys(self._arrays, 0)
+
+    def update(self):
+        """
+        Parses the ionic steps completed since the last update
+
+        :return: (int) Number of new ionic steps
+        """
+        if not os.path.isfile(self.filename):
+            return 0
+        nsteps = 0
+        with open(self.filename, 'rb') as rf:
+            stat = os.fstat(rf.fileno())
+            if stat.st_size < self.offset or (self._inode is not None and stat.st_ino != self._inode):
+                self.reset()
+            if stat.st_size == 0:
+                return 0
+            with mmap.mmap(rf.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:len(self._head)] != self._head:
+                    self.reset()
+                self._inode = stat.st_ino
+                self._head = mm[:1024]
+                if self.natom is None:
+                    match = _NIONS.search(mm)
+                    if match is not None:
+                        self.natom = int(match.group(1))
+                for match in _STEP_END.finditer(mm, self.offset):
+                    self._parse_step(mm, self.offset, match)
+                    self.offset = match.end()
+                    nsteps += 1
+                self.finished = mm.find(_FINISHED, max(self.offset, len(mm) - 4096)) >= 0
+        return nsteps
+
+    def _parse_step(self, mm, start, step_end):
+        end = step_end.start()
+        last = None
+        for last in _POSITION_FORCE.finditer(mm, start, end):
+            pass
+        if last is not None:
+            table = np.array(last.group(1).split(), dtype=float).reshape((-1, 6))
+            self._append('positions', table[:, :3])
+            self._append('forces', table[:, 3:])
+
+        last = None
+        for last in _STRESS.finditer(mm, start, end):
+            pass
+        if last is not None:
+            # Converted from kBar to GPa
+            if b'*' in last.group(1):
+                values = 6 * [float('nan')]
+            else:
+                values = 0.1 * np.array(last.group(1).split(), dtype=float)
+            stress = np.zeros((3, 3))
+            stress[[0, 1, 2, 0, 1, 0], [0, 1, 2, 1, 2, 2]] = values
+            stress[[1, 2, 2], [0, 1, 0]] = stress[[0, 1, 0], [1, 2, 2]]
+            self._append('stress', stress)
+
+        nenergies = len(self.energies)
+        for match in _ENERGY.finditer(mm, start, end):
+            self.energies.append([int(match.group(1)), int(match.group(2)), float(match.group(3))])
+        if len(self.energies) == nenergies:
+            # Without the electronic steps, the free energy is used as VaspOutput does
+            self.energies.append([self.nsteps, 1, float(step_end.group(1))])
+        self._append('free_energies', float(step_end.group(1)))
+
+    def _append(self, name, value):
+        # Arrays grow with spare capacity, so a step is added without copying the previous ones
+        array = self._data[name]
+        size = self._sizes[name]
+        value = np.asarray(value, dtype=float)
+        if array is None or size == len(array):
+            new_array = np.zeros((max(8, 2 * size),) + value.shape)
+            if array is not None:
+                new_array[:size] = array
+            array = new_array
+            self._data[name] = array
+        array[size] = value
+        self._sizes[name] = size + 1
+
+    def _get(self, name):
+        if self._data[name] is None:
+            return None
+        return self._data[name][:self._sizes[name]]
+
+    @property
+    def nsteps(self):
+        """
+        Number of complete ionic steps read
+        """
+        return self._sizes['free_energies']
+
+    @property
+    def positions(self):
+        """
+        Cartesian positions of each ionic step with shape (nsteps, natom, 3)
+        """
+        return self._get('positions')
+
+    @property
+    def forces(self):
+        """
+        Forces of each ionic step in eV/Angstrom with shape (nsteps, natom, 3)
+        """
+        return self._get('forces')
+
+    @property
+    def stress(self):
+        """
+        Stress tensor in GPa of the ionic steps that print it, shape (n, 3, 3)
+        """
+        return self._get('stress')
+
+    @property
+    def free_energies(self):
+        """
+        Free energy (TOTEN) at the end of each ionic step
+        """
+        return self._get('free_energies')
+
+    @property
+    def energy(self):
+        if len(self.energies) > 0:
+            return self.energies[-1][-1]
+
+    def has_forces_stress_energy(self):
+        return self.forces is not None and self.stress is not None and self.nsteps > 0
+
+    def relaxation_info(self):
+        """
+        Average absolute values of the forces and stress on the last ionic step, as VaspOutput.relaxation_info
+        """
+        info = {}
+        if self.stress is not None:
+            info['avg_stress_diag'] = np.average(np.abs(self.stress[-1].diagonal()))
+            info['avg_stress_non_diag'] = np.average(np.abs(np.triu(self.stress[-1], 1)))
+        if self.forces is not None:
+            info['avg_force'] = np.average(np.linalg.norm(self.forces[-1], axis=1))
+        return info
@@ -245,6 +245,19 @@ class VaspOutput(CodeOutput):
                 if len(iter_block) > 0:
                     self.iteration_data[io_iter][scf_iter]['Free_Energy'][j] = float(iter_block[0])
 
+    def get_trajectory(self, symbols, cell=None):
+        """
+        Returns a pychemia.core.Trajectory with the positions, forces and stress of all the ionic steps
+
+        :param symbols: (list) Atomic symbols, OUTCAR does not store them in a simple form
+        :param cell: Cell of the structure, None for a non-periodic trajectory
+        :return: (pychemia.core.Trajectory)
+        """
+        from pychemia.core import Trajectory
+        nsteps = len(self.positions)
+        stress = self.stress if self.stress is not None and len(self.stress) == nsteps else None
+        return Trajectory(symbols, positions=self.positions, cell=cell, forces=self.forces, stress=stress)
+
     def has_forces_stress_energy(self):
         return self.forces is not None and self.stress is not None and self.last_energy is not None
 
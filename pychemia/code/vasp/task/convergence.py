@@ -2,7 +2,7 @@ import os
 import json
 import time
 import numpy as np
-from pychemia import pcm_log, HAS_MATPLOTLIB
+from pychemia import pcm_log, HAS_MATPLOTLIB, use_agg_backend
 from pychemia.crystal import KPoints
 from ..vasp import VaspJob
 from ..outcar import read_vasp_stdout
@@ -41,6 +41,7 @@ class Convergence:
 
     def _convergence_plot(self, variable, xlabel, title, figname, annotate):
 
+        use_agg_backend()
         import matplotlib.pyplot as plt
         if not self.is_converge:
             print('Convergence not executed')
@@ -4,7 +4,7 @@ import time
 import json
 import numpy as np
 from pychemia.crystal import KPoints
-from pychemia import pcm_log
+from pychemia import pcm_log, use_agg_backend
 from pychemia.utils.serializer import generic_serializer
 from ..vasp import VaspJob
 from ..outcar import read_vasp_stdout
@@ -74,6 +74,7 @@ class ElasticModuli(Task):
     def plot(self, filedir=None, file_format='pdf'):
         if filedir is None:
             filedir = self.workdir
+        use_agg_backend()
         import matplotlib.pyplot as plt
         plt.switch_backend('agg')
 
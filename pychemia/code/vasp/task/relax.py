@@ -6,12 +6,12 @@ import time
 
 import numpy as np
 
-from pychemia import pcm_log
+from pychemia import pcm_log, use_agg_backend
 from pychemia.crystal import KPoints
 from pychemia.utils.serializer import generic_serializer
 from pychemia.utils.mathematics import round_small
 from ..input import VaspInput
-from ..outcar import VaspOutput, read_vasp_stdout
+from ..outcar import VaspOutput, OutcarReader, read_vasp_stdout
 from ..poscar import read_poscar
 from ..vasp import VaspJob, VaspAnalyser
 from ...relaxator import Relaxator
@@ -55,6 +55,8 @@ class IonRelaxation(Relaxator, Task):
         task_params = {'target_forces': self.target_forces, 'encut': self.encut, 'relax_cell': self.relax_cell,
                        'max_calls': self.max_calls}
         Task.__init__(self, structure=structure, task_params=task_params, workdir=workdir, executable=executable)
+        # Only the ionic steps appended to the OUTCAR are parsed on each update
+        self.outcar_reader = OutcarReader(self.workdir + os.sep + 'OUTCAR')
 
     def create_dirs(self, clean=False):
         if not os.path.isdir(self.workdir):
@@ -72,14 +74,14 @@ class IonRelaxation(Relaxator, Task):
         """
         vj = self.vaspjob
 
+        # The outputs of the VaspJob are kept up to date for the code reading vaspjob.outcar
         if os.path.isfile(self.workdir + os.sep + 'OUTCAR'):
             vj.get_outputs()
 
         max_force, max_stress = self.get_max_force_stress()
         if max_force is not None and max_stress is not None:
             pcm_log.debug('Max Force: %9.3E Stress: %9.3E' % (max_force, max_stress))
-            vo = VaspOutput(self.workdir + os.sep + 'OUTCAR')
-            info = vo.relaxation_info()
+            info = self.outcar_reader.relaxation_info()
             pcm_log.debug('Avg Force: %9.3E Stress: %9.3E %9.3E' % (info['avg_force'],
                                                                     info['avg_stress_diag'],
                                                                     info['avg_stress_non_diag']))
@@ -87,8 +89,7 @@ class IonRelaxation(Relaxator, Task):
             print('Failure to get forces and stress')
             return False
 
-        vo = VaspOutput(self.workdir + os.sep + 'OUTCAR')
-        info = vo.relaxation_info()
+        info = self.outcar_reader.relaxation_info()
         if len(info) != 3:
             print(' Missing some data in OUTCAR (forces or stress)')
 
@@ -278,17 +279,11 @@ class IonRelaxation(Relaxator, Task):
 
     def get_forces_stress_energy(self):
 
-        filename = self.workdir + os.sep + 'OUTCAR'
-        if os.path.isfile(filename):
-            self.vaspjob.get_outputs()
-            if self.vaspjob.outcar.has_forces_stress_energy():
-                forces = self.vaspjob.outcar.forces[-1]
-                stress = self.vaspjob.outcar.stress[-1]
-                total_energy = self.vaspjob.outcar.final_data['energy']['free_energy']
-            else:
-                forces = None
-                stress = None
-                total_energy = None
+        self.outcar_reader.update()
+        if self.outcar_reader.has_forces_stress_energy():
+            forces = self.outcar_reader.forces[-1]
+            stress = self.outcar_reader.stress[-1]
+            total_energy = self.outcar_reader.free_energies[-1]
         else:
             forces = None
             stress = None
@@ -309,6 +304,7 @@ class IonRelaxation(Relaxator, Task):
     def plot(self, filedir=None, file_format='pdf'):
         if filedir is None:
             filedir = self.workdir
+        use_agg_backend()
         import matplotlib.pyplot as plt
         plt.switch_backend('agg')
 
@@ -6,12 +6,12 @@ import time
 
 import numpy as np
 
-from pychemia import pcm_log
+from pychemia import pcm_log, use_agg_backend
 from pychemia.crystal import KPoints
 from pychemia.utils.serializer import generic_serializer
-from ..outcar import VaspOutput, read_vasp_stdout
+from ..outcar import OutcarReader, read_vasp_stdout
 from ..poscar import read_poscar
-from ..vasp import VaspJob, VaspAnalyser, VaspOutput
+from ..vasp import VaspJob, VaspAnalyser
 from ..input import VaspInput
 from ...relaxator import Relaxator
 from ...tasks import Task
@@ -39,6 +39,8 @@ class IonRelaxation2(Relaxator, Task):
         task_params = {'target_forces': self.target_forces, 'encut': self.encut, 'relax_cell': self.relax_cell}
         Task.__init__(self, structure=structure, task_params=task_params, workdir=workdir, executable=executable)
         self.stage = 1
+        # Only the ionic steps appended to the OUTCAR are parsed on each update
+        self.outcar_reader = OutcarReader(self.workdir + os.sep + 'OUTCAR')
 
     def create_dirs(self, clean=False):
         if not os.path.isdir(self.workdir):
@@ -214,8 +216,7 @@ class IonRelaxation2(Relaxator, Task):
                 max_force, max_stress = self.get_max_force_stress()
                 if max_force is not None and max_stress is not None:
                     pcm_log.debug('Max Force: %9.3E Stress: %9.3E' % (max_force, max_stress))
-                    vo = VaspOutput(self.workdir + os.sep + 'OUTCAR')
-                    info = vo.relaxation_info()
+                    info = self.outcar_reader.relaxation_info()
                     pcm_log.debug('Avg Force: %9.3E Stress: %9.3E %9.3E' % (info['avg_force'],
                                                                             info['avg_stress_diag'],
                                                                             info['avg_stress_non_diag']))
@@ -267,11 +268,11 @@ class IonRelaxation2(Relaxator, Task):
 
         filename = self.workdir + os.sep + 'OUTCAR'
         if os.path.isfile(filename):
-            vo = VaspOutput(filename)
-            if vo.has_forces_stress_energy():
-                forces = vo.forces[-1]
-                stress = vo.stress[-1]
-                total_energy = vo.final_data['energy']['free_energy']
+            self.outcar_reader.update()
+            if self.outcar_reader.has_forces_stress_energy():
+                forces = self.outcar_reader.forces[-1]
+                stress = self.outcar_reader.stress[-1]
+                total_energy = self.outcar_reader.free_energies[-1]
             else:
                 print('ERROR: VaspOuput says no forces')
                 forces = None
@@ -298,6 +299,7 @@ class IonRelaxation2(Relaxator, Task):
     def plot(self, filedir=None, file_format='pdf'):
         if filedir is None:
             filedir = self.workdir
+        use_agg_backend()
         import matplotlib.pyplot as plt
         plt.switch_backend('agg')
 
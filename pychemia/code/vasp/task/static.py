@@ -3,7 +3,7 @@ import time
 import json
 import numpy as np
 from pychemia.crystal import KPoints
-from pychemia import pcm_log
+from pychemia import pcm_log, use_agg_backend
 from pychemia.utils.serializer import generic_serializer
 from ..vasp import VaspJob
 from ..outcar import read_vasp_stdout
@@ -83,6 +83,7 @@ class StaticCalculation(Task):
         if not self.finished:
             print('The task is not finished')
             return
+        use_agg_backend()
         import matplotlib.pyplot as plt
         plt.switch_backend('agg')
         plt.figure(figsize=(8, 6))
@@ -100,6 +100,7 @@ class IdealStrength(Task):
     def plot(self, filedir=None, file_format='pdf'):
         if filedir is None:
             filedir = self.workdir
+        pychemia.use_agg_backend()
         import matplotlib.pyplot as plt
         plt.switch_backend('agg')
 
@@ -3,11 +3,12 @@ Created on April 25 2020
 @author: Pedram Tavadze
 """
 import os
+import collections
 import numpy as np
-from .xml_output import parse_vasprun
+from .xml_output import parse_vasprun, parse_vasprun_header, iter_vasprun
 from .incar import VaspInput
 from ..codes import CodeOutput
-from ...core import Structure 
+from ...core import Structure, Trajectory
 from ...visual import DensityOfStates
 from ...crystal.kpoints import KPoints
 
@@ -15,8 +16,15 @@ from ...crystal.kpoints import KPoints
 
 class VaspXML(CodeOutput):
     
-    def __init__(self, filename='vasprun.xml'):
-        
+    def __init__(self, filename='vasprun.xml', streaming=False):
+        """
+        Output of VASP from a vasprun.xml file
+
+        :param filename: (str) Name of the vasprun.xml file
+        :param streaming: (bool) If True the file is not read at once, the ionic steps are read one at a time when
+                          the structures, forces or energies are requested, skipping the eigenvalues and projections.
+                          The other properties read the whole file the first time they are used
+        """
         CodeOutput.__init__(self)
         if not os.path.isfile(filename):
             raise ValueError('File not found ' + filename)
@@ -28,12 +36,56 @@ class VaspXML(CodeOutput):
         # self.stress = None
         self.bands = None
         #self.array_sizes = {}
-        self.data = self.read()
-
+        self.streaming = streaming
+        self._data = None
+        self._header = None
+        if not streaming:
+            self._data = self.read()
 
     def read(self):
         return parse_vasprun(self.filename)
-    
+
+    @property
+    def data(self):
+        """
+        Returns all the contents of the file as a python dictionary
+        """
+        if self._data is None:
+            self._data = self.read()
+        return self._data
+
+    @property
+    def header(self):
+        """
+        Returns the information about the run before the first ionic step (incar, kpoints, parameters, atoms)
+        """
+        if self._data is not None:
+            return self._data
+        if self._header is None:
+            self._header = parse_vasprun_header(self.filename)
+        return self._header
+
+    def iter_steps(self, sections=None):
+        """
+        Iterates over the ionic steps in the file, see pychemia.code.vasp.xml_output.iter_vasprun
+
+        :param sections: (list) Names of the elements to read from each step, None for all of them
+        :return: (generator) One dictionary for each ionic step
+        """
+        return iter_vasprun(self.filename, sections=sections)
+
+    def iter_structures(self):
+        """
+        Iterates over the structures of the ionic steps as pychemia.core.Structure objects
+        """
+        symbols = self.symbols
+        if self._data is not None:
+            steps = self._data['structures']
+        else:
+            steps = (x['structure'] for x in self.iter_steps(['structure']))
+        for ist in steps:
+            yield Structure(symbols=symbols, cell=ist['cell'], reduced=ist['reduced'])
+
     
 
                
@@ -56,9 +108,10 @@ class VaspXML(CodeOutput):
         if 'partial' in self.data['general']['dos']:
             dos_projected = {}
             ion_list = ["ion %s"%str(x+1) for x in atoms] # using this name as vasrun.xml uses ion #
+            symbols = self.initial_structure.symbols
             for i in range(len(ion_list)):
                 iatom = ion_list[i]
-                name = self.initial_structure.symbols[atoms[i]]+str(atoms[i])
+                name = symbols[atoms[i]]+str(atoms[i])
                 spins = list(self.data['general']['dos']['partial']['array']['data'][iatom].keys())
                 energies = np.array(self.data['general']['dos']['partial']['array']['data'][iatom][spins[0]][spins[0]])[:,0]
                 dos_projected[name] ={'energies':energies}
@@ -192,12 +245,12 @@ class VaspXML(CodeOutput):
         Returns the kpoints used in the calculation in form of a pychemia.core.KPoints object
         """
         
-        if self.data['kpoints_info']['mode'] == 'listgenerated':
-            kpoints = KPoints(kmode='path',kvertices=self.data['kpoints_info']['kpoint_vertices'])
+        if self.header['kpoints_info']['mode'] == 'listgenerated':
+            kpoints = KPoints(kmode='path',kvertices=self.header['kpoints_info']['kpoint_vertices'])
         else :
-            kpoints = KPoints(kmode=self.data['kpoints_info']['mode'].lower(),
-                               grid=self.data['kpoints_info']['kgrid'],
-                               shifts=self.data['kpoints_info']['user_shift'])
+            kpoints = KPoints(kmode=self.header['kpoints_info']['mode'].lower(),
+                               grid=self.header['kpoints_info']['kgrid'],
+                               shifts=self.header['kpoints_info']['user_shift'])
         return kpoints
     
     @property
@@ -205,15 +258,15 @@ class VaspXML(CodeOutput):
         """
         Returns the list of kpoints and weights used in the calculation in form of a pychemia.core.KPoints object
         """
-        return KPoints(kmode='reduced',kpoints_list=self.data['kpoints']['kpoints_list'], 
-                       weights=self.data['kpoints']['k_weights'])  
+        return KPoints(kmode='reduced',kpoints_list=self.header['kpoints']['kpoints_list'], 
+                       weights=self.header['kpoints']['k_weights'])  
     
     @property 
     def incar(self):
         """
         Returns the incar parameters used in the calculation as pychemia.code.vasp.VaspIncar object
         """
-        return VaspInput(variables=self.data['incar'])
+        return VaspInput(variables=self.header['incar'])
         
     @property
     def final_data(self):
@@ -229,14 +282,14 @@ class VaspXML(CodeOutput):
         """
         Returns all of the parameters vasp has used in this calculation
         """
-        return self.data['vasp_params']
+        return self.header['vasp_params']
 
     @property 
     def potcar_info(self):
         """
         Returns the information about pseudopotentials(POTCAR) used in this calculation
         """
-        return self.data['atom_info']['atom_types']
+        return self.header['atom_info']['atom_types']
 
     @property 
     def fermi(self):
@@ -252,16 +305,50 @@ class VaspXML(CodeOutput):
         """
         return self.initial_structure.species
 
+    @property
+    def symbols(self):
+        """
+        Returns the atomic symbols in POSCAR
+        """
+        return [x.strip() for x in self.header['atom_info']['symbols']]
+
+    @property
+    def trajectory(self):
+        """
+        Returns a pychemia.core.Trajectory with the positions, cell, energy and forces of all the ionic steps
+        """
+        symbols = self.symbols
+        if self._data is None:
+            return self._stream_trajectory()
+        nsteps = len(self.data['structures'])
+        reduced = np.array([ist['reduced'] for ist in self.data['structures']])
+        cells = np.array([ist['cell'] for ist in self.data['structures']])
+        # Energy at the last electronic step of each ionic step
+        ionic_energies = {}
+        for ion_step, scf_step, energy in self.energies:
+            ionic_energies[ion_step] = energy
+        energies = [ionic_energies[x] for x in sorted(ionic_energies)]
+        if len(energies) != nsteps:
+            energies = None
+        forces = self.data['forces'] if len(self.data['forces']) == nsteps else None
+        return Trajectory(symbols, reduced=reduced, cell=cells.reshape((-1, 3, 3)), energies=energies, forces=forces)
+
+    def _stream_trajectory(self):
+        # Frames are appended one ionic step at a time, the energy is the one of the last electronic step
+        traj = Trajectory(self.symbols, cell=np.eye(3))
+        for step in self.iter_steps(['structure', 'forces', 'scstep']):
+            cell = np.array(step['structure']['cell'])
+            positions = np.dot(step['structure']['reduced'], cell)
+            energy = step['scsteps'][-1]['energy']['e_0_energy'] if len(step['scsteps']) > 0 else None
+            traj.append(positions, cell=cell, energy=energy, forces=step.get('forces'))
+        return traj
+
     @property 
     def structures(self):
         """
         Returns a list of pychemia.core.Structure representing all the ionic step structures
         """
-        symbols = [x.strip() for x in self.data['atom_info']['symbols']]
-        structures = []
-        for ist in self.data['structures']:
-            structures.append(Structure(symbols=symbols,reduced=ist['reduced'],cell=ist['cell']))
-        return structures
+        return list(self.trajectory)
     
     
     @property 
@@ -269,6 +356,8 @@ class VaspXML(CodeOutput):
         """
         Returns all the forces in ionic steps
         """
+        if self._data is None:
+            return [x['forces'] for x in self.iter_steps(['forces'])]
         return self.data['forces']
     
     
@@ -277,15 +366,14 @@ class VaspXML(CodeOutput):
         """
         Returns the initial Structure as a pychemia structure
         """
-        return self.structures[0]
+        return next(self.iter_structures())
 
     @property 
     def final_structure(self):
         """
         Returns the final Structure as a pychemia structure
         """
-        
-        return self.structures[-1]
+        return collections.deque(self.iter_structures(), maxlen=1)[0]
 
     @property 
     def iteration_data(self):
@@ -303,7 +391,11 @@ class VaspXML(CodeOutput):
         ion_step = 0
         double_counter = 1
         energies = []
-        for calc in self.data['calculation']:
+        if self._data is None:
+            calculation = (x for step in self.iter_steps(['scstep']) for x in step['scsteps'])
+        else:
+            calculation = self.data['calculation']
+        for calc in calculation:
             if 'ewald' in calc['energy']:
                 if double_counter == 0 :
                     double_counter+=1
@@ -358,7 +450,11 @@ class VaspXML(CodeOutput):
         else :
             ediffg = self.vasp_parameters['ionic']['EDIFFG']
             if ediffg < 0 :
-                last_forces_abs = np.abs(np.array(self.forces[-1]))
+                if self._data is None:
+                    last_forces = collections.deque(self.iter_steps(['forces']), maxlen=1)[0]['forces']
+                else:
+                    last_forces = self.forces[-1]
+                last_forces_abs = np.abs(np.array(last_forces))
                 return not(np.any(last_forces_abs > abs(ediffg)))
             else :
                 last_ionic_energy = energies[(energies[:,0] == nsteps)][-1][-1]
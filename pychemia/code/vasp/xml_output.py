@@ -129,155 +129,238 @@ def get_general(xml_tree, ret):
         return ret   
 
 
+def get_kpoints(xml_tree):
+    """Returns the information about the kpoints, the list of kpoints and their weights """
+    kpoints_info = {}
+    kpoints_list = []
+    k_weights = []
+    for ielement in xml_tree:
+        if ielement.items()[0][0] == 'param':
+            kpoints_info['mode'] = ielement.items()[0][1]
+            if kpoints_info['mode'] == 'listgenerated':
+                kpoints_info['kpoint_vertices'] = []
+                for isub in ielement:
+
+                    if isub.attrib == 'divisions':
+                        kpoints_info['ndivision'] = int(isub.text)
+                    else:
+                        if len(isub.text.split()) != 3:
+                            continue
+                        kpoints_info['kpoint_vertices'].append([float(x) for x in isub.text.split()])
+            else:
+                for isub in ielement:
+                    if isub.attrib['name'] == 'divisions':
+                        kpoints_info['kgrid'] = [int(x) for x in isub.text.split()]
+                    elif isub.attrib['name'] == 'usershift':
+                        kpoints_info['user_shift'] = [float(x) for x in isub.text.split()]
+                    elif isub.attrib['name'] == 'genvec1':
+                        kpoints_info['genvec1'] = [float(x) for x in isub.text.split()]
+                    elif isub.attrib['name'] == 'genvec2':
+                        kpoints_info['genvec2'] = [float(x) for x in isub.text.split()]
+                    elif isub.attrib['name'] == 'genvec3':
+                        kpoints_info['genvec3'] = [float(x) for x in isub.text.split()]
+                    elif isub.attrib['name'] == 'shift':
+                        kpoints_info['shift'] = [float(x) for x in isub.text.split()]
+
+        elif ielement.items()[0][1] == 'kpointlist':
+            for ik in ielement:
+                kpoints_list.append([float(x) for x in ik.text.split()])
+            kpoints_list = array(kpoints_list)
+        elif ielement.items()[0][1] == 'weights':
+            for ik in ielement:
+                k_weights.append(float(ik.text))
+            k_weights = array(k_weights)
+    return kpoints_info, kpoints_list, k_weights
+
+
+def get_atominfo(xml_tree):
+    """Returns a dictionary with the number of atoms, symbols and species """
+    atom_info = {}
+    for ielement in xml_tree:
+        if ielement.tag == 'atoms':
+            atom_info['natom'] = int(ielement.text)
+        elif ielement.tag == 'types':
+            atom_info['nspecies'] = int(ielement.text)
+        elif ielement.tag == 'array':
+            if ielement.attrib['name'] == 'atoms':
+                for isub in ielement:
+                    if isub.tag == 'set':
+                        atom_info['symbols'] = []
+                        for isym in isub:
+                            atom_info['symbols'].append(isym[0].text)
+            elif ielement.attrib['name'] == 'atomtypes':
+                atom_info['atom_types'] = {}
+                for isub in ielement:
+                    if isub.tag == 'set':
+                        for iatom in isub:
+                            atom_info['atom_types'][iatom[1].text] = {}
+                            atom_info['atom_types'][iatom[1].text]['natom_per_specie'] = int(iatom[0].text)
+                            atom_info['atom_types'][iatom[1].text]['mass'] = float(iatom[2].text)
+                            atom_info['atom_types'][iatom[1].text]['valance'] = float(iatom[3].text)
+                            atom_info['atom_types'][iatom[1].text]['pseudopotential'] = iatom[4].text.strip()
+    return atom_info
+
+
+def get_header(xml_tree, header):
+    """Stores on header the contents of an element outside the calculations """
+    if xml_tree.tag == 'generator':
+        for ielement in xml_tree:
+            header['run_info'][ielement.attrib['name']] = ielement.text
+    elif xml_tree.tag == 'incar':
+        header['incar'] = get_params(xml_tree, header['incar'])
+    elif xml_tree.tag == 'kpoints':
+        header['kpoints_info'], kpoints_list, k_weights = get_kpoints(xml_tree)
+        header['kpoints'] = {'kpoints_list': kpoints_list, 'k_weights': k_weights}
+    elif xml_tree.tag == 'parameters':
+        header['vasp_params'] = get_params(xml_tree, header['vasp_params'])
+    elif xml_tree.tag == 'atominfo':
+        header['atom_info'] = get_atominfo(xml_tree)
+    elif xml_tree.tag == 'structure':
+        # The structure named 'primitive_cell' is skipped
+        if xml_tree.attrib['name'] == 'initialpos':
+            header['initial_structure'] = get_structure(xml_tree)
+        elif xml_tree.attrib['name'] == 'finalpos':
+            header['final_structure'] = get_structure(xml_tree)
+    return header
+
+
+def get_calculation_element(xml_tree, step):
+    """Stores on step the contents of an element inside a calculation (one ionic step) """
+    if xml_tree.tag == 'scstep':
+        step['scsteps'].append(get_scstep(xml_tree))
+    elif xml_tree.tag == 'structure':
+        step['structure'] = get_structure(xml_tree)
+    elif xml_tree.tag == 'varray' and xml_tree.attrib['name'] in ['forces', 'stress']:
+        step[xml_tree.attrib['name']] = get_varray(xml_tree)
+    elif xml_tree.tag == 'energy':
+        step['energy'] = {x.attrib['name']: float(x.text) for x in xml_tree}
+    elif xml_tree.tag == 'separator' and xml_tree.attrib['name'] == 'orbital magnetization':
+        step['orbital_magnetization'] = {x.attrib['name']: [float(y) for y in x.text.split()] for x in xml_tree}
+    elif xml_tree.tag != 'varray':
+        step['general'][xml_tree.tag] = get_general(xml_tree, {})
+    return step
+
+
+def _section(xml_tree):
+    # Name used to select the elements inside a calculation
+    if xml_tree.tag in ['varray', 'separator']:
+        return xml_tree.attrib['name']
+    return xml_tree.tag
+
+
+def _new_header():
+    return {'run_info': {}, 'incar': {}, 'kpoints_info': {}, 'vasp_params': {},
+            'kpoints': {'kpoints_list': [], 'k_weights': []}, 'atom_info': {}}
+
+
+def _iterparse(vasprun, sections, header, header_only=False):
+    """
+    Reads the file with iterparse, each element is removed from the tree after it is processed and the elements
+    inside the sections not requested are removed as soon as they are read, so the memory used is bounded by the
+    largest requested element and not by the size of the file.
+    """
+    stack = []
+    skip = None
+    step = None
+    for event, elem in ET.iterparse(vasprun, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            if len(stack) == 2 and elem.tag == 'calculation':
+                if header_only:
+                    return
+                step = {'scsteps': [], 'general': {}}
+            elif len(stack) == 3 and step is not None and sections is not None and _section(elem) not in sections:
+                skip = elem
+            continue
+
+        stack.pop()
+        depth = len(stack)
+        if skip is not None and elem is not skip:
+            # Inside a section not requested
+            elem.clear()
+            stack[-1].remove(elem)
+            continue
+        if depth == 1:
+            if elem.tag == 'calculation':
+                yield step
+                step = None
+            else:
+                get_header(elem, header)
+        elif depth == 2 and step is not None:
+            if elem is skip:
+                skip = None
+            else:
+                get_calculation_element(elem, step)
+        else:
+            continue
+        elem.clear()
+        stack[-1].remove(elem)
+
+
+def iter_vasprun(vasprun, sections=None, header=None):
+    """
+    Reads the ionic steps (the 'calculation' elements) of a vasprun.xml one at a time without keeping the whole
+    file in memory.
+    Each step is a dictionary with the keys 'scsteps' (list of electronic steps) and 'general' (other elements parsed
+    with get_general) and, when they are present, 'structure', 'forces', 'stress', 'energy' and
+    'orbital_magnetization'.
+
+    :param vasprun: (str) Name of the vasprun.xml file or a file object
+    :param sections: (list) Names of the elements to read from each step, for example ['structure', 'forces',
+                     'scstep']. The varray and separator elements are selected by their name ('forces', 'stress',
+                     'orbital magnetization'). Elements like 'eigenvalues', 'dos' or 'projected' are skipped if they
+                     are not in the list. None reads all the elements
+    :param header: (dict) If given, it is filled with the information outside the calculations ('run_info', 'incar',
+                   'kpoints_info', 'kpoints', 'vasp_params', 'atom_info', 'initial_structure' and
+                   'final_structure'), the values after the calculations are available when the iteration ends
+    :return: (generator) One dictionary for each ionic step
+    """
+    if header is None:
+        header = {}
+    header.update(_new_header())
+    if sections is not None:
+        sections = set(sections)
+    return _iterparse(vasprun, sections, header)
+
+
+def parse_vasprun_header(vasprun):
+    """
+    Reads the information of a vasprun.xml before the first ionic step, the calculations are not read
+
+    :param vasprun: (str) Name of the vasprun.xml file or a file object
+    :return: (dict) Same keys as the header filled by iter_vasprun, without the final structure
+    """
+    header = _new_header()
+    for step in _iterparse(vasprun, None, header, header_only=True):
+        pass
+    return header
+
+
 def parse_vasprun(vasprun):
-    tree = ET.parse(vasprun)
-    root = tree.getroot()
+    """
+    Reads all the contents of a vasprun.xml, the file is read with iter_vasprun so the XML tree is never complete in
+    memory, only the dictionary returned.
 
+    :param vasprun: (str) Name of the vasprun.xml file or a file object
+    :return: (dict)
+    """
     calculation = []
     structures = []
     forces = []
     stresses = []
-    orbital_magnetization = {}
-    run_info = {}
-    incar = {}
     general = {}
-    kpoints_info = {}
-    vasp_params = {}
-    kpoints_list = [] 
-    k_weights = []
-    atom_info = {} 
-    for ichild in root:
-
-        if ichild.tag == 'generator':
-            for ielement in ichild:
-                run_info[ielement.attrib['name']] = ielement.text
-
-        elif ichild.tag == 'incar':
-            incar = get_params(ichild, incar)
-    
-        ## Skipping 1st structure which is primitive cell
-        elif ichild.tag == 'kpoints':
-    
-            for ielement in ichild:
-                if ielement.items()[0][0] == 'param': 
-                    kpoints_info['mode'] = ielement.items()[0][1] 
-                    if kpoints_info['mode'] == 'listgenerated':
-                        kpoints_info['kpoint_vertices'] = []
-                        for isub in ielement:
-                            
-                            if isub.attrib == 'divisions':
-                                kpoints_info['ndivision'] = int(isub.text)
-                            else:
-                                if len(isub.text.split()) !=3:
-                                    continue
-                                kpoints_info['kpoint_vertices'].append([float(x) for x in isub.text.split()])
-                    else : 
-                        for isub in ielement:
-                            if isub.attrib['name'] == 'divisions': 
-                                kpoints_info['kgrid'] = [int(x) for x in isub.text.split()] 
-                            elif isub.attrib['name'] == 'usershift': 
-                                kpoints_info['user_shift'] = [float(x) for x in isub.text.split()] 
-                            elif isub.attrib['name'] == 'genvec1': 
-                                kpoints_info['genvec1'] = [float(x) for x in isub.text.split()] 
-                            elif isub.attrib['name'] == 'genvec2': 
-                                kpoints_info['genvec2'] = [float(x) for x in isub.text.split()] 
-                            elif isub.attrib['name'] == 'genvec3': 
-                                kpoints_info['genvec3'] = [float(x) for x in isub.text.split()] 
-                            elif isub.attrib['name'] == 'shift': 
-                                kpoints_info['shift'] = [float(x) for x in isub.text.split()] 
-    
-                elif ielement.items()[0][1] == 'kpointlist': 
-                    for ik in ielement:
-                        kpoints_list.append([float(x) for x in ik.text.split()]) 
-                    kpoints_list = array(kpoints_list)
-                elif ielement.items()[0][1] == 'weights': 
-                    for ik in ielement:
-                        k_weights.append(float(ik.text))
-                    k_weights = array(k_weights)
-                    
-        ## Vasp Parameters 
-        elif ichild.tag == 'parameters':
-            vasp_params = get_params(ichild,vasp_params) 
-    
-        ## Atom info
-        elif ichild.tag == 'atominfo':
-
-            for ielement in ichild:
-                if ielement.tag == 'atoms':
-                    atom_info['natom'] = int(ielement.text) 
-                elif ielement.tag == 'types':
-                    atom_info['nspecies'] = int(ielement.text) 
-                elif ielement.tag == 'array':
-                    if ielement.attrib['name'] == 'atoms': 
-                        for isub in ielement:
-                            if isub.tag == 'set': 
-                                atom_info['symbols'] = [] 
-                                for isym  in isub : 
-                                    atom_info['symbols'].append(isym[0].text) 
-                    elif ielement.attrib['name'] == 'atomtypes': 
-                        atom_info['atom_types'] = {} 
-                        for isub in ielement:
-                            if isub.tag == 'set': 
-                                for iatom in isub:
-                                    atom_info['atom_types'][iatom[1].text] = {} 
-                                    atom_info['atom_types'][iatom[1].text]['natom_per_specie'] = int(iatom[0].text) 
-                                    atom_info['atom_types'][iatom[1].text]['mass'] = float(iatom[2].text) 
-                                    atom_info['atom_types'][iatom[1].text]['valance'] = float(iatom[3].text) 
-                                    atom_info['atom_types'][iatom[1].text]['pseudopotential'] = iatom[4].text.strip()
-
-        elif ichild.tag == 'structure':
-            if ichild.attrib['name'] == 'initialpos': 
-                initial_pos = get_structure(ichild)
-            elif ichild.attrib['name'] == 'finalpos': 
-                final_pos = get_structure(ichild)
-
-        elif ichild.tag == 'calculation':
-            for ielement in ichild:
-                if  ielement.tag == 'scstep': 
-                    calculation.append(get_scstep(ielement)) 
-                elif ielement.tag == 'structure':
-                    structures.append(get_structure(ielement))
-                elif ielement.tag == 'varray': 
-                    if ielement.attrib['name'] == 'forces': 
-                        forces.append(get_varray(ielement)) 
-                    elif ielement.attrib['name'] == 'stress': 
-                        stresses.append(get_varray(ielement)) 
-                        
-                # elif ielement.tag == 'eigenvalues': 
-                #     for isub in ielement[0] :  
-                #         if isub.tag == 'set': 
-                #             for iset in isub : 
-                #                 eigen_values[iset.attrib['comment']] = {} 
-                #                 for ikpt in iset :  
-                #                     eigen_values[iset.attrib['comment']][ikpt.attrib['comment']] = get_varray(ikpt) 
-                
-                elif ielement.tag == 'separator': 
-                    if ielement.attrib['name'] == "orbital magnetization": 
-                        for isub in ielement:
-                            orbital_magnetization[isub.attrib['name']] = [float(x) for x in isub.text.split()]
-
-                # elif ielement.tag == 'dos': 
-                #     for isub in ielement :  
-                #         if 'name' in isub.attrib: 
-                #             if isub.attrib['name'] == 'efermi' :  
-                #                 dos['efermi'] = float(isub.text) 
-                #             else :  
-                #                 dos[isub.tag] = {} 
-                #                 dos[isub.tag]['info'] = [] 
-                #               for iset in isub[0]  : 
-                #                   if iset.tag == 'set' : 
-                #                       for isub_set in iset: 
-                #                           dos[isub.tag] = get_set(isub_set,dos[isub.tag]) 
-                #                   elif iset.tag == 'field' : 
-                #                       dos[isub.tag]['info'].append(iset.text.strip(' '))
-                else:
-                    general[ielement.tag] = {}
-                    general[ielement.tag] = get_general(ielement, general[ielement.tag])
-        # NEED TO ADD ORBITAL MAGNETIZATION 
-
-    return {'calculation': calculation, 'structures': structures, 'forces': forces, 'run_info': run_info,
-            'incar': incar, 'general': general, 'kpoints_info': kpoints_info, 'vasp_params': vasp_params,
-            'kpoints': {'kpoints_list': kpoints_list, 'k_weights': k_weights}, 'atom_info': atom_info}
-
-
+    header = {}
+    for step in iter_vasprun(vasprun, header=header):
+        calculation += step['scsteps']
+        if 'structure' in step:
+            structures.append(step['structure'])
+        if 'forces' in step:
+            forces.append(step['forces'])
+        if 'stress' in step:
+            stresses.append(step['stress'])
+        general.update(step['general'])
 
+    ret = {'calculation': calculation, 'structures': structures, 'forces': forces, 'stresses': stresses,
+           'general': general}
+    ret.update(header)
+    return ret
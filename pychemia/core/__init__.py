@@ -8,10 +8,17 @@ The class 'Structure' is used to store and manipulated chemical structures, ie,
 and in the case of crystals, a lattice.
 
 The class 'Element' allow the retrieval of chemical and physical information about chemical species.
+
+The class 'NeighborList' stores the neighbors of each atom inside a cutoff radius for periodic and non-periodic
+structures.
+
+The class 'Trajectory' stores many frames of a structure with fixed species, like relaxations or molecular dynamics.
 """
 
 from .composition import Composition
 from .structure import Structure
 from .element import Element
+from .neighbors import NeighborList
+from .trajectory import Trajectory
 
 # __all__ = filter(lambda s: not s.startswith('_'), dir())
@@ -67,16 +67,13 @@ def reduce_bases(extended_bases, tolerance):
 def get_shortest_bases_from_extented_bases(extended_bases, tolerance):
     # print 'get_shortest_bases_from_extented_bases',tolerance
 
-    def mycmp(x, y):
-        return cmp(_np.vdot(x, x), _np.vdot(y, y))
-
     basis = _np.zeros((7, 3), dtype=float)
     basis[:4] = extended_bases
     basis[4] = extended_bases[0] + extended_bases[1]
     basis[5] = extended_bases[1] + extended_bases[2]
     basis[6] = extended_bases[2] + extended_bases[0]
     # Sort bases by the lengthes (shorter is earlier)
-    basis = sorted(basis, cmp=mycmp)
+    basis = sorted(basis, key=lambda x: _np.vdot(x, x))
 
     # Choose shortest and linearly independent three bases
     # This algorithm may not be perfect.
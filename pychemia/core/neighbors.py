@@ -0,0 +1,240 @@
+"""
+Neighbor lists for periodic and non-periodic structures.
+The neighbors are located using a KD-tree (scipy.spatial.cKDTree) built over the atoms and the periodic images
+that are close enough to the cell, so the cost of building the list grows linearly with the number of atoms.
+"""
+
+import numpy as np
+
+from pychemia import pcm_log
+
+
+class NeighborList:
+    """
+    Stores for each atom in a Structure all the atoms (and periodic images) inside a sphere of radius 'cutoff'.
+    The list is built for a radius cutoff + skin, so small displacements of the atoms can be processed with
+    'update' recomputing only the distances. Only the atoms that move more than half of the skin are searched again.
+    Each pair is stored in both directions, i.e. if j is a neighbor of i, then i is a neighbor of j.
+    """
+
+    def __init__(self, structure, cutoff, skin=0.0):
+        """
+        Creates the neighbor list for a given Structure
+
+        :param structure: (pychemia.Structure) The structure, periodic or not
+        :param cutoff: (float) Maximal distance between two neighbors
+        :param skin: (float) Extra distance for the candidate pairs, used to avoid rebuilding the list after small
+                     displacements of the atoms
+
+        >>> from pychemia import Structure
+        >>> st = Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+        >>> nl = NeighborList(st, cutoff=5.0)
+        >>> nl.coordination().tolist()
+        [8, 8]
+        >>> nl.coordination(cutoff=4.0, species=('Na', 'Cl')).tolist()
+        [0, 0]
+        >>> nl.coordination(species=('Na', 'Na')).tolist()
+        [0, 0]
+        >>> indices, images, distances = nl.neighbors(0)
+        >>> len(indices)
+        8
+        >>> round(float(distances.min()), 4)
+        4.8844
+        """
+        assert cutoff > 0.0
+        assert skin >= 0.0
+        self.cutoff = cutoff
+        self.skin = skin
+        self.symbols = np.array(structure.symbols)
+        self.natom = structure.natom
+        self.periodicity = np.array(structure.periodicity, dtype=bool)
+
+        if structure.is_periodic:
+            self.cell = np.array(structure.cell)
+            self._reduced = np.array(structure.reduced, dtype=float).reshape((-1, 3))
+        else:
+            self.cell = None
+            self._reduced = np.array(structure.positions, dtype=float).reshape((-1, 3))
+
+        self._reference = self._reduced.copy()
+        self._i = np.zeros(0, dtype=int)
+        self._j = np.zeros(0, dtype=int)
+        self._images = np.zeros((0, 3), dtype=int)
+        self._distances = np.zeros(0)
+        self.build()
+
+    @property
+    def is_periodic(self):
+        return self.cell is not None
+
+    @property
+    def positions(self):
+        """
+        Cartesian positions of the atoms used for the last build or update
+
+        :return: numpy.ndarray
+        """
+        if self.is_periodic:
+            return np.dot(self._reduced, self.cell)
+        else:
+            return self._reduced
+
+    @property
+    def npairs(self):
+        """
+        Number of pairs (counted in both directions) inside the cutoff radius
+
+        :return: int
+        """
+        return int(np.sum(self._distances <= self.cutoff))
+
+    def _search(self, atoms):
+        """
+        Search the neighbors of a set of atoms inside a sphere of radius cutoff + skin
+
+        :param atoms: (numpy.ndarray) Indices of the atoms
+        :return: (tuple) Arrays i, j, images and distances with the pairs found
+        """
+        import scipy.spatial
+        radius = self.cutoff + self.skin
+        if not self.is_periodic:
+            tree = scipy.spatial.cKDTree(self._reduced)
+            centers = scipy.spatial.cKDTree(self._reduced[atoms])
+            found = centers.sparse_distance_matrix(tree, radius, output_type='ndarray')
+            atom_i = atoms[found['i']]
+            atom_j = found['j']
+            images = np.zeros((len(found), 3), dtype=int)
+        else:
+            # Wrap the atoms inside the cell along the periodic directions and replicate them enough to cover
+            # a sphere of the given radius around any point of the cell
+            shift = np.floor(self._reduced) * self.periodicity
+            wrapped = self._reduced - shift
+            recp_len = np.linalg.norm(np.linalg.inv(self.cell).T, axis=1)
+            margin = radius * recp_len
+            limits = np.where(self.periodicity, np.ceil(margin), 0).astype(int)
+            ranges = [np.arange(-x, x + 1) for x in limits]
+            translations = np.array(np.meshgrid(*ranges, indexing='ij')).reshape((3, -1)).T
+
+            replicas = wrapped[None, :, :] + translations[:, None, :]
+            inside = np.all((replicas >= -margin) | ~self.periodicity, axis=2)
+            inside &= np.all((replicas < 1.0 + margin) | ~self.periodicity, axis=2)
+            itrans, iatom = np.nonzero(inside)
+            pcm_log.debug('Neighbor search using %d replicas for %d atoms' % (len(iatom), self.natom))
+
+            tree = scipy.spatial.cKDTree(np.dot(replicas[itrans, iatom], self.cell))
+            centers = scipy.spatial.cKDTree(np.dot(wrapped[atoms], self.cell))
+            found = centers.sparse_distance_matrix(tree, radius, output_type='ndarray')
+            atom_i = atoms[found['i']]
+            atom_j = iatom[found['j']]
+            # Translations relative to the original (non-wrapped) reduced coordinates
+            images = translations[itrans[found['j']]] - shift[atom_j] + shift[atom_i]
+            images = np.rint(images).astype(int)
+
+        not_self = (atom_i != atom_j) | np.any(images != 0, axis=1)
+        atom_i = atom_i[not_self]
+        atom_j = atom_j[not_self]
+        images = images[not_self]
+        return atom_i, atom_j, images, self._pair_distances(atom_i, atom_j, images)
+
+    def _pair_distances(self, atom_i, atom_j, images):
+        vectors = self._reduced[atom_j] + images - self._reduced[atom_i]
+        if self.is_periodic:
+            vectors = np.dot(vectors, self.cell)
+        return np.sqrt(np.sum(vectors * vectors, axis=1))
+
+    def _sort(self):
+        order = np.lexsort((self._distances, self._i))
+        self._i = self._i[order]
+        self._j = self._j[order]
+        self._images = self._images[order]
+        self._distances = self._distances[order]
+
+    def build(self):
+        """
+        Builds the list from scratch for all the atoms
+        """
+        self._i, self._j, self._images, self._distances = self._search(np.arange(self.natom))
+        self._reference = self._reduced.copy()
+        self._sort()
+
+    def update(self, positions):
+        """
+        Updates the neighbor list for new cartesian positions of the atoms.
+        The distances for all the candidate pairs are recomputed and only the atoms that moved more than half of
+        the skin since the last search are searched again.
+
+        :param positions: (numpy.ndarray) New cartesian positions for all the atoms
+        :return: (int) Number of atoms for which the neighbors were searched again
+        """
+        positions = np.array(positions, dtype=float).reshape((-1, 3))
+        assert len(positions) == self.natom
+        if self.is_periodic:
+            self._reduced = np.linalg.solve(self.cell.T, positions.T).T
+            displacement = np.dot(self._reduced - self._reference, self.cell)
+        else:
+            self._reduced = positions.copy()
+            displacement = self._reduced - self._reference
+
+        moved = np.nonzero(np.linalg.norm(displacement, axis=1) > 0.5 * self.skin)[0]
+
+        if len(moved) > 0:
+            is_moved = np.zeros(self.natom, dtype=bool)
+            is_moved[moved] = True
+            keep = ~is_moved[self._i] & ~is_moved[self._j]
+            atom_i, atom_j, images, distances = self._search(moved)
+            # The pairs with a static atom are found only from the side of the moved atom
+            reverse = ~is_moved[atom_j]
+            self._i = np.concatenate((self._i[keep], atom_i, atom_j[reverse]))
+            self._j = np.concatenate((self._j[keep], atom_j, atom_i[reverse]))
+            self._images = np.concatenate((self._images[keep], images, -images[reverse]))
+            self._reference[moved] = self._reduced[moved]
+
+        self._distances = self._pair_distances(self._i, self._j, self._images)
+        self._sort()
+        return len(moved)
+
+    def _selection(self, cutoff=None, species=None):
+        if cutoff is None:
+            cutoff = self.cutoff
+        assert cutoff <= self.cutoff, 'The cutoff cannot be larger than the one used to build the list'
+        selection = self._distances <= cutoff
+        if species is not None:
+            specie_i, specie_j = species
+            selection &= (self.symbols[self._i] == specie_i) & (self.symbols[self._j] == specie_j)
+        return selection
+
+    def pairs(self, cutoff=None, species=None):
+        """
+        Returns all the pairs inside a sphere of a given radius as flat arrays
+
+        :param cutoff: (float) Maximal distance, by default the cutoff of the list. It cannot be larger than it
+        :param species: (tuple) Pair of atomic symbols, only the pairs with atom i and atom j of those species
+                        are returned
+        :return: (tuple) Arrays i, j, images and distances, where images are the translations (in reduced
+                 coordinates) applied to atom j
+        """
+        selection = self._selection(cutoff, species)
+        return self._i[selection], self._j[selection], self._images[selection], self._distances[selection]
+
+    def neighbors(self, iatom, cutoff=None, species=None):
+        """
+        Returns the neighbors of one atom sorted by distance
+
+        :param iatom: (int) Index of the atom
+        :param cutoff: (float) Maximal distance, by default the cutoff of the list
+        :param species: (tuple) Pair of atomic symbols to filter the neighbors
+        :return: (tuple) Arrays with the indices, images and distances of the neighbors
+        """
+        selection = self._selection(cutoff, species) & (self._i == iatom)
+        return self._j[selection], self._images[selection], self._distances[selection]
+
+    def coordination(self, cutoff=None, species=None):
+        """
+        Number of neighbors of each atom
+
+        :param cutoff: (float) Maximal distance, by default the cutoff of the list
+        :param species: (tuple) Pair of atomic symbols to filter the neighbors
+        :return: (numpy.ndarray) Coordination number for each atom
+        """
+        selection = self._selection(cutoff, species)
+        return np.bincount(self._i[selection], minlength=self.natom)
@@ -6,22 +6,25 @@ try:
 except ImportError:
     pass
 
+import collections
+import itertools
 import json
-import os
-import struct
-import sys
+import multiprocessing
 import numpy as np
 from collections.abc import MutableSequence
-from itertools import combinations, repeat
 from math import sin, cos
-from multiprocessing import Pool
 from pychemia import pcm_log
 from pychemia.crystal.lattice import Lattice
+from pychemia.crystal.spacegroup import get_spacegroup
+from pychemia.crystal.symmetry import CrystalSymmetry
 from pychemia.core.composition import Composition
 from pychemia.core.delaunay import get_reduced_bases
 from pychemia.utils.computing import deep_unicode
-from pychemia.utils.periodic import mass, atomic_number, covalent_radius, valence, atomic_symbols
-import scipy.spatial
+from pychemia.utils.periodic import mass, valence, atomic_symbols, atomic_numbers, covalent_radii_array, \
+    masses_array
+
+_SYMBOLS = np.array(atomic_symbols, dtype=object)
+_ATOMIC_NUMBERS = {symbol: number for number, symbol in enumerate(atomic_symbols)}
 
 
 class Structure(MutableSequence):
@@ -43,7 +46,13 @@ class Structure(MutableSequence):
     and cell parameters in 'cell'
 
     Magnetic moments can be associated in the array vector_info['magnetic_moments'].
+
+    The atomic species are stored as an array of atomic numbers and only one of the cartesian or reduced
+    coordinates is kept after each change, the other one and properties like the volume or density are computed
+    on demand and cached until the structure changes.
     """
+    __slots__ = ('name', 'comment', 'vector_info', '_numbers', '_symbols', '_positions', '_reduced', '_cell',
+                 '_periodicity', '_lattice', '_composition', '_cache', '_sites', '_occupancies')
 
     def __init__(self, natom=None, symbols=None, periodicity=False, cell=None, positions=None, reduced=None,
                  mag_moments=None, occupancies=None, sites=None, name=None, comment=None, vector_info=None):
@@ -79,76 +88,52 @@ class Structure(MutableSequence):
         >>> print(fcc.natom)
         1
         """
-        self.vector_info = {}
-        self.name = None
-        self.comment = None
-        self.natom = None
-        self.symbols = None
-        self.positions = None
-        self.reduced = None
-        self.cell = None
-        self.periodicity = None
-        self.vector_info['mag_moments'] = None
-        self.sites = None
-        self.occupancies = None
+        self.name = name
+        self.comment = comment
+        self._numbers = np.zeros(0, dtype=np.int16)
+        self._symbols = None
+        self._positions = None
+        self._reduced = None
+        self._cell = None
+        self._periodicity = None
         self._lattice = None
         self._composition = None
-        self.vector_info = None
+        self._cache = {}
+        self._sites = None
+        self._occupancies = None
 
-        # By default the number of atoms will be the value given or zero except if other information overrules
-        # that value
-        if natom is not None:
-            self.natom = int(natom)
+        if vector_info is None:
+            self.vector_info = {'mag_moments': None}
         else:
-            self.natom = 0
+            self.vector_info = vector_info
 
         if symbols is not None:
-            if symbols in atomic_symbols:
-                self.symbols = [symbols]
-            else:
-                for iatom in list(symbols):
-                    assert(iatom in atomic_symbols)
-                self.symbols = list(symbols)
-
-            self.natom = len(self.symbols)
-        else:
-            if self.natom != 0:
-                raise ValueError('List of atomic symbols not provided for structure with %d atoms', self.natom)
+            self.symbols = symbols
+        elif natom is not None and int(natom) != 0:
+            raise ValueError('List of atomic symbols not provided for structure with %d atoms', int(natom))
 
         # No periodicity will be assumed except if cell or reduced coordinates are provided
         if periodicity is None:
             periodicity = 3*[False]
-        if isinstance(periodicity, bool):
-            periodicity = 3*[periodicity]
         self.set_periodicity(periodicity)
 
         if cell is not None:
-            cell = np.array(cell)
-            self.set_cell(cell)
-            self.periodicity = 3*[True]
+            self.set_cell(np.array(cell))
+            self._periodicity = 3*[True]
 
+        # When both are given, positions and reduced are kept as they are
         if positions is not None:
-            positions = np.array(positions)
-            self.set_positions(positions)
+            self._positions = np.array(positions).reshape([-1, 3])
         if reduced is not None:
-            reduced = np.array(reduced)
-            self.set_reduced(reduced)
-            self.periodicity = 3*[True]
+            self._reduced = np.array(reduced).reshape([-1, 3])
+            self._periodicity = 3*[True]
         if mag_moments is not None:
             self.set_mag_moments(np.array(mag_moments))
         if occupancies is not None:
-            self.occupancies = list(occupancies)
+            self.occupancies = occupancies
         if sites is not None:
             self.sites = sites
 
-        if vector_info is None:
-            self.vector_info = {'mag_moments': None}
-        else:
-            self.vector_info = vector_info
-
-        self.name = name
-        self.comment = comment
-
         # This routine completes the missing values and makes all the values coherent.
         self._autocomplete()
 
@@ -208,10 +193,11 @@ class Structure(MutableSequence):
             else:
                 xyz += 'Symb  (             Positions            )\n'
 
+            symbols = self.symbols
             for i in range(self.natom):
                 if self.is_crystal:
                     xyz += ("%4s  ( %10.4f %10.4f %10.4f ) [ %10.4f %10.4f %10.4f ]\n"
-                            % (self.symbols[i],
+                            % (symbols[i],
                                self.positions[i, 0],
                                self.positions[i, 1],
                                self.positions[i, 2],
@@ -220,7 +206,7 @@ class Structure(MutableSequence):
                                self.reduced[i, 2]))
                 else:
                     xyz += ("%4s  ( %10.4f %10.4f %10.4f )\n"
-                            % (self.symbols[i],
+                            % (symbols[i],
                                self.positions[i, 0],
                                self.positions[i, 1],
                                self.positions[i, 2]))
@@ -292,58 +278,24 @@ class Structure(MutableSequence):
         self.add_atom(value['symbols'], value['positions'])
 
     def _autocomplete(self):
-        if self.natom is None:
-            if self.positions is not None:
-                self.natom = len(self.positions)
-            elif self.reduced is not None:
-                self.natom = len(self.reduced)
-            elif self.symbols is not None:
-                self.natom = len(self.symbols)
-            else:
-                self.natom = 0
-
-        if self.symbols is None and self.natom == 0:
-            self.symbols = []
-
-        if self.periodicity is None:
-            self.set_periodicity(True)
-
         if self.cell is None and self.is_periodic:
             self.set_cell(1)
 
-        if self.positions is None:
-            if self.reduced is not None:
-                self.reduced2positions()
-            else:
-                if self.natom == 0:
-                    self.positions = np.array([])
-                elif self.natom == 1:
-                    self.positions = np.array([[0.0, 0.0, 0.0]])
-                else:
-                    raise ValueError('Positions must be present for more than 1 atom')
-
-        if self.reduced is None and self.is_crystal:
-            if self.positions is not None and self.natom > 0:
-                self.positions2reduced()
+        if self._positions is None and self._reduced is None:
+            if self.natom == 0:
+                self._positions = np.array([])
+            elif self.natom == 1:
+                self._positions = np.array([[0.0, 0.0, 0.0]])
             else:
-                self.reduced = np.array([])
-
-        if self.sites is None:
-            self.sites = range(self.natom)
-
-        if self.occupancies is None:
-            self.occupancies = self.natom * [1.0]
+                raise ValueError('Positions must be present for more than 1 atom')
 
     def _check(self):
         check = True
 
-        if len(self.symbols) != self.natom:
-            print('Error: Bad symbols')
-            check = False
-        if len(self.positions) != self.natom:
+        if self._positions is not None and len(self._positions) != self.natom:
             print('Error: Bad positions')
             check = False
-        if self.is_crystal and len(self.reduced) != self.natom:
+        if self._reduced is not None and len(self._reduced) != self.natom:
             print('Error: Bad reduced')
             check = False
         if self.vector_info['mag_moments'] is not None and len(self.vector_info['mag_moments']) != self.natom:
@@ -352,6 +304,150 @@ class Structure(MutableSequence):
 
         return check
 
+    def _changed(self):
+        # Drops the derived properties cached, called on every change of the structure
+        self._cache = {}
+
+    def _sync(self):
+        # Computes the coordinates not stored yet, used before changing the cell or the periodicity because
+        # the coordinates already stored must not change with them
+        if self.natom > 0 and self._cell is not None:
+            if self._reduced is None and self._positions is not None:
+                self._reduced = self._positions2reduced(self._positions)
+            elif self._positions is None and self._reduced is not None:
+                self._positions = np.dot(self._reduced, self._cell)
+
+    def _positions2reduced(self, positions):
+        reduced = np.linalg.solve(self._cell.T, positions.T).T
+        for i in range(3):
+            if self._periodicity[i]:
+                reduced[:, i] %= 1.0
+        return reduced
+
+    @property
+    def natom(self):
+        return len(self._numbers)
+
+    @property
+    def numbers(self):
+        """
+        Atomic numbers of the atoms, the compact representation of the symbols
+
+        :rtype: numpy.ndarray
+
+        >>> st = Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+        >>> st.numbers.tolist()
+        [11, 17]
+        """
+        return self._numbers
+
+    @property
+    def symbols(self):
+        """
+        List of atomic symbols, built from the atomic numbers. Each access returns a new list, assign a new list
+        to change the symbols, item assignments on the list returned are not seen by the structure.
+        Get the list once before loops over the atoms, or use 'numbers' that is returned without copy.
+
+        :rtype: list
+
+        >>> st = Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+        >>> st.symbols[0] = 'K'
+        >>> st.symbols, st.formula
+        (['Na', 'Cl'], 'ClNa')
+        """
+        if self._symbols is None:
+            self._symbols = _SYMBOLS[self._numbers].tolist()
+        return list(self._symbols)
+
+    @symbols.setter
+    def symbols(self, symbols):
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        numbers = [_ATOMIC_NUMBERS.get(str(x)) for x in symbols]
+        if None in numbers:
+            raise ValueError('Unknown atomic symbol %s' % str(list(symbols)[numbers.index(None)]))
+        self._numbers = np.array(numbers, dtype=np.int16)
+        self._symbols = None
+        self._composition = None
+        self._changed()
+
+    @property
+    def positions(self):
+        """
+        Positions of the atoms in cartesian coordinates. Only one of 'positions' and 'reduced' is stored after a
+        change of the coordinates, the other is computed when requested and kept until the next change.
+        Call 'positions2reduced' after changing the positions in place.
+
+        :rtype: numpy.ndarray
+        """
+        if self._positions is None and self._reduced is not None and self._cell is not None:
+            self._positions = np.dot(self._reduced, self._cell)
+        return self._positions
+
+    @positions.setter
+    def positions(self, positions):
+        self._positions = positions
+        self._reduced = None
+        self._changed()
+
+    @property
+    def reduced(self):
+        """
+        Positions of the atoms in cell-reduced coordinates, None for structures without cell.
+        Call 'reduced2positions' after changing the reduced coordinates in place.
+
+        :rtype: numpy.ndarray
+        """
+        if self._reduced is None and self._positions is not None and self._cell is not None:
+            if self.natom == 0:
+                self._reduced = np.array([])
+            else:
+                self._reduced = self._positions2reduced(self._positions)
+        return self._reduced
+
+    @reduced.setter
+    def reduced(self, reduced):
+        self._reduced = reduced
+        self._positions = None
+        self._changed()
+
+    @property
+    def cell(self):
+        return self._cell
+
+    @cell.setter
+    def cell(self, cell):
+        self.set_cell(cell)
+
+    @property
+    def periodicity(self):
+        return self._periodicity
+
+    @periodicity.setter
+    def periodicity(self, periodicity):
+        self.set_periodicity(periodicity)
+
+    @property
+    def sites(self):
+        if self._sites is None:
+            return range(self.natom)
+        return self._sites
+
+    @sites.setter
+    def sites(self, sites):
+        self._sites = None if sites == range(self.natom) else sites
+
+    @property
+    def occupancies(self):
+        if self._occupancies is None:
+            return self.natom * [1.0]
+        return self._occupancies
+
+    @occupancies.setter
+    def occupancies(self, occupancies):
+        occupancies = list(occupancies)
+        self._occupancies = None if occupancies == self.natom * [1.0] else occupancies
+
     def add_atom(self, name, coordinates, option='cartesian'):
         """
         Add an atom with a given 'name' and cartesian or reduced 'position'
@@ -363,22 +459,16 @@ class Structure(MutableSequence):
         """
         assert (name in atomic_symbols)
         assert (option in ['cartesian', 'reduced'])
-        self.symbols.append(name)
-        self.natom += 1
-        self._composition = None
 
         if option == 'cartesian':
-            if self.natom == 0:
-                self.positions = np.array(coordinates).reshape([-1, 3])
-            else:
-                self.positions = np.append(self.positions, coordinates).reshape([-1, 3])
-            self.positions2reduced()
+            coordinates = np.append(self.positions, coordinates).reshape([-1, 3])
         elif option == 'reduced':
-            if self.natom == 0:
-                self.reduced = np.array(coordinates).reshape([-1, 3])
-            else:
-                self.reduced = np.append(self.reduced, coordinates).reshape([-1, 3])
-            self.reduced2positions()
+            coordinates = np.append(self.reduced, coordinates).reshape([-1, 3])
+        self.symbols = self.symbols + [name]
+        if option == 'cartesian':
+            self.positions = coordinates
+        else:
+            self.reduced = coordinates
 
     def del_atom(self, index):
         """
@@ -389,12 +479,15 @@ class Structure(MutableSequence):
         :return:
         """
         assert (abs(index) < self.natom)
-        self.symbols.pop(index)
-        np.delete(self.positions, index, 0)
-        if self.is_periodic:
-            np.delete(self.reduced, index, 0)
-        self.natom -= 1
-        self._composition = None
+        index = index % self.natom
+        if self._positions is not None:
+            self._positions = np.delete(self._positions, index, 0)
+        if self._reduced is not None:
+            self._reduced = np.delete(self._reduced, index, 0)
+        for vi in self.vector_info:
+            if self.vector_info[vi] is not None:
+                self.vector_info[vi] = np.delete(self.vector_info[vi], index, 0)
+        self.symbols = np.delete(self.symbols, index).tolist()
 
     def center_mass(self, list_of_atoms=None):
         """
@@ -407,17 +500,15 @@ class Structure(MutableSequence):
         if list_of_atoms is None:
             list_of_atoms = range(self.natom)
 
-        total_mass = 0.0
         center_of_mass = np.zeros(3)
         if self.natom == 0:
             return center_of_mass
 
-        atomicnumber = atomic_number(list(self.symbols))
-
-        for i in range(self.natom):
-            if i in list_of_atoms:
-                total_mass += mass(atomicnumber[i])
-                center_of_mass += mass(atomicnumber[i]) * self.positions[i]
+        selected = set(list_of_atoms)
+        index = np.array([i for i in range(self.natom) if i in selected], dtype=int)
+        masses = masses_array[self.numbers[index]]
+        total_mass = np.sum(masses)
+        center_of_mass = np.dot(masses, self.positions[index])
 
         return center_of_mass / total_mass
 
@@ -432,8 +523,7 @@ class Structure(MutableSequence):
 
         rotation = np.dot(np.dot(rotationx, rotationy), rotationz)
 
-        for i in range(self.natom):
-            self.positions[i] = np.dot(rotation, self.positions[i])
+        self.positions = np.dot(self.positions, rotation.T)
 
     def get_cell(self):
         if self._lattice is None:
@@ -470,17 +560,14 @@ class Structure(MutableSequence):
         Computes the cell-reduced coordinates from the
         cartesian dimensional coordinates
         """
-        self.reduced = np.linalg.solve(self.cell.T, self.positions.T).T
-        for i in range(3):
-            if self.periodicity[i]:
-                self.reduced[:, i] %= 1.0
+        self.positions = self.positions
 
     def reduced2positions(self):
         """
         Computes the dimensional cartesian coordinates
         from the adimensional cell-reduced coordinates
         """
-        self.positions = np.dot(self.reduced, self.cell)
+        self.reduced = self.reduced
 
     def relocate_to_cm(self, list_of_atoms=None):
         """
@@ -493,7 +580,7 @@ class Structure(MutableSequence):
                               by default all atoms are included
         """
         cm = self.center_mass(list_of_atoms)
-        self.positions += -cm
+        self.positions = self.positions - cm
 
     def get_distance(self, iatom, jatom, with_periodicity=True, tolerance=1e-5):
         """
@@ -534,10 +621,10 @@ class Structure(MutableSequence):
 
     @staticmethod
     def random_cell(composition, method='stretching', stabilization_number=20, nparal=5, periodic=True,
-                    factor_optimal_volume=8):
+                    factor_optimal_volume=8, seed=None, spacegroups=None):
         """
         Generate a random cell
-        There are two algorithms implemented:
+        There are three algorithms implemented:
 
         scaling: Generate a random cell and random distribution of atoms and
                 scale the lattice to separate the atoms.
@@ -546,12 +633,17 @@ class Structure(MutableSequence):
                     and stretching their bonds until the distance between any
                     two atoms is always greater than the sum of covalent radius.
 
+        symmetry: Choose a random space group, place the atoms on its general and
+                  special positions and scale the lattice to separate the atoms.
+
         :param composition: (pychemia.Composition)
         :param method: (str)
         :param stabilization_number: (int)
-        :param nparal: (int)
+        :param nparal: (int) Number of processes creating random structures
         :param periodic: (bool)
         :param factor_optimal_volume: (float)
+        :param seed: (int) Seed for the random numbers, see random_structures
+        :param spacegroups: (int, list) Space groups allowed for the method 'symmetry', by default all of them
         :return:
 
         >>> import os
@@ -566,60 +658,28 @@ class Structure(MutableSequence):
         """
         comp = Composition(composition)
         pcm_log.debug('Generating a random structure with composition: ' + str(comp.composition))
-        natom = comp.natom
-        symbols = comp.symbols
 
-        best_volume = sys.float_info.max
-        best_volume = float('inf')
         best_structure = None
         optimal_volume = comp.covalent_volume('cubes')
         stabilization_history = 0
-        pool = Pool(processes=nparal)
-
-        trial = 0
-        while stabilization_history < stabilization_number:
-            args = list(best_volume * np.ones(10))
-
-            ret = pool.map(worker_star, zip(repeat(method), repeat(composition), repeat(periodic), args))
-
-            ngood = 0
-            for structure in ret:
-                if structure is not None:
-                    # print('SH:%d Vol:%10.3f Factor:%10.3f' % (stabilization_history,
-                    #                                          structure.volume,
-                    #                                          structure.volume / optimal_volume))
-                    ngood += 1
-                    if best_structure is not None:
-                        if structure.volume < best_structure.volume:
-                            best_structure = structure
-                    else:
+        stream = random_structures(comp, method=method, periodic=periodic, nproc=nparal, seed=seed,
+                                   spacegroups=spacegroups)
+        try:
+            while stabilization_history < stabilization_number:
+                improved = False
+                for structure in itertools.islice(stream, 10):
+                    if best_structure is None or structure.volume < best_structure.volume:
                         best_structure = structure
+                        improved = True
+                if improved:
+                    stabilization_history = 0
+                else:
+                    stabilization_history += 1
 
-            # log.debug('Good structures: %d/10  Best volume: %7.3f' % (ngood, best_structure.volume))
-            if best_structure is not None and best_volume > best_structure.volume:
-                best_volume = best_structure.volume
-                stabilization_history = 0
-            else:
-                stabilization_history += 1
-
-            if best_volume < factor_optimal_volume * optimal_volume:
-                break
-            trial += 1
-
-            # log.debug('Trial: %4d  Volume: %7.2f  Optimal Volume: %7.2f  Ratio: %5.2f' %
-            #          (trial, best_volume, optimal_volume, best_volume/optimal_volume))
-
-        pool.close()
-
-        if best_structure is not None and periodic:
-            # Analysis of the quality for the best structure
-            rpos = best_structure.reduced
-            for i, j in combinations(range(natom), 2):
-                distance = best_structure.lattice.minimal_distance(rpos[i], rpos[j])
-                covalent_distance = sum(covalent_radius([symbols[i], symbols[j]]))
-                if distance < covalent_distance:
-                    pcm_log.debug('Covalent distance: %7.4f  Minimal distance: %7.4f  Difference: %7.3e' %
-                                  (covalent_distance, distance, covalent_distance - distance))
+                if best_structure.volume < factor_optimal_volume * optimal_volume:
+                    break
+        finally:
+            stream.close()
 
         best_structure.canonical_form()
         return best_structure
@@ -632,12 +692,10 @@ class Structure(MutableSequence):
         return Structure(symbols=st.symbols, positions=st.positions, periodicity=False)
 
     def adjust_reduced(self):
-        for i in range(self.natom):
-            for j in range(3):
-                for value in [0.5, 0.25, 0.75, 0.125]:
-                    if abs(value - self.reduced[i, j]) < 1E-4:
-                        self.reduced[i, j] = value
-        self.reduced2positions()
+        reduced = np.array(self.reduced)
+        for value in [0.5, 0.25, 0.75, 0.125]:
+            reduced[np.abs(value - reduced) < 1E-4] = value
+        self.reduced = reduced
 
     def set_cell(self, cell):
         """
@@ -647,14 +705,16 @@ class Structure(MutableSequence):
                      vectors
         :return:
         """
+        self._sync()
         npcell = np.array(cell)
         if npcell.shape == () or npcell.shape == (1,):
-            self.cell = npcell * np.eye(3)
+            self._cell = npcell * np.eye(3)
         elif npcell.shape == (3,):
-            self.cell = np.diag(npcell)
+            self._cell = np.diag(npcell)
         else:
-            self.cell = np.array(cell).reshape((3, 3))
+            self._cell = np.array(cell).reshape((3, 3))
         self._lattice = None
+        self._changed()
 
     def set_mag_moments(self, mag_moments):
         """
@@ -677,12 +737,14 @@ class Structure(MutableSequence):
                         periodicity all along the 3 directions. Otherwise a list
                         of 3 booleans is required
         """
+        self._sync()
         if isinstance(periodicity, bool):
-            self.periodicity = 3 * [periodicity]
+            self._periodicity = 3 * [periodicity]
         elif isinstance(periodicity, list) and len(periodicity) == 1:
-            self.periodicity = 3 * periodicity
+            self._periodicity = 3 * periodicity
         else:
-            self.periodicity = list(periodicity)
+            self._periodicity = list(periodicity)
+        self._changed()
 
     def set_positions(self, positions):
         """
@@ -709,10 +771,13 @@ class Structure(MutableSequence):
 
     def sort_sites_using_list(self, sorted_indices):
         sorted_indices = np.array([int(x) for x in sorted_indices])
-        self.symbols = list(np.array(self.symbols)[sorted_indices])
-        self.positions = self.positions[sorted_indices]
-        if self.is_periodic:
-            self.reduced = self.reduced[sorted_indices]
+        self._numbers = self._numbers[sorted_indices]
+        self._symbols = None
+        if self._positions is not None:
+            self._positions = self._positions[sorted_indices]
+        if self._reduced is not None:
+            self._reduced = self._reduced[sorted_indices]
+        self._changed()
         if self.vector_info is not None:
             for vi in self.vector_info:
                 if self.vector_info[vi] is not None:
@@ -727,7 +792,7 @@ class Structure(MutableSequence):
 
         # Second: Sort again using the atomic number
         if len(self.species) > 1:
-            sorted_indices = np.array([atomic_number(x) for x in self.symbols]).argsort()
+            sorted_indices = self._numbers.astype(int).argsort()
             self.sort_sites_using_list(sorted_indices)
 
     def sort_axes(self):
@@ -738,8 +803,9 @@ class Structure(MutableSequence):
         """
 
         sorted_indices = self.lattice.lengths.argsort()[::-1]
+        reduced = self.reduced[:, sorted_indices]
         self.set_cell(self.cell[sorted_indices])
-        self.reduced = self.reduced[:, sorted_indices]
+        self.reduced = reduced
 
     def align_with_axis(self, axis=0, round_decimals=14):
         lattice = self.lattice
@@ -775,38 +841,105 @@ class Structure(MutableSequence):
 
     def supercell(self, size):
         """
-        Creates a supercell, replicating the positions
-        of atoms in the x,y,z directions a number of
-        size=(nx,ny,nz) times
-        """
-        new_natom = np.prod(size) * self.natom
-        new_symbols = []
-        new_positions = np.zeros((new_natom, 3))
-        size = np.array(size).astype(int)
-
-        index = 0
-        for i in range(size[0]):
-            for j in range(size[1]):
-                for k in range(size[2]):
-                    for n in range(self.natom):
-                        new_symbols.append(self.symbols[n])
-                        new_positions[index] = self.positions[n] + (
-                            i * self.cell[0] + j * self.cell[1] + k * self.cell[2])
-                        index += 1
-        new_cell = np.zeros((3, 3))
-        new_cell[0] = size[0] * self.cell[0]
-        new_cell[1] = size[1] * self.cell[1]
-        new_cell[2] = size[2] * self.cell[2]
-        return Structure(symbols=new_symbols, positions=new_positions, cell=new_cell)
+        Creates a supercell replicating the atoms of the structure. The size could be the number of replicas
+        (nx, ny, nz) along each cell vector or an integer 3x3 matrix where each row is one of the new cell vectors
+        in terms of the original ones, for non-diagonal matrices the atoms are wrapped inside the new cell.
+        Magnetic moments, occupancies and sites are replicated with the atoms.
+
+        :param size: (list, numpy.ndarray) Three integers or an integer 3x3 matrix
+        :return: (Structure) The supercell
+
+        >>> st = Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+        >>> st.supercell((2, 1, 1)).natom
+        4
+        >>> spc = st.supercell([[0, 1, 1], [1, 0, 1], [1, 1, 0]])
+        >>> spc.natom, round(float(spc.volume / st.volume), 6)
+        (4, 2.0)
+        """
+        matrix = np.array(size)
+        if matrix.shape == (3,):
+            matrix = np.diag(matrix)
+        if matrix.shape != (3, 3) or not np.all(np.round(matrix) == matrix):
+            raise ValueError('The size of the supercell must be three integers or an integer 3x3 matrix')
+        matrix = np.round(matrix).astype(int)
+        ncells = int(round(abs(np.linalg.det(matrix))))
+        if ncells == 0:
+            raise ValueError('The supercell matrix is singular')
+        new_cell = np.dot(matrix, self.cell)
+
+        if np.all(matrix == np.diag(matrix.diagonal())):
+            # Translations ordered as replicas along x, then y and z for the innermost
+            translations = np.indices(np.abs(matrix.diagonal())).reshape((3, -1)).T * np.sign(matrix.diagonal())
+            new_positions = np.dot(translations, self.cell)[:, None, :] + self.positions[None, :, :]
+            coordinates = {'positions': new_positions.reshape((-1, 3))}
+        else:
+            # Lattice points of the original cell inside the new cell, searched in the box containing its corners
+            corners = np.dot(np.array(list(itertools.product((0, 1), repeat=3))), matrix)
+            ranges = [np.arange(corners[:, i].min(), corners[:, i].max() + 1) for i in range(3)]
+            candidates = np.array(np.meshgrid(*ranges, indexing='ij')).reshape((3, -1)).T
+            inverse = np.linalg.inv(matrix)
+            fractions = np.dot(candidates, inverse)
+            inside = np.all((fractions > -1E-8) & (fractions < 1 - 1E-8), axis=1)
+            translations = candidates[inside]
+            assert len(translations) == ncells
+            new_reduced = np.dot((translations[:, None, :] + self.reduced[None, :, :]).reshape((-1, 3)), inverse)
+            new_reduced %= 1.0
+            new_reduced[new_reduced > 1 - 1E-8] = 0.0
+            coordinates = {'reduced': new_reduced}
+
+        vector_info = {}
+        for vi in self.vector_info:
+            value = self.vector_info[vi]
+            if value is not None:
+                value = np.tile(value, (ncells,) + (np.ndim(value) - 1) * (1,))
+            vector_info[vi] = value
+        if self._occupancies is not None:
+            coordinates['occupancies'] = ncells * self._occupancies
+        if self._sites is not None:
+            sites = np.array(self._sites)[None, :] + self.nsites * np.arange(ncells)[:, None]
+            coordinates['sites'] = sites.flatten().tolist()
+        return Structure(symbols=_SYMBOLS[np.tile(self._numbers, ncells)].tolist(), cell=new_cell,
+                         vector_info=vector_info, **coordinates)
 
     def copy(self):
         """
-        Get a copy of the object
+        Get a copy of the object.
+        The copy shares the arrays of the original (copy-on-write), the shared arrays become read-only on both
+        structures and each one replaces them with new arrays on its next change (set_positions, add_atom,
+        sort_sites, ...). Changing the arrays in place is not possible once they are shared, use the setters
+        instead. Arrays obtained from the structure before the copy become read-only too, so the copy cannot
+        be changed through them.
+
+        >>> st = Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+        >>> st2 = st.copy()
+        >>> st2.reduced is st.reduced
+        True
+        >>> st2.set_positions(st2.positions + 1.0)
+        >>> st.positions.tolist()
+        [[0.0, 0.0, 0.0], [2.82, 2.82, 2.82]]
         """
-        copy_struct = Structure(name=self.name, comment=self.comment, natom=self.natom, symbols=self.symbols,
-                                periodicity=self.periodicity, cell=self.cell, positions=self.positions,
-                                reduced=self.reduced, vector_info=self.vector_info, sites=self.sites,
-                                occupancies=self.occupancies)
+        self._positions = _share(self._positions)
+        self._reduced = _share(self._reduced)
+        self._cell = _share(self._cell)
+        self._numbers = _share(self._numbers)
+        for vi in self.vector_info:
+            self.vector_info[vi] = _share(self.vector_info[vi])
+
+        copy_struct = Structure.__new__(Structure)
+        copy_struct.name = self.name
+        copy_struct.comment = self.comment
+        copy_struct.vector_info = dict(self.vector_info)
+        copy_struct._numbers = self._numbers
+        copy_struct._symbols = None
+        copy_struct._positions = self._positions
+        copy_struct._reduced = self._reduced
+        copy_struct._cell = self._cell
+        copy_struct._periodicity = list(self._periodicity)
+        copy_struct._lattice = None
+        copy_struct._composition = None
+        copy_struct._cache = dict(self._cache)
+        copy_struct._sites = None if self._sites is None else list(self._sites)
+        copy_struct._occupancies = None if self._occupancies is None else list(self._occupancies)
         return copy_struct
 
     @property
@@ -906,20 +1039,45 @@ class Structure(MutableSequence):
         if self.is_periodic:
             return self.lattice.distance2(self.reduced[atom1], self.reduced[atom2])
         else:
-            dm = scipy.spatial.distance_matrix(self.positions, self.positions)
-            return dm[atom1, atom2]
+            return np.linalg.norm(self.positions[atom2] - self.positions[atom1])
+
+    def distance_matrix(self, dtype=float, chunk_size=1000000, tolerance=1e-5):
+        """
+        Computes the matrix of distances between all the sites in the structure.
+        For periodic structures the distance is the one to the closest image of the second site. The search of images
+        is done over a Delaunay reduced basis, where the closest image is always found among the 27 neighboring cells,
+        even for very skewed cells.
 
-    def distance_matrix(self):
+        :param dtype: (numpy.dtype) Type of the returned matrix, use numpy.float32 to reduce memory
+        :param chunk_size: (int) Maximal number of distances computed simultaneously, bounds the memory used
+        :param tolerance: (float) Tolerance for the bases reduction
+        :return: (numpy.ndarray) Symmetric matrix of distances with zeros in the diagonal
+
+        >>> st = Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+        >>> dm = st.distance_matrix()
+        >>> round(float(dm[0, 1]), 4)
+        4.8844
+        >>> st.distance_matrix(dtype=np.float32).dtype
+        dtype('float32')
+        """
         if self.is_periodic:
-            dm = np.zeros((self.nsites, self.nsites))
-            for i in range(self.nsites - 1):
-                for j in range(i + 1, self.nsites):
-                    d = self.lattice.distance2(self.reduced[i], self.reduced[j], radius=1E10, limits=[1, 1, 1])
-                    # print("%d %d - %d" % (i,j, len(d)))
-                    dm[i, j] = min([d[x]['distance'] for x in d])
-                    dm[j, i] = dm[i, j]
+            reduced_bases = get_reduced_bases(self.cell, tolerance)
+            scaled_pos = np.dot(self.positions, np.linalg.inv(reduced_bases))
+            images = np.array(list(itertools.product((-1, 0, 1), repeat=3)))
+            cartesian_images = np.dot(images, reduced_bases)
+
+            dm = np.zeros((self.nsites, self.nsites), dtype=dtype)
+            step = max(1, int(chunk_size // (len(images) * self.nsites)))
+            for start in range(0, self.nsites, step):
+                # Vectors from the sites in this chunk to all sites, moved into -0.5 < r <= 0.5
+                diff = scaled_pos[None, :, :] - scaled_pos[start:start + step, None, :]
+                diff -= np.rint(diff)
+                vectors = np.dot(diff, reduced_bases)[:, :, None, :] + cartesian_images[None, None, :, :]
+                dm[start:start + step] = np.sqrt(np.min(np.sum(vectors * vectors, axis=3), axis=2))
+            np.fill_diagonal(dm, 0.0)
         else:
-            dm = scipy.spatial.distance_matrix(self.positions, self.positions)
+            from scipy.spatial import distance_matrix
+            dm = distance_matrix(self.positions, self.positions).astype(dtype)
         return dm
 
     def valence_electrons(self):
@@ -1014,7 +1172,9 @@ class Structure(MutableSequence):
 
         :return: str
         """
-        return self.get_composition().formula
+        if 'formula' not in self._cache:
+            self._cache['formula'] = self.get_composition().formula
+        return self._cache['formula']
 
     @property
     def density(self):
@@ -1025,7 +1185,9 @@ class Structure(MutableSequence):
 
         :return: float
         """
-        return sum(np.array(mass(self.symbols))) / self.volume
+        if 'density' not in self._cache:
+            self._cache['density'] = np.sum(masses_array[self._numbers]) / self.volume
+        return self._cache['density']
 
     @property
     def volume(self):
@@ -1036,17 +1198,19 @@ class Structure(MutableSequence):
 
         :return: float
         """
+        if 'volume' in self._cache:
+            return self._cache['volume']
         if self.is_periodic:
-            return abs(np.linalg.det(self.cell))
+            volume = abs(np.linalg.det(self.cell))
         else:
             volume = (np.max(self.positions[:, 0]) - np.min(self.positions[:, 0])) * \
                      (np.max(self.positions[:, 1]) - np.min(self.positions[:, 1])) * \
                      (np.max(self.positions[:, 2]) - np.min(self.positions[:, 2]))
 
-            if volume > 0.0:
-                return volume
-            else:
-                return 4.0 / 3.0 * np.pi * np.max(self.positions.flatten()) ** 3
+            if volume <= 0.0:
+                volume = 4.0 / 3.0 * np.pi * np.max(self.positions.flatten()) ** 3
+        self._cache['volume'] = volume
+        return volume
 
     @property
     def species(self):
@@ -1058,7 +1222,9 @@ class Structure(MutableSequence):
 
     @property
     def nsites(self):
-        return len(self.positions)
+        if self._positions is not None:
+            return len(self._positions)
+        return len(self._reduced)
 
     def scale(self, tolerance=0.7):
         assert self.is_perfect
@@ -1142,6 +1308,23 @@ class Structure(MutableSequence):
         return Structure(symbols=self.symbols, cell=newlattice.cell, positions=self.positions)
 
 
+def _share(array):
+    # Makes read-only an array shared between a structure and its copies. The arrays it is a view of become
+    # read-only too, so no writable reference to the shared data is left. Views of buffers that are not arrays
+    # (files, bytes) are copied before sharing them.
+    if not isinstance(array, np.ndarray) or not array.flags.writeable:
+        return array
+    base = array
+    while isinstance(base.base, np.ndarray):
+        base = base.base
+    if base.base is not None:
+        array = np.array(array)
+        base = array
+    array.flags.writeable = False
+    base.flags.writeable = False
+    return array
+
+
 def load_structure_json(filename):
     ret = Structure()
     ret.load_json(filename)
@@ -1163,6 +1346,7 @@ class SiteSet:
         self.structure = structure
         self.sitelist = []
         reduced = None
+        structure_symbols = structure.symbols
 
         for isite in range(structure.nsites):
             if structure.sites.count(isite) > 1:
@@ -1170,13 +1354,13 @@ class SiteSet:
                 occupancies = []
                 for jatom in range(structure.natom):
                     if structure.sites[jatom] == isite:
-                        symbols.append(structure.symbols[jatom])
+                        symbols.append(structure_symbols[jatom])
                         occupancies.append(structure.occupancies[jatom])
                 position = structure.positions[isite]
                 if self.structure.is_periodic:
                     reduced = structure.reduced[isite]
             else:
-                symbols = [structure.symbols[isite]]
+                symbols = [structure_symbols[isite]]
                 occupancies = [structure.occupancies[isite]]
                 position = structure.positions[isite]
                 if self.structure.is_periodic:
@@ -1246,21 +1430,21 @@ class Site:
         return repr(self)
 
 
-def worker_star(x):
-    return random_structure(*x)
-
-
-def random_structure(method, composition, periodic=True, max_volume=1E10):
+def random_structure(method, composition, periodic=True, max_volume=1E10, max_trials=100, spacegroups=None):
     """
     Random Structure created  by random positioning of atoms followed by either scaling of the cell or
     adding a sheer stretching along the smaller distances. The purpose of the lattice change is to avoid any two
     atoms to be closer than the sum of their covalent radius.
+    The method 'symmetry' places the atoms on the general and special positions of a random space group and scales
+    the cell, so the structure has the symmetry of that space group.
 
-    :param method: Can be 'stretching' or 'scaling'.
+    :param method: Can be 'stretching', 'scaling' or 'symmetry'.
     :param composition: Can be a Composition object or formula.
     :param periodic: If True, the structure will be periodical in all directions, otherwise a finite system is created.
     :param max_volume: Threshold for creating the Structure, if the volume exceeds the target the method returns None
-    :return: Structure if the volume is below than best_volume, None otherwise
+    :param max_trials: Maximal number of random trials
+    :param spacegroups: (int, list) Space groups allowed for the method 'symmetry', by default all of them
+    :return: Structure if the volume is below than max_volume, None if no valid structure was found
 
     >>> st = random_structure(method='scaling', composition='H2O', periodic=False)
     >>> st.natom
@@ -1268,86 +1452,218 @@ def random_structure(method, composition, periodic=True, max_volume=1E10):
     >>> st = random_structure(method='stretching', composition='NaCl', periodic=True)
     >>> st.natom
     2
+    >>> st = random_structure(method='symmetry', composition='NaCl', spacegroups=225)
+    >>> st.natom
+    2
     """
-    comp = Composition(composition)
-    natom = comp.natom
-    symbols = comp.symbols
-    np.random.seed(struct.unpack("<L", os.urandom(4))[0])
-
-    if periodic:
-        new_structure = None
-
-        assert (method in ['scaling', 'stretching'])
-
-	
-        while True:
-            trial=0
-    
-            if method == 'scaling':
-                lattice = Lattice.random_cell(comp)
-                # Random reduced positions
-                rpos = np.random.rand(natom, 3)
-                mins = [min(rpos[:, i]) for i in range(3)]
-                rpos -= mins
-
-                new_lattice = lattice
-            else:
-                lattice = Lattice.random_cell(comp)
-                # Random reduced positions
-                rpos = np.random.rand(natom, 3)
-                mins = [min(rpos[:, i]) for i in range(3)]
-                rpos -= mins
-
-                new_lattice = lattice.stretch(symbols, rpos, tolerance=1.0, extra=0.1)
-
-            if new_lattice.volume < max_volume:
-                test = True
-                for i in range(natom):
-                    for j in range(i + 1, natom):
-                        distance = new_lattice.minimal_distance(rpos[i], rpos[j])
-                        covalent_dim = sum(covalent_radius([symbols[i], symbols[j]]))
-                        if distance < covalent_dim:
-                            test = False
-                if test:
-                    new_structure = Structure(symbols=symbols, reduced=rpos, cell=new_lattice.cell, periodicity=True)
-                    minimal_distance = np.min(new_structure.distance_matrix() + 10 * np.eye(new_structure.natom))
-                    break
-                else:
-                    print("Trial failed, distance %f is less than covalent radious %f" % (distance, covalent_dim))
-                    trial += 1
-
-            if trial > 100:
-                print("Leaving after 100 attemps")
-                break
+    for structure in random_structures(composition, 1, method=method, periodic=periodic, max_volume=max_volume,
+                                       batch_size=1, max_trials=max_trials, spacegroups=spacegroups):
+        return structure
+    pcm_log.debug('No valid random structure found after %d trials' % max_trials)
+    return None
 
-        # else:
-        #     print('Volume of Structure %f is larger than max_volume=%f' % (new_lattice.volume, max_volume))
-        #     new_structure = None
-    else:
-        pos = np.random.rand(natom, 3)
 
-        mindis = cluster_minimal_distance(pos)
-        if mindis == 0:
-            raise ValueError("Distance too small")
-
-        max_cov = np.max(covalent_radius(symbols))
-        pos *= max_cov / mindis
-
-        current_volume = (max(pos[:, 0]) - min(pos[:, 0])) * (max(pos[:, 1]) - min(pos[:, 1])) * (
-            max(pos[:, 2]) - min(pos[:, 2]))
-
-        if current_volume < max_volume:
-            new_structure = Structure(symbols=symbols, positions=pos, periodicity=False)
+def random_structures(composition, nstructures=None, method='stretching', periodic=True, max_volume=None,
+                      batch_size=16, nproc=1, seed=None, max_trials=None, spacegroups=None):
+    """
+    Generator of random structures with no pair of atoms closer than the sum of their covalent radius.
+    The trials are created in batches and the overlaps of all the trials in a batch are rejected together.
+    With nproc > 1 the batches are created on a pool of processes, each batch uses its own random seed derived from
+    'seed' and the results are returned in order, so the same seed produces the same structures for any number of
+    processes.
+
+    :param composition: Can be a Composition object or formula
+    :param nstructures: Number of structures to create, None for an endless stream
+    :param method: Can be 'stretching', 'scaling' or 'symmetry'
+    :param periodic: If True the structures are periodic in all directions, otherwise finite systems are created
+    :param max_volume: Structures with a larger volume are rejected
+    :param batch_size: Number of random trials on each batch
+    :param nproc: Number of processes creating batches
+    :param seed: Seed for the random numbers, None takes the seed from the system
+    :param max_trials: Maximal number of random trials, None for no limit
+    :param spacegroups: (int, list) Space groups allowed for the method 'symmetry', by default all of them. Each
+                        trial uses one of them at random, trials where the composition cannot be distributed over
+                        the positions of the space group are rejected
+    :return: Generator of Structures
+
+    >>> sts = list(random_structures('LiAlCl4', 3, seed=0))
+    >>> len(sts), sts[0].natom
+    (3, 6)
+    >>> sts[2] == list(random_structures('LiAlCl4', 3, seed=0, nproc=2))[2]
+    True
+    """
+    comp = Composition(composition)
+    if periodic and method not in ['scaling', 'stretching', 'symmetry']:
+        raise ValueError('Unknown method: %s' % method)
+    if max_volume is None:
+        max_volume = float('inf')
+    if spacegroups is None:
+        spacegroups = list(range(1, 231))
+    spacegroups = [int(x) for x in np.array(spacegroups).reshape(-1)]
+    if periodic and method == 'symmetry':
+        spacegroups = [x for x in spacegroups if get_spacegroup(x).is_compatible(
+            {y: get_spacegroup(x).ncentering * comp.composition[y] for y in comp.composition})]
+        if len(spacegroups) == 0:
+            raise ValueError('The composition %s is not compatible with the space groups requested' % comp.formula)
+    seeds = np.random.SeedSequence(seed)
+
+    def batches():
+        ntrials = 0
+        while max_trials is None or ntrials < max_trials:
+            size = batch_size if max_trials is None else min(batch_size, max_trials - ntrials)
+            ntrials += size
+            yield comp, method, periodic, max_volume, size, seeds.spawn(1)[0], spacegroups
+
+    pool = None
+    pending = collections.deque()
+    if nproc > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        pool = multiprocessing.get_context('fork').Pool(nproc)
+    try:
+        if pool is None:
+            results = map(_random_batch, batches())
         else:
-            print('Volume of Structure %f is larger than max_volume=%f' % (current_volume, max_volume))
-            new_structure = None
+            results = _ordered_results(pool, batches(), 2 * nproc, pending)
+        nyield = 0
+        for batch in results:
+            for structure in batch:
+                if nstructures is not None and nyield >= nstructures:
+                    return
+                yield structure
+                nyield += 1
+            if nstructures is not None and nyield >= nstructures:
+                return
+    finally:
+        if pool is not None:
+            # Terminating the pool while batches are queued could block, the few batches submitted are finished
+            for result in pending:
+                result.wait()
+            pool.close()
+            pool.join()
+
+
+def _ordered_results(pool, tasks, window, pending):
+    # Keeps a limited number of batches running on the pool, returning the results in the order of the tasks
+    for task in tasks:
+        pending.append(pool.apply_async(_random_batch, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _random_batch(args):
+    """
+    Creates a batch of random trials and returns those without overlaps between atoms
+    """
+    comp, method, periodic, max_volume, size, seed, spacegroups = args
+    rng = np.random.default_rng(seed)
+    natom = comp.natom
+    symbols = comp.symbols
+    radii = covalent_radii_array[atomic_numbers(symbols)]
+
+    if periodic and method == 'symmetry':
+        ret = []
+        for number in rng.choice(spacegroups, size):
+            structure = _random_symmetric(comp, get_spacegroup(number), rng)
+            if structure is not None and structure.volume < max_volume:
+                ret.append(structure)
+        return ret
 
-    return new_structure
-    # End of Worker
+    if not periodic:
+        pos = rng.random((size, natom, 3))
+        if natom > 1:
+            i, j = np.triu_indices(natom, 1)
+            mindis = np.min(np.linalg.norm(pos[:, j] - pos[:, i], axis=2), axis=1)
+            valid = mindis > 0
+            pos = pos[valid] * (np.max(radii) / mindis[valid])[:, None, None]
+        volumes = np.prod(np.max(pos, axis=1) - np.min(pos, axis=1), axis=1)
+        return [Structure(symbols=symbols, positions=x, periodicity=False) for x in pos[volumes < max_volume]]
+
+    rpos = rng.random((size, natom, 3))
+    rpos -= np.min(rpos, axis=1, keepdims=True)
+    lattices = [Lattice.random_cell(comp, rng=rng) for _ in range(size)]
+    i, j = np.triu_indices(natom, 1)
+    covalent_distances = radii[i] + radii[j]
+    if method == 'stretching':
+        lattices = [lattice.stretch(symbols, x, tolerance=1.0, extra=0.1) for lattice, x in zip(lattices, rpos)]
+    cells = np.array([lattice.cell for lattice in lattices])
+    if method == 'scaling':
+        # Scale each cell to separate the closest pair of atoms, so no pair overlaps after scaling
+        factors = np.max(covalent_distances / _minimal_pair_distances(cells, rpos, covalent_distances), axis=1,
+                         initial=1.0)
+        cells *= (1.0 + 1E-10) * factors[:, None, None]
+    valid = np.abs(np.linalg.det(cells)) < max_volume
+    if method == 'stretching':
+        valid[valid] = np.all(_minimal_pair_distances(cells[valid], rpos[valid], covalent_distances) >=
+                              covalent_distances, axis=1)
+    return [Structure(symbols=symbols, reduced=x, cell=cell, periodicity=True)
+            for x, cell in zip(rpos[valid], cells[valid])]
+
+
+def _random_symmetric(comp, spacegroup, rng):
+    """
+    Random structure with the symmetry of a space group, the cell is scaled to separate the closest pair of atoms.
+    Returns None if the composition cannot be distributed over the positions of the space group.
+    """
+    counts = {x: spacegroup.ncentering * comp.composition[x] for x in comp.composition}
+    sites = spacegroup.random_sites(counts, rng)
+    if sites is None:
+        return None
+    symbols, reduced = spacegroup.positions(sites)
+    volume = spacegroup.ncentering * comp.covalent_volume('cubes')
+    cell = spacegroup.random_lattice(volume, rng).cell
+    radii = covalent_radii_array[atomic_numbers(symbols)]
+    i, j = np.triu_indices(len(symbols), 1)
+    covalent_distances = radii[i] + radii[j]
+    distances = _minimal_pair_distances(cell[None], reduced[None], covalent_distances)[0]
+    if len(distances) > 0:
+        if np.min(distances) < 1E-3:
+            return None
+        cell = cell * (1.0 + 1E-10) * max(1.0, np.max(covalent_distances / distances))
+    structure = Structure(symbols=symbols, reduced=reduced, cell=cell, periodicity=True)
+    if spacegroup.ncentering > 1:
+        # Atoms on the conventional cell are reduced to the primitive cell
+        structure = CrystalSymmetry(structure).find_primitive(symprec=1E-3)
+        if structure is None or structure.natom != comp.natom:
+            return None
+    return structure
+
+
+def _minimal_pair_distances(cells, reduced, cutoffs, chunk_size=1000000):
+    """
+    Minimal distances between all the pairs of different atoms, including periodic images, for many periodic
+    structures with the same number of atoms. The distances are exact when they are shorter than the cutoff of
+    the pair, larger distances could be overestimated.
+
+    :param cells: (numpy.ndarray) Cells of the structures with shape (nstructures, 3, 3)
+    :param reduced: (numpy.ndarray) Reduced coordinates with shape (nstructures, natom, 3)
+    :param cutoffs: (numpy.ndarray) Cutoff for each pair (i, j) with i < j in the order of numpy.triu_indices
+    :param chunk_size: (int) Maximal number of pair-image distances computed simultaneously
+    :return: (numpy.ndarray) Distances with shape (nstructures, npairs)
+    """
+    i, j = np.triu_indices(reduced.shape[1], 1)
+    ret = np.zeros((len(cells), len(i)))
+    if len(cells) == 0 or len(i) == 0:
+        return ret
+    # Images that could be closer than the largest cutoff for vectors wrapped to [-1/2, 1/2]
+    reciprocal_lengths = np.linalg.norm(np.linalg.inv(cells), axis=1)
+    limits = np.ceil(np.max(cutoffs) * np.max(reciprocal_lengths, axis=0) + 0.5).astype(int)
+    images = Lattice._images_table(limits)
+    dred = reduced[:, j] - reduced[:, i]
+    dred -= np.round(dred)
+
+    step = max(1, int(chunk_size // (len(i) * len(images))))
+    for start in range(0, len(cells), step):
+        chunk = slice(start, start + step)
+        dcart = np.einsum('spk,skl->spl', dred[chunk], cells[chunk])[:, :, None, :] + \
+            np.einsum('mk,skl->sml', images, cells[chunk])[:, None, :, :]
+        ret[chunk] = np.sqrt(np.min(np.einsum('spmk,spmk->spm', dcart, dcart), axis=2))
+    return ret
 
 
 def cluster_minimal_distance(pos):
+    from scipy.spatial import distance_matrix
     pos = np.array(pos).reshape((-1, 3))
-    dismat = scipy.spatial.distance_matrix(pos, pos)
+    dismat = distance_matrix(pos, pos)
     tmp = np.max(dismat.flatten())
     return np.min((dismat + tmp * np.eye(len(pos))).flatten())
@@ -0,0 +1,324 @@
+"""
+Trajectory stores many frames of a structure with fixed species, like the ionic steps of a relaxation or a molecular
+dynamics run. The positions of all the frames are kept in a single array of shape (nframes, natom, 3) and the cell,
+energy, forces and stress of each frame on arrays with the number of frames as first dimension.
+Structures are created only when a frame is requested.
+"""
+
+import os
+
+import numpy as np
+
+from pychemia import HAS_H5PY
+from .structure import Structure, _ATOMIC_NUMBERS, _SYMBOLS
+
+if HAS_H5PY:
+    import h5py
+
+
+class Trajectory:
+    """
+    Sequence of frames of a set of atoms with fixed species
+
+    >>> traj = Trajectory(['H', 'H'], cell=5.0)
+    >>> traj.append([[0, 0, 0], [0.74, 0, 0]], energy=-1.1)
+    >>> traj.append([[0, 0, 0], [0.75, 0, 0]], energy=-1.2)
+    >>> len(traj), traj.natom
+    (2, 2)
+    >>> traj.energies.tolist()
+    [-1.1, -1.2]
+    >>> print(traj[-1].positions[1])
+    [0.75 0.   0.  ]
+    >>> traj[::2].positions.shape
+    (1, 2, 3)
+    """
+    _arrays = ('positions', 'cells', 'energies', 'forces', 'stress')
+
+    def __init__(self, symbols, positions=None, cell=None, reduced=None, periodicity=None, energies=None,
+                 forces=None, stress=None):
+        """
+        Creates a trajectory from the arrays for all the frames
+
+        :param symbols: (list) Atomic symbols, the same for all the frames
+        :param positions: (numpy.ndarray) Cartesian positions with shape (nframes, natom, 3)
+        :param cell: (numpy.ndarray) Cell for all the frames, any value accepted by Structure or an array with
+                     shape (nframes, 3, 3) for a variable cell. None for non-periodic systems
+        :param reduced: (numpy.ndarray) Reduced positions with shape (nframes, natom, 3), used if the positions are
+                        not given
+        :param periodicity: (bool, list) Periodicity of the structures, by default periodic if the cell is given
+        :param energies: (numpy.ndarray) Energy of each frame
+        :param forces: (numpy.ndarray) Forces with shape (nframes, natom, 3)
+        :param stress: (numpy.ndarray) Stress tensor of each frame with shape (nframes, 3, 3)
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        self.numbers = np.array([_ATOMIC_NUMBERS[str(x)] for x in symbols], dtype=np.int16)
+        natom = len(self.numbers)
+
+        if periodicity is None:
+            periodicity = cell is not None
+        if isinstance(periodicity, bool):
+            periodicity = 3 * [periodicity]
+        self.periodicity = list(periodicity)
+
+        if positions is None and reduced is not None:
+            reduced = np.array(reduced, dtype=float).reshape((-1, natom, 3))
+            cells = self._frame_cells(cell, len(reduced))
+            positions = np.einsum('fij,fjk->fik', reduced, cells)
+        if positions is None:
+            positions = np.zeros((0, natom, 3))
+        self._size = len(positions)
+
+        # Arrays with the frames as first dimension, they could have spare capacity after appending frames
+        self._data = {'positions': np.asarray(positions, dtype=float).reshape((self._size, natom, 3)),
+                      'cells': None if cell is None else self._frame_cells(cell, self._size),
+                      'energies': None if energies is None else np.asarray(energies, dtype=float).reshape(self._size),
+                      'forces': None,
+                      'stress': None}
+        if forces is not None:
+            self._data['forces'] = np.asarray(forces, dtype=float).reshape((self._size, natom, 3))
+        if stress is not None:
+            self._data['stress'] = np.asarray(stress, dtype=float).reshape((self._size, 3, 3))
+        # HDF5 file with the arrays of a trajectory loaded lazily
+        self._h5file = None
+
+    @staticmethod
+    def _frame_cells(cell, nframes):
+        cell = np.asarray(cell, dtype=float)
+        if cell.ndim == 3:
+            return cell.reshape((-1, 3, 3))
+        # An empty trajectory keeps the cell as spare capacity for the first frame
+        return np.tile(Structure(cell=cell).cell, (max(nframes, 1), 1, 1))
+
+    @staticmethod
+    def from_structures(structures, energies=None, forces=None, stress=None):
+        """
+        Creates a trajectory from a list of structures with the same species
+
+        :param structures: (list) Structures for each frame
+        :param energies: (list) Energy of each frame
+        :param forces: (list) Forces of each frame
+        :param stress: (list) Stress tensor of each frame
+        :return: (Trajectory)
+        """
+        structures = list(structures)
+        first = structures[0]
+        for structure in structures:
+            if not np.array_equal(structure.numbers, first.numbers):
+                raise ValueError('All the structures in a trajectory must have the same species')
+        positions = np.array([x.positions for x in structures])
+        cell = np.array([x.cell for x in structures]) if first.is_periodic else None
+        return Trajectory(first.symbols, positions=positions, cell=cell, periodicity=first.periodicity,
+                          energies=energies, forces=forces, stress=stress)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, item):
+        """
+        An integer returns the Structure for that frame, a slice or a list of indices returns a Trajectory with those
+        frames sharing the arrays with this trajectory when possible
+        """
+        if isinstance(item, (int, np.integer)):
+            if not -self._size <= item < self._size:
+                raise IndexError('Frame %d out of range for %d frames' % (item, self._size))
+            return self.get_structure(item % self._size)
+        ret = Trajectory.__new__(Trajectory)
+        ret.numbers = self.numbers
+        ret.periodicity = list(self.periodicity)
+        ret._h5file = None
+        index = np.arange(self._size)[item]
+        if isinstance(item, slice):
+            index = item
+        ret._data = {}
+        for name in self._arrays:
+            value = self._get(name)
+            ret._data[name] = None if value is None else value[index]
+        ret._size = len(ret._data['positions'])
+        return ret
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self.get_structure(i)
+
+    def __repr__(self):
+        return 'Trajectory(natom=%d, nframes=%d)' % (self.natom, self._size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Closes the HDF5 file of a trajectory loaded with 'load', the frames that were not read cannot be used after
+        closing it. Nothing is done for other trajectories.
+        """
+        if self._h5file is not None:
+            self._h5file.close()
+            self._h5file = None
+
+    def _get(self, name):
+        value = self._data[name]
+        if value is None or len(value) == self._size:
+            return value
+        return value[:self._size]
+
+    @property
+    def positions(self):
+        """
+        Cartesian positions with shape (nframes, natom, 3)
+        """
+        return self._get('positions')
+
+    @property
+    def cells(self):
+        """
+        Cell of each frame with shape (nframes, 3, 3), None for non-periodic systems
+        """
+        return self._get('cells')
+
+    @property
+    def energies(self):
+        return self._get('energies')
+
+    @property
+    def forces(self):
+        return self._get('forces')
+
+    @property
+    def stress(self):
+        return self._get('stress')
+
+    @property
+    def symbols(self):
+        return _SYMBOLS[self.numbers].tolist()
+
+    @property
+    def natom(self):
+        return len(self.numbers)
+
+    @property
+    def nframes(self):
+        return self._size
+
+    def get_structure(self, index):
+        """
+        Creates the Structure for one frame
+
+        :param index: (int) Index of the frame
+        :return: (Structure)
+        """
+        cell = None if self.cells is None else self.cells[index]
+        return Structure(symbols=self.symbols, positions=self.positions[index], cell=cell,
+                         periodicity=self.periodicity)
+
+    def append(self, positions, cell=None, energy=None, forces=None, stress=None):
+        """
+        Adds one frame at the end of the trajectory. The arrays grow with spare capacity so appending many frames
+        does not copy the whole trajectory each time.
+
+        :param positions: (numpy.ndarray, Structure) Positions of the atoms or a Structure with the same species
+        :param cell: Cell of the frame, by default the cell of the last frame
+        :param energy: (float) Energy of the frame
+        :param forces: (numpy.ndarray) Forces over the atoms
+        :param stress: (numpy.ndarray) Stress tensor
+        """
+        if isinstance(positions, Structure):
+            if not np.array_equal(positions.numbers, self.numbers):
+                raise ValueError('The species of the structure do not match the trajectory')
+            if positions.is_periodic and cell is None:
+                cell = positions.cell
+            positions = positions.positions
+        values = {'positions': positions, 'cells': cell, 'energies': energy, 'forces': forces, 'stress': stress}
+        if cell is None and self._data['cells'] is not None and len(self._data['cells']) > 0:
+            values['cells'] = self._data['cells'][max(self._size - 1, 0)]
+        elif cell is not None:
+            values['cells'] = Structure(cell=cell).cell
+
+        shapes = {'positions': (self.natom, 3), 'cells': (3, 3), 'energies': (), 'forces': (self.natom, 3),
+                  'stress': (3, 3)}
+        for name in self._arrays:
+            if (values[name] is None) != (self._data[name] is None) and self._size > 0:
+                raise ValueError('The value of %s must be given for all the frames or none of them' % name)
+        for name in self._arrays:
+            if values[name] is None:
+                continue
+            array = self._data[name]
+            if not isinstance(array, np.ndarray) or len(array) == self._size or not array.flags.writeable:
+                # Grow with spare capacity, also when the frames are on a read-only file
+                new_array = np.zeros((max(8, 2 * self._size),) + shapes[name])
+                if array is not None:
+                    new_array[:self._size] = array[:self._size]
+                array = new_array
+            array[self._size] = np.reshape(values[name], shapes[name])
+            self._data[name] = array
+        self._size += 1
+
+    def save(self, path):
+        """
+        Stores the trajectory on a directory with one .npy file for each array or, if the name ends with '.h5' or
+        '.hdf5', on a HDF5 file (requires h5py)
+
+        :param path: (str) Name of the directory or HDF5 file
+        """
+        arrays = {'numbers': self.numbers, 'periodicity': np.array(self.periodicity)}
+        for name in self._arrays:
+            value = self._get(name)
+            if value is not None:
+                arrays[name] = np.asarray(value)
+        if _is_hdf5(path):
+            if not HAS_H5PY:
+                raise ValueError('h5py is required to store trajectories in HDF5 files')
+            with h5py.File(path, 'w') as wf:
+                for name in arrays:
+                    wf.create_dataset(name, data=arrays[name])
+        else:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            for name in arrays:
+                np.save(os.path.join(path, name + '.npy'), arrays[name])
+
+    @staticmethod
+    def load(path, mmap_mode='r'):
+        """
+        Reads a trajectory stored with 'save'. The arrays in .npy files are memory-mapped by default, so only the
+        frames used are read from disk. The datasets of HDF5 files are read when the frames are used, in that case
+        the file stays open until 'close' is called (or the trajectory is used as a context manager) and the
+        properties like 'positions' or 'forces' return h5py.Dataset objects instead of numpy arrays, they can be
+        indexed but numpy.asarray is needed for arithmetic.
+
+        >>> with Trajectory.load('trajectory.h5') as traj:  # doctest: +SKIP
+        ...     positions = np.asarray(traj.positions)
+
+        :param path: (str) Name of the directory or HDF5 file
+        :param mmap_mode: (str) Mode for numpy.load, None reads all the arrays in memory
+        :return: (Trajectory)
+        """
+        ret = Trajectory.__new__(Trajectory)
+        ret._h5file = None
+        if _is_hdf5(path):
+            if not HAS_H5PY:
+                raise ValueError('h5py is required to read trajectories from HDF5 files')
+            if mmap_mode is None:
+                with h5py.File(path, 'r') as data:
+                    arrays = {name: data[name][()] for name in data}
+            else:
+                ret._h5file = h5py.File(path, 'r')
+                arrays = {name: ret._h5file[name] for name in ret._h5file}
+        else:
+            arrays = {}
+            for name in ('numbers', 'periodicity') + Trajectory._arrays:
+                filename = os.path.join(path, name + '.npy')
+                if os.path.isfile(filename):
+                    arrays[name] = np.load(filename, mmap_mode=mmap_mode)
+        ret.numbers = np.array(arrays['numbers'], dtype=np.int16)
+        ret.periodicity = [bool(x) for x in arrays['periodicity']]
+        ret._data = {name: arrays.get(name) for name in Trajectory._arrays}
+        ret._size = len(ret._data['positions'])
+        return ret
+
+
+def _is_hdf5(path):
+    return os.path.splitext(path)[1].lower() in ['.h5', '.hdf5']
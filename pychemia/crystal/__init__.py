@@ -3,11 +3,13 @@ Module with classes for pure periodic systems (Crystals)
 There are three main classes on this module: *KPoints* for describing a grid, list or path of points
 in reciprocal space. Lattice for storing a manipulating cell vectors and computing the reciprocal lattice.
 CrystalSymmetry for computing spacegroups, finding primitives and refining cells.
+SpaceGroup gives the symmetry operations and the general and special positions of a space group.
 
 """
 from .lattice import Lattice
 from .kpoints import KPoints
 from .symmetry import CrystalSymmetry
+from .spacegroup import SpaceGroup
 
 
 # __all__ = filter(lambda s: not s.startswith('_'), dir())
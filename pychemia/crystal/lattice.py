@@ -2,15 +2,13 @@ import itertools
 import random
 import sys
 from itertools import combinations
-from math import ceil, sqrt, cos, sin, radians, acos
+from math import sqrt, cos, sin, radians, acos
 import numpy as np
 
 from pychemia import pcm_log, HAS_PYHULL
 from pychemia.utils.mathematics import length_vectors, angle_vectors, wrap2_pmhalf, \
     unit_vector, rotation_matrix_around_axis_angle, angle_vector
-from pychemia.utils.mathematics import matrix_from_eig, vector_set_perpendicular
-from pychemia.utils.periodic import covalent_radius
-from pychemia.core.composition import Composition
+from pychemia.utils.periodic import atomic_numbers, covalent_radii_array
 
 
 class Lattice:
@@ -115,21 +113,15 @@ class Lattice:
         dwrap = wrap2_pmhalf(dred)
 
         if limits is None:
-            limits = np.zeros(3, dtype=int)
-            corners = self.get_wigner_seitz_container()
+            limits = self.limits_for_distance2
 
-            limits[0] = min(int(ceil(max(1e-14 + abs(np.array([corners[x][0] for x in corners]))))), 5)
-            limits[1] = min(int(ceil(max(1e-14 + abs(np.array([corners[x][1] for x in corners]))))), 5)
-            limits[2] = min(int(ceil(max(1e-14 + abs(np.array([corners[x][2] for x in corners]))))), 5)
+        images = self._images_table(limits)
+        dtot = dwrap + images
+        norm2 = np.einsum('ij,jk,ik->i', dtot, self.metric, dtot)
 
         ret = {}
-        for i0 in np.arange(-limits[0], limits[0] + 1):
-            for i1 in np.arange(-limits[1], limits[1] + 1):
-                for i2 in np.arange(-limits[2], limits[2] + 1):
-                    dtot = dwrap + np.array([i0, i1, i2])
-                    norm2 = np.dot(np.dot(dtot, self.metric), dtot)
-                    if norm2 < radius * radius:
-                        ret[(i0, i1, i2)] = {'distance': sqrt(norm2), 'image': dtot}
+        for index in np.nonzero(norm2 < radius * radius)[0]:
+            ret[tuple(images[index])] = {'distance': sqrt(norm2[index]), 'image': dtot[index]}
 
         return ret
 
@@ -268,11 +260,7 @@ class Lattice:
 
         distances = np.sum(diff_vectors * diff_vectors, axis=3)
 
-        close_images = np.zeros((len(reduced1), len(reduced2), 3))
-        for i in range(len(reduced1)):
-            for j in range(len(reduced2)):
-                dij = distances[i, j]
-                close_images[i, j] = images[dij == min(dij)][0]
+        close_images = images[np.argmin(distances, axis=2)].astype(float)
 
         return np.min(distances, axis=2) ** 0.5, close_images
 
@@ -311,25 +299,13 @@ class Lattice:
         # log.debug('The limits are: %d %d %d' % tuple(limits))
 
         ret = {}
-        # The total size is the product of the number in the 3 directions
-        # that is double the limits plus 1 to include the zero
-        total_size = np.prod(2 * limits + 1)
-        # log.debug('The total size is: %d' % total_size)
-
-        ret['distance'] = np.zeros(total_size)
-        ret['image'] = np.zeros((total_size, 3), dtype=int)
         ret['dwrap'] = dwrap
         ret['limits'] = limits
 
-        index = 0
-        for i0 in np.arange(-limits[0], limits[0] + 1):
-            for i1 in np.arange(-limits[1], limits[1] + 1):
-                for i2 in np.arange(-limits[2], limits[2] + 1):
-                    dtot = dwrap + np.array([i0, i1, i2])
-                    norm2 = np.dot(np.dot(dtot, self.metric), dtot)
-                    ret['distance'][index] = sqrt(norm2)
-                    ret['image'][index] = np.array([i0, i1, i2])
-                    index += 1
+        images = self._images_table(limits)
+        dtot = dwrap + images
+        ret['distance'] = np.sqrt(np.einsum('ij,jk,ik->i', dtot, self.metric, dtot))
+        ret['image'] = images
 
         # Exclude distances out of sphere
         if exclude_out_sphere:
@@ -345,22 +321,122 @@ class Lattice:
 
         return ret
 
+    def pair_distances(self, reduced, radius, pairs=None, limits=None, chunk_size=1000000):
+        """
+        Computes in a single vectorized pass all the distances between pairs of atoms and the periodic
+        images of the second atom that lie inside a sphere of a given radius.
+        The translations of the images are precomputed once and the distances for many pairs are evaluated
+        together using broadcasting, the pairs are processed in chunks to keep the memory bounded.
+
+        :param reduced: (numpy.ndarray) Reduced coordinates of the atoms, an array of shape (natom, 3)
+        :param radius: (float) Maximal distance considered
+        :param pairs: (numpy.ndarray) Pairs of indices (i, j), by default all the pairs with i <= j
+        :param limits: (list) Number of images considered along each lattice vector, by default the limits are
+                       computed to contain the whole sphere
+        :param chunk_size: (int) Maximal number of pair-image distances computed simultaneously
+        :return: (dict) Flat arrays ordered by pair and image. 'i' and 'j' are the indices of the atoms, 'image' is
+                 the integer translation applied to atom j, 'vector' is the reduced vector from atom i to the image
+                 of atom j and 'distance' its length
+
+        >>> lattice = Lattice([[0.5, 0.5, -0.5], [-0.5, 0.5, 0.5], [0.5, -0.5, 0.5]])
+        >>> reduced = np.array([[0.0, 0.0, 0.0], [0.3, 0.2, 0.1]])
+        >>> ret = lattice.pair_distances(reduced, radius=3.0)
+        >>> sorted(ret.keys())
+        ['distance', 'i', 'image', 'j', 'vector']
+        >>> dist2 = lattice.distance2(reduced[0], reduced[1], radius=3.0, limits=[6, 6, 6])
+        >>> selection = (ret['i'] == 0) & (ret['j'] == 1)
+        >>> np.allclose(np.sort(ret['distance'][selection]), sorted([dist2[x]['distance'] for x in dist2]))
+        True
+        >>> vector = reduced[ret['j']] + ret['image'] - reduced[ret['i']]
+        >>> np.allclose(vector, ret['vector'])
+        True
+        """
+        reduced = np.array(reduced, dtype=float).reshape((-1, 3))
+        if pairs is None:
+            pairs = np.array(np.triu_indices(len(reduced))).T
+        else:
+            pairs = np.array(pairs, dtype=int).reshape((-1, 2))
+
+        if limits is None:
+            # The wrapped vectors could be up to half a cell away from the origin
+            recp_len = np.array(self.reciprocal().lengths)
+            limits = np.ceil(radius * recp_len + 0.5).astype(int)
+
+        images = self._images_table(limits)
+        cartesian_images = np.dot(images, self.cell)
+
+        ret = {'i': [np.zeros(0, dtype=int)],
+               'j': [np.zeros(0, dtype=int)],
+               'image': [np.zeros((0, 3), dtype=int)],
+               'vector': [np.zeros((0, 3))],
+               'distance': [np.zeros(0)]}
+
+        step = max(1, int(chunk_size // len(images)))
+        for start in range(0, len(pairs), step):
+            atom_i = pairs[start:start + step, 0]
+            atom_j = pairs[start:start + step, 1]
+
+            dred = reduced[atom_j] - reduced[atom_i]
+            dwrap = wrap2_pmhalf(dred)
+            shift = np.rint(dwrap - dred).astype(int)
+
+            dcart = np.dot(dwrap, self.cell)[:, None, :] + cartesian_images[None, :, :]
+            norm2 = np.sum(dcart * dcart, axis=2)
+            ipair, iimage = np.nonzero(norm2 < radius * radius)
+
+            ret['i'].append(atom_i[ipair])
+            ret['j'].append(atom_j[ipair])
+            ret['image'].append(images[iimage] + shift[ipair])
+            ret['vector'].append(dwrap[ipair] + images[iimage])
+            ret['distance'].append(np.sqrt(norm2[ipair, iimage]))
+
+        for key in ret:
+            ret[key] = np.concatenate(ret[key])
+        return ret
+
     @staticmethod
-    def random_cell(composition):
+    def _images_table(limits):
+        """
+        Integer translations for all the images in the box [-limits, limits]
+        The translations are ordered with the last index running faster
+
+        :param limits: (list) Number of images along each lattice vector
+        :return: (numpy.ndarray) Array of shape (nimages, 3)
+        """
+        ranges = [np.arange(-int(x), int(x) + 1) for x in limits]
+        return np.array(np.meshgrid(*ranges, indexing='ij')).reshape((3, -1)).T
+
+    @staticmethod
+    def random_cell(composition, rng=None):
+        """
+        Random lattice with the covalent volume of a given composition
+
+        :param composition: (pychemia.Composition) Composition used to compute the volume of the cell
+        :param rng: Random number generator with a 'random' method (numpy.random.Generator, numpy.random.RandomState
+                    or random.Random), by default the 'random' module seeded from the system
+        :return: (Lattice)
+
+        >>> lattice = Lattice.random_cell('NaCl', rng=np.random.default_rng(0))
+        >>> bool(np.allclose(lattice.cell, Lattice.random_cell('NaCl', rng=np.random.default_rng(0)).cell))
+        True
+        """
+        from pychemia.core.composition import Composition
         comp = Composition(composition)
         volume = comp.covalent_volume(packing='cubes')
 
-        random.seed()
+        if rng is None:
+            random.seed()
+            rng = random
 
         # make 3 random lengths
-        a = (1.0 + 0.5 * random.random())
-        b = (1.0 + 0.5 * random.random())
-        c = (1.0 + 0.5 * random.random())
+        a = (1.0 + 0.5 * rng.random())
+        b = (1.0 + 0.5 * rng.random())
+        c = (1.0 + 0.5 * rng.random())
 
         # now we make 3 random angles
-        alpha = 60.0 + 60.0 * random.random()
-        beta = 60.0 + 60.0 * random.random()
-        gamma = 60.0 + 60.0 * random.random()
+        alpha = 60.0 + 60.0 * rng.random()
+        beta = 60.0 + 60.0 * rng.random()
+        gamma = 60.0 + 60.0 * rng.random()
 
         lattice = Lattice().from_parameters_to_cell(a, b, c, alpha, beta, gamma)
 
@@ -423,6 +499,20 @@ class Lattice:
         """
         return abs(np.linalg.det(self.cell))
 
+    @property
+    def limits_for_distance2(self):
+        """
+        Number of images along each lattice vector used by distance2 when no limits are given.
+        The values are computed from the box containing the Wigner-Seitz cell and capped to 5
+
+        :return: numpy.ndarray
+        """
+        if self._limits_for_distance2 is None:
+            corners = np.array(list(self.get_wigner_seitz_container().values()))
+            limits = np.ceil(np.max(1e-14 + np.abs(corners), axis=0)).astype(int)
+            self._limits_for_distance2 = np.minimum(limits, 5)
+        return self._limits_for_distance2
+
     @property
     def metric(self):
         if self._metric is None:
@@ -487,7 +577,7 @@ class Lattice:
         c = unit_vector(np.cross(a, b))
         av = angle_vector(a, b)
         rotation_matrix = rotation_matrix_around_axis_angle(c, av)
-        self._cell = np.dot(rotation_matrix, self.cell.T).T.round(round_decimals)
+        self._set_cell(np.dot(rotation_matrix, self.cell.T).T.round(round_decimals))
 
     def align_with_plane(self, axis=2, round_decimals=14):
         a = self.cell[1]
@@ -530,53 +620,70 @@ class Lattice:
                 # print 'Failed projection', np.dot(cell[1], vector_plane)
                 # print cell
                 pass
+        self._set_cell(cell)
+
+    def _set_cell(self, cell):
+        # Changes the cell and drops the values computed from it
         self._cell = cell
+        self._metric = None
+        self._inverse = None
+        self._limits_for_distance2 = None
 
     def stretch(self, symbols, rpos, tolerance=1.0, extra=0.1):
-        # Dummy array that always will be overwritten
-        eigv = np.array([1, 0, 0])
+        """
+        Stretches the lattice along the shortest vector between pairs of atoms closer than the sum of their
+        covalent radius. The pairs are visited in order, the distances for all the remaining pairs are computed
+        at once and recomputed only after each stretching of the lattice.
+
+        :param symbols: (list) Atomic symbols
+        :param rpos: (numpy.ndarray) Reduced coordinates of the atoms
+        :param tolerance: (float) Fraction of the sum of covalent radius considered too close
+        :param extra: (float) Extra fraction of the sum of covalent radius added when a pair is separated
+        :return: (Lattice) The stretched lattice
+        """
         lattice = self.copy()
         assert len(rpos) == len(symbols)
         natom = len(rpos)
-        for i, j in combinations(range(natom), 2):
-            ret = lattice.distance2(rpos[i], rpos[j])
-            mindist = sys.float_info.max
-            for k in ret:
-                if 0 < ret[k]['distance'] < mindist:
-                    mindist = ret[k]['distance']
-                    eigv = ret[k]['image']
-
-            covalent_distance = sum(covalent_radius([symbols[i], symbols[j]]))
-            if mindist < tolerance * covalent_distance:
-                factor = (tolerance + extra) * covalent_distance / mindist
-                v1, v2, v3 = vector_set_perpendicular(eigv)
-                matrix_a = matrix_from_eig(v1, v2, v3, factor, 1, 1)
-                lattice = Lattice(np.dot(matrix_a, lattice.cell))
+        rpos = np.array(rpos, dtype=float).reshape((-1, 3))
+        pairs = np.array(list(combinations(range(natom), 2)), dtype=int).reshape((-1, 2))
+        radii = covalent_radii_array[atomic_numbers(list(symbols))]
+        covalent_distances = radii[pairs[:, 0]] + radii[pairs[:, 1]]
+        # Position of each pair (i, j) on the list of pairs
+        index = np.zeros((natom, natom), dtype=int)
+        index[pairs[:, 0], pairs[:, 1]] = np.arange(len(pairs))
+
+        start = 0
+        while start < len(pairs):
+            ret = lattice.pair_distances(rpos, radius=tolerance * np.max(covalent_distances[start:]),
+                                         pairs=pairs[start:])
+            ipair = index[ret['i'], ret['j']]
+            close = (ret['distance'] > 0) & (ret['distance'] < tolerance * covalent_distances[ipair])
+            if not np.any(close):
+                break
+            first = np.min(ipair[close])
+            candidates = np.nonzero((ipair == first) & (ret['distance'] > 0))[0]
+            nearest = candidates[np.argmin(ret['distance'][candidates])]
+            factor = (tolerance + extra) * covalent_distances[first] / ret['distance'][nearest]
+            # Scaling by 'factor' along the direction of the pair, without changes on the perpendicular plane
+            direction = unit_vector(ret['vector'][nearest])
+            matrix_a = np.eye(3) + (factor - 1) * np.outer(direction, direction)
+            lattice = Lattice(np.dot(matrix_a, lattice.cell))
+            start = first + 1
         return lattice
 
     def scale(self, symbols, rpos, tolerance=1.0):
         lattice = self.copy()
-        factor = 1.0
-        for i in range(len(rpos)):
-            # This is to separate each atom from its own image
-            covalent_dim = 2.0 * tolerance * covalent_radius(symbols[i])
-
-            this_factor = covalent_dim / lattice.a
-            if this_factor > factor:
-                factor = this_factor
-            this_factor = covalent_dim / lattice.b
-            if this_factor > factor:
-                factor = this_factor
-            this_factor = covalent_dim / lattice.c
-            if this_factor > factor:
-                factor = this_factor
-
-            for j in range(i + 1, len(rpos)):
-                distance = lattice.minimal_distance(rpos[i], rpos[j])
-                covalent_dim = tolerance * sum(covalent_radius([symbols[i], symbols[j]]))
-                this_factor = covalent_dim / distance
-                if this_factor > factor:
-                    factor = this_factor
+        rpos = np.array(rpos, dtype=float).reshape((-1, 3))
+        radii = covalent_radii_array[atomic_numbers(list(symbols))]
+        # This is to separate each atom from its own image
+        factor = max(1.0, 2.0 * tolerance * np.max(radii, initial=0.0) / min(lattice.a, lattice.b, lattice.c))
+        if len(rpos) > 1:
+            # Only pairs closer than the sum of covalent radius could increase the factor
+            pairs = np.array(list(combinations(range(len(rpos)), 2)), dtype=int)
+            ret = lattice.pair_distances(rpos, radius=2.0 * tolerance * np.max(radii), pairs=pairs)
+            nonzero = ret['distance'] > 0
+            covalent_dim = tolerance * (radii[ret['i'][nonzero]] + radii[ret['j'][nonzero]])
+            factor = max(factor, np.max(covalent_dim / ret['distance'][nonzero], initial=0.0))
         a = lattice.a
         b = lattice.b
         c = lattice.c
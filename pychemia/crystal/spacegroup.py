@@ -0,0 +1,366 @@
+"""
+Space groups from the database of spglib, with the sets of positions (general and special, like the Wyckoff
+positions) that are used to create random structures compatible with a given space group.
+"""
+
+import numpy as np
+import spglib as spg
+
+from pychemia.crystal.lattice import Lattice
+
+# First Hall number for each space group, computed when needed
+_hall_numbers = {}
+# Space groups already created, the sets of positions are computed only once for each one
+_spacegroups = {}
+
+
+def hall_number(number):
+    """
+    Hall number of the first setting of a space group in the database of spglib
+
+    :param number: (int) Number of the space group in the International Tables
+    :return: (int)
+
+    >>> hall_number(225)
+    523
+    """
+    if not 1 <= number <= 230:
+        raise ValueError('Space group number must be between 1 and 230, got %s' % str(number))
+    if len(_hall_numbers) == 0:
+        for i in range(530, 0, -1):
+            _hall_numbers[int(_spacegroup_type(i)['number'])] = i
+    return _hall_numbers[number]
+
+
+def _spacegroup_type(hall):
+    # Recent versions of spglib return an object with attributes instead of a dictionary
+    ret = spg.get_spacegroup_type(hall)
+    if hasattr(ret, 'number'):
+        ret = {'number': ret.number, 'international_short': ret.international_short}
+    return ret
+
+
+def crystal_system(number):
+    """
+    Crystal system of a space group
+
+    :param number: (int) Number of the space group in the International Tables
+    :return: (str)
+
+    >>> crystal_system(225)
+    'Cubic'
+    """
+    if number < 3:
+        return u'Triclinic'
+    elif number < 16:
+        return u'Monoclinic'
+    elif number < 75:
+        return u'Orthorhombic'
+    elif number < 143:
+        return u'Tetragonal'
+    elif number < 168:
+        return u'Trigonal'
+    elif number < 195:
+        return u'Hexagonal'
+    else:
+        return u'Cubic'
+
+
+def get_spacegroup(number):
+    """
+    Returns the SpaceGroup for a given number reusing the objects already created
+
+    :param number: (int) Number of the space group in the International Tables
+    :return: (SpaceGroup)
+    """
+    if number not in _spacegroups:
+        _spacegroups[number] = SpaceGroup(number)
+    return _spacegroups[number]
+
+
+class SpaceGroup:
+    """
+    Symmetry operations of a space group in the conventional cell, including the centering translations
+
+    >>> sg = SpaceGroup(225)
+    >>> sg.symbol, sg.nops, sg.ncentering
+    ('Fm-3m', 192, 4)
+    >>> len(sg.orbit([0.1, 0.2, 0.35]))
+    192
+    >>> len(sg.orbit([0.5, 0.5, 0.5]))
+    4
+    >>> sg.multiplicities
+    [4, 8, 24, 32, 48, 96, 192]
+    """
+
+    def __init__(self, number):
+        """
+        Creates the space group from the database of spglib
+
+        :param number: (int) Number of the space group in the International Tables
+        """
+        self.number = int(number)
+        self.hall_number = hall_number(self.number)
+        self.symbol = str(_spacegroup_type(self.hall_number)['international_short'])
+        ops = spg.get_symmetry_from_database(self.hall_number)
+        self.rotations = np.array(ops['rotations'], dtype=int)
+        self.translations = np.array(ops['translations'], dtype=float)
+        self.ncentering = int(np.sum(np.all(self.rotations == np.eye(3, dtype=int), axis=(1, 2))))
+        self._site_sets = None
+
+    def __repr__(self):
+        return 'SpaceGroup(%d)' % self.number
+
+    @property
+    def nops(self):
+        return len(self.rotations)
+
+    @property
+    def crystal_system(self):
+        return crystal_system(self.number)
+
+    def _images(self, points):
+        # Images of the points under all the operations with shape (npoints, nops, 3)
+        points = np.array(points, dtype=float).reshape((-1, 3))
+        return np.einsum('oij,pj->poi', self.rotations, points) + self.translations[None, :, :]
+
+    def orbit(self, point, tolerance=1E-4):
+        """
+        Positions equivalent by symmetry to a given one, inside the unit cell
+
+        :param point: (list) Reduced coordinates of the position
+        :param tolerance: (float) Images closer than this distance in reduced coordinates are the same position
+        :return: (numpy.ndarray) Unique positions with shape (multiplicity, 3)
+        """
+        images = self._images(point)[0] % 1.0
+        diff = images[:, None, :] - images[None, :, :]
+        same = np.all(np.abs(diff - np.round(diff)) < tolerance, axis=2)
+        # Keeps the first image of each group of equivalent images
+        return images[~np.any(np.tril(same, -1), axis=1)]
+
+    def stabilizer(self, point, tolerance=1E-4):
+        """
+        Indices of the operations that leave a position unchanged
+
+        :param point: (list) Reduced coordinates of the position
+        :param tolerance: (float) Tolerance in reduced coordinates
+        :return: (numpy.ndarray)
+        """
+        diff = self._images(point)[0] - np.array(point, dtype=float)
+        return np.nonzero(np.all(np.abs(diff - np.round(diff)) < tolerance, axis=1))[0]
+
+    @property
+    def site_sets(self):
+        """
+        Sets of positions with the same site symmetry found for this space group, each set is a tuple
+        (multiplicity, origin, basis) with the positions origin + basis.dot(z) for any vector z.
+        The first set is the general position, the special positions are found intersecting the positions fixed by
+        the operations.
+
+        :return: (list)
+        """
+        if self._site_sets is None:
+            self._site_sets = self._find_site_sets()
+        return self._site_sets
+
+    @property
+    def multiplicities(self):
+        """
+        Sorted list of the multiplicities of the sets of positions in the conventional cell
+        """
+        return sorted(set([x[0] for x in self.site_sets]))
+
+    def _find_site_sets(self, nrepresentatives=8, seed=0):
+        """
+        The sets of positions are found intersecting, starting from the whole cell, each set with the positions
+        fixed by every operation. Only a few sets of each multiplicity and dimension are intersected again, the
+        sets equivalent by symmetry have equivalent intersections.
+        """
+        rng = np.random.default_rng(seed)
+        complement = np.eye(3, dtype=int)[None, :, :] - self.rotations
+        shifts = Lattice._images_table([1, 1, 1])
+        found = {}
+        frontier = [(np.zeros(3), np.eye(3))]
+        while len(frontier) > 0:
+            points = []
+            for origin, basis in frontier:
+                # Solutions z of (I - R)(origin + basis.z) = t + shift for each operation and lattice translation
+                matrix = np.einsum('oij,jd->oid', complement, basis)
+                vector = self.translations[:, None, :] + shifts[None, :, :] - \
+                    np.dot(complement, origin)[:, None, :]
+                inverse = np.linalg.pinv(matrix)
+                z = np.einsum('odi,oni->ond', inverse, vector)
+                residual = np.einsum('oid,ond->oni', matrix, z) - vector
+                consistent = np.all(np.abs(residual) < 1E-8, axis=2)
+                # A generic solution, adding a random vector of the null space of each matrix
+                null = np.eye(basis.shape[1])[None, :, :] - np.einsum('odi,oie->ode', inverse, matrix)
+                z += np.einsum('ode,one->ond', null, rng.random(z.shape))
+                points.append((origin + np.einsum('jd,ond->onj', basis, z))[consistent] % 1.0)
+
+            groups = {}
+            for key, site_set in self._sets_from_points(np.concatenate(points), rng, found):
+                found[key] = site_set
+                if site_set[2].shape[1] > 0:
+                    groups.setdefault((site_set[0], site_set[2].shape[1]), []).append(site_set)
+            frontier = []
+            for group in groups.values():
+                for index in rng.permutation(len(group))[:nrepresentatives]:
+                    frontier.append(group[index][1:])
+
+        # Sets of isolated positions are kept only once, the others a few times for each multiplicity
+        sets = [(self.nops, np.zeros(3), np.eye(3))]
+        for multiplicity, origin, basis in sorted(found.values(), key=lambda x: (-x[0], x[2].shape[1])):
+            if basis.shape[1] == 3:
+                continue
+            elif basis.shape[1] == 0:
+                orbit = self.orbit(origin)
+                if any([x[2].shape[1] == 0 and x[0] == multiplicity and
+                        np.any(np.all(np.abs((orbit - x[1] + 0.5) % 1.0 - 0.5) < 1E-4, axis=1)) for x in sets]):
+                    continue
+            elif len([x for x in sets if x[0] == multiplicity and x[2].shape[1] == basis.shape[1]]) >= 4:
+                continue
+            sets.append((multiplicity, origin, basis))
+        return sets
+
+    def _sets_from_points(self, points, rng, known=()):
+        # Positions with the same stabilizer and lattice translations belong to the same set
+        diff = self._images(points) - points[:, None, :]
+        shifts = np.round(diff)
+        fixed = np.all(np.abs(diff - shifts) < 1E-6, axis=2)
+        keys = np.concatenate((fixed, np.where(fixed[:, :, None], shifts, 0).reshape((len(points), -1))), axis=1)
+        keys = keys.astype(np.int8)
+        unique = {}
+        for i in range(len(keys)):
+            if keys[i].tobytes() not in known:
+                unique.setdefault(keys[i].tobytes(), i)
+        ret = []
+        for key in [keys[i] for i in unique.values()]:
+            stabilizer = np.nonzero(key[:self.nops])[0]
+            shift = key[self.nops:].reshape((self.nops, 3))[stabilizer]
+            # Exact set of positions fixed by the stabilizer: R x + t = x + shift
+            matrix = (np.eye(3)[None, :, :] - self.rotations[stabilizer]).reshape((-1, 3))
+            vector = (self.translations[stabilizer] - shift).reshape(-1)
+            origin = np.linalg.lstsq(matrix, vector, rcond=None)[0]
+            singular_values, vt = np.linalg.svd(matrix)[1:]
+            basis = vt[np.sum(singular_values > 1E-8):].T
+            site_set = (self.nops // len(stabilizer), origin % 1.0, basis)
+            # A generic position of the set must have exactly this stabilizer
+            point = self.random_position(site_set, rng)
+            if np.array_equal(self.stabilizer(point), stabilizer):
+                ret.append((key.tobytes(), site_set))
+        return ret
+
+    def random_position(self, site_set, rng):
+        """
+        Random position in one set of positions
+
+        :param site_set: (tuple) One of the elements of 'site_sets'
+        :param rng: (numpy.random.Generator) Random number generator
+        :return: (numpy.ndarray) Reduced coordinates inside the unit cell
+        """
+        multiplicity, origin, basis = site_set
+        point = rng.random(3)
+        return (origin + np.dot(basis, np.dot(basis.T, point - origin))) % 1.0
+
+    def random_lattice(self, volume, rng):
+        """
+        Random conventional lattice compatible with the crystal system of the space group
+
+        :param volume: (float) Volume of the cell
+        :param rng: (numpy.random.Generator) Random number generator
+        :return: (Lattice)
+        """
+        a, b, c = 1.0 + 0.5 * rng.random(3)
+        alpha, beta, gamma = 60.0 + 60.0 * rng.random(3)
+        system = self.crystal_system
+        if system == 'Monoclinic':
+            alpha, beta, gamma = 90.0, 90.0 + 30.0 * rng.random(), 90.0
+        elif system == 'Orthorhombic':
+            alpha, beta, gamma = 90.0, 90.0, 90.0
+        elif system == 'Tetragonal':
+            b = a
+            alpha, beta, gamma = 90.0, 90.0, 90.0
+        elif system in ['Trigonal', 'Hexagonal']:
+            b = a
+            alpha, beta, gamma = 90.0, 90.0, 120.0
+        elif system == 'Cubic':
+            b, c = a, a
+            alpha, beta, gamma = 90.0, 90.0, 90.0
+        lattice = Lattice.from_parameters_to_cell(a, b, c, alpha, beta, gamma)
+        factor = (volume / lattice.volume) ** (1 / 3.0)
+        return Lattice.from_parameters_to_cell(factor * a, factor * b, factor * c, alpha, beta, gamma)
+
+    def random_sites(self, counts, rng, max_steps=1000):
+        """
+        Chooses randomly the sets of positions occupied by each species, so the number of atoms of each
+        species in the conventional cell are the given counts
+
+        :param counts: (dict) Number of atoms of each species in the conventional cell
+        :param rng: (numpy.random.Generator) Random number generator
+        :param max_steps: (int) Maximal number of sets tried before giving up
+        :return: (list) Pairs (species, position) with one position for each orbit, None if the counts cannot be
+                 reached with the multiplicities of this space group
+        """
+        sets = self.site_sets
+        species = list(counts)
+        used = set()
+        ret = []
+        steps = [0]
+
+        def fill(k, remaining):
+            if remaining == 0:
+                return k + 1 == len(species) or fill(k + 1, counts[species[k + 1]])
+            multiplicities = [x for x in self.multiplicities if x <= remaining]
+            rng.shuffle(multiplicities)
+            for multiplicity in multiplicities:
+                # One set of isolated positions not used yet and one set that can hold many atoms
+                options = [i for i in range(len(sets)) if sets[i][0] == multiplicity and i not in used]
+                isolated = [i for i in options if sets[i][2].shape[1] == 0]
+                others = [i for i in options if sets[i][2].shape[1] > 0]
+                options = [x[rng.integers(len(x))] for x in [isolated, others] if len(x) > 0]
+                rng.shuffle(options)
+                for index in options:
+                    steps[0] += 1
+                    if steps[0] > max_steps:
+                        return False
+                    if index in isolated:
+                        used.add(index)
+                    ret.append((species[k], self.random_position(sets[index], rng)))
+                    if fill(k, remaining - multiplicity):
+                        return True
+                    ret.pop()
+                    used.discard(index)
+            return False
+
+        if len(species) == 0 or fill(0, counts[species[0]]):
+            return ret
+        return None
+
+    def is_compatible(self, counts):
+        """
+        Checks if the atoms can be distributed over the positions of the space group
+
+        :param counts: (dict) Number of atoms of each species in the conventional cell
+        :return: (bool)
+
+        >>> SpaceGroup(225).is_compatible({'Na': 4, 'Cl': 4})
+        True
+        >>> SpaceGroup(225).is_compatible({'Ti': 8, 'O': 16})
+        False
+        """
+        return self.random_sites(counts, np.random.default_rng(0), max_steps=10000) is not None
+
+    def positions(self, sites):
+        """
+        Expands the positions of each orbit to all the positions in the conventional cell
+
+        :param sites: (list) Pairs (species, position) as returned by 'random_sites'
+        :return: (tuple) List of symbols and array of reduced coordinates
+        """
+        symbols = []
+        reduced = []
+        for species, point in sites:
+            orbit = self.orbit(point)
+            symbols += len(orbit) * [species]
+            reduced.append(orbit)
+        return symbols, np.concatenate(reduced)
@@ -2,6 +2,7 @@
 import spglib as spg
 from pychemia.utils.serializer import generic_serializer
 from pychemia.utils.computing import deep_unicode
+from .spacegroup import crystal_system
 
 
 def spglib_version():
@@ -150,23 +151,7 @@ class CrystalSymmetry(object):
         return spg.get_spacegroup_type(self.hall_number(symprec=symprec))
 
     def crystal_system(self, symprec=1e-5):
-
-        num = self.number(symprec)
-
-        if num < 3:
-            return u'Triclinic'
-        elif num < 16:
-            return u'Monoclinic'
-        elif num < 75:
-            return u'Orthorhombic'
-        elif num < 143:
-            return u'Tetragonal'
-        elif num < 168:
-            return u'Trigonal'
-        elif num < 195:
-            return u'Hexagonal'
-        else:
-            return u'Cubic'
+        return crystal_system(self.number(symprec))
 
     def symmetrize(self, initial_symprec=0.01, final_symprec=0.1, delta_symprec=0.01):
         if self.structure.natom == 1:
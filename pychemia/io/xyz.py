@@ -27,8 +27,9 @@ def save(structure, filename):
     wf = open(filename, 'w')
     for st in sts:
         xyz = str(st.natom) + '\n\n'
+        symbols = structure.symbols
         for i in range(structure.natom):
-            xyz += " %2s %15.7f %15.7f %15.7f\n" % (structure.symbols[i],
+            xyz += " %2s %15.7f %15.7f %15.7f\n" % (symbols[i],
                                                     structure.positions[i, 0],
                                                     structure.positions[i, 1],
                                                     structure.positions[i, 2])
@@ -1,3 +1,7 @@
+import numpy as np
+import scipy.spatial
+
+
 class StructureDistances:
 
     def __init__(self, pcdb):
@@ -22,4 +26,142 @@ class FingerPrints:
         return self.pcdb.db.fingerprints.find_one({'_id': entry_id})
 
     def update(self, entry_id, fingerprint):
-        self.pcdb.db.fingerprints.update({'_id': entry_id}, fingerprint)
+        self.pcdb.db.fingerprints.replace_one({'_id': entry_id}, fingerprint)
+
+
+def fingerprints_distance_matrix(fingerprints):
+    """
+    Matrix of cosine distances between fingerprints.
+    The distance between two fingerprints is the average over the pairs of species present in both of
+    0.5 * (1 - cos), where cos is the cosine of the angle between the two vectors for that pair, vectors with
+    different lengths are completed with zeros. All the fingerprints for a pair of species are normalized and
+    stored as rows of a matrix, so all the cosines are computed with a single matrix product.
+
+    :param fingerprints: (list) One dictionary for each candidate, with one vector for each pair of species
+    :return: (numpy.ndarray) Symmetric matrix of distances, nan for candidates without common pairs of species
+
+    >>> fps = [{'_id': 0, 'a': [1.0, 0.0], 'b': [1.0, 1.0]}, {'_id': 1, 'a': [0.0, 1.0]}, {'_id': 2, 'a': [2.0]}]
+    >>> fingerprints_distance_matrix(fps).tolist()
+    [[0.0, 0.5, 0.0], [0.5, 0.0, 0.5], [0.0, 0.5, 0.0]]
+    """
+    ncand = len(fingerprints)
+    total = np.zeros((ncand, ncand))
+    count = np.zeros((ncand, ncand))
+    pairs = sorted(set([pair for fp in fingerprints for pair in fp if pair != '_id']))
+    for pair in pairs:
+        members = np.array([i for i in range(ncand) if pair in fingerprints[i]], dtype=int)
+        size = max([len(fingerprints[i][pair]) for i in members])
+        uvects = np.zeros((len(members), size))
+        for k, i in enumerate(members):
+            vector = np.array(fingerprints[i][pair], dtype=float)
+            uvects[k, :len(vector)] = vector
+        norms = np.linalg.norm(uvects, axis=1)
+        uvects[norms > 0] /= norms[norms > 0, None]
+        block = np.ix_(members, members)
+        total[block] += 0.5 * (1.0 - np.dot(uvects, uvects.T))
+        count[block] += 1
+    with np.errstate(invalid='ignore'):
+        ret = total / count
+    np.fill_diagonal(ret, 0.0)
+    return ret
+
+
+class DuplicatesIndex:
+    """
+    Index for fast detection of duplicates in a population.
+    Each candidate is represented by a vector, all of them stored as rows of a dense matrix, and the distance
+    between candidates is the euclidean distance between vectors ('euclidean') or its square ('sqeuclidean').
+    Candidates are compared only inside the same group (ie composition) and, when values are given, only when
+    the difference of values is lower than 'value_tol'. Inside those buckets the close pairs are located with
+    a KD-tree or with blocks of matrix products over the window of values, instead of comparing all the pairs.
+    """
+
+    def __init__(self, vectors, values=None, value_tol=None, groups=None, metric='euclidean', block_size=256):
+        """
+        Creates an index for a set of candidates
+
+        :param vectors: (numpy.ndarray) One row for each candidate
+        :param values: (list) Values of the candidates sorted in increasing order
+        :param value_tol: (float) Candidates with values differing more than this tolerance are never duplicates
+        :param groups: (list) Hashable key for each candidate, only candidates with the same key are compared
+        :param metric: (str) 'euclidean' or 'sqeuclidean', how the distance is computed from the vectors
+        :param block_size: (int) Number of rows processed together when values are used
+
+        >>> vectors = np.array([[0.0, 0.0], [0.0, 0.05], [1.0, 1.0], [1.0, 1.01], [0.0, 0.02]])
+        >>> DuplicatesIndex(vectors).pairs(0.1).tolist()
+        [[0, 1], [0, 4], [1, 4], [2, 3]]
+        >>> DuplicatesIndex(vectors, groups=['A', 'A', 'A', 'A', 'B']).pairs(0.1).tolist()
+        [[0, 1], [2, 3]]
+        >>> DuplicatesIndex(vectors, values=[0.0, 0.1, 0.2, 0.3, 0.31], value_tol=0.15).pairs(0.1).tolist()
+        [[0, 1], [2, 3]]
+        """
+        assert metric in ['euclidean', 'sqeuclidean']
+        self.vectors = np.array(vectors, dtype=float).reshape((len(vectors), -1))
+        self.metric = metric
+        self.block_size = block_size
+        if values is not None:
+            values = np.array(values, dtype=float)
+            assert value_tol is not None
+            assert np.all(np.diff(values) >= 0), 'Values must be sorted in increasing order'
+        self.values = values
+        self.value_tol = value_tol
+        if groups is None:
+            groups = len(self.vectors) * [None]
+        assert len(groups) == len(self.vectors)
+        self.groups = list(groups)
+
+    def _radius(self, tolerance):
+        if self.metric == 'sqeuclidean':
+            return np.sqrt(tolerance)
+        return tolerance
+
+    def _pairs_in_window(self, members, radius):
+        vectors = self.vectors[members]
+        values = self.values[members]
+        norms = np.sum(vectors * vectors, axis=1)
+        ret = []
+        for start in range(0, len(members), self.block_size):
+            end = min(start + self.block_size, len(members))
+            # Last candidate that could be close in value to any member of this block
+            last = np.searchsorted(values, values[end - 1] + self.value_tol, side='left')
+            dist2 = norms[start:end, None] + norms[None, start:last] - 2 * np.dot(vectors[start:end],
+                                                                                   vectors[start:last].T)
+            rows = np.arange(start, end)[:, None]
+            columns = np.arange(start, last)[None, :]
+            close = (columns > rows) & (values[None, start:last] - values[start:end, None] < self.value_tol)
+            close &= dist2 < radius * radius
+            irow, icolumn = np.nonzero(close)
+            ret.append(np.array([irow + start, icolumn + start]).T)
+        return ret
+
+    def _pairs_tree(self, members, radius):
+        vectors = self.vectors[members]
+        candidates = scipy.spatial.cKDTree(vectors).query_pairs(radius, output_type='ndarray')
+        candidates = np.sort(candidates.reshape((-1, 2)), axis=1)
+        # query_pairs includes pairs at exactly the radius
+        diff = vectors[candidates[:, 0]] - vectors[candidates[:, 1]]
+        return [candidates[np.sum(diff * diff, axis=1) < radius * radius]]
+
+    def pairs(self, tolerance):
+        """
+        Pairs of candidates with a distance lower than the tolerance
+
+        :param tolerance: (float) Maximal distance for two candidates to be considered duplicates
+        :return: (numpy.ndarray) Array of pairs (i, j) with i < j sorted in lexicographic order
+        """
+        radius = self._radius(tolerance)
+        ret = [np.zeros((0, 2), dtype=int)]
+        buckets = {}
+        for i, group in enumerate(self.groups):
+            buckets.setdefault(group, []).append(i)
+        for group in buckets:
+            members = np.array(buckets[group], dtype=int)
+            if len(members) < 2:
+                continue
+            if self.values is not None:
+                found = self._pairs_in_window(members, radius)
+            else:
+                found = self._pairs_tree(members, radius)
+            ret += [members[x] for x in found]
+        ret = np.concatenate(ret).astype(int)
+        return ret[np.lexsort((ret[:, 1], ret[:, 0]))]
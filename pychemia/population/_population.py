@@ -1,9 +1,12 @@
 
+import itertools
 import json
+import multiprocessing
 import numpy as np
 from abc import ABCMeta, abstractmethod
 from pychemia import HAS_PYMONGO
 from pychemia.utils.computing import deep_unicode
+from ._distances import fingerprints_distance_matrix
 
 if HAS_PYMONGO:
     from pychemia.db import PyChemiaDB
@@ -152,16 +155,47 @@ class Population:
         for i in self.members:
             self.pcdb.unlock(i, name=name)
 
-    def distance_matrix(self, ids):
+    def distance_matrix(self, ids, nproc=1):
+        """
+        Return the matrix of distances between all the pairs of candidates in 'ids'.
+        Populations that provide fingerprints ('get_fingerprints') load all of them at once and compute the cosine
+        distances with matrix products. Otherwise the function 'distance' is called for each pair, distributed
+        over 'nproc' worker processes when possible.
+
+        :param ids: List of identifiers
+        :param nproc: (int) Number of worker processes used when the distances are computed pair by pair
+        :return: (numpy.ndarray) Symmetric matrix of distances with zeros on the diagonal
+        """
+        fingerprints = self.get_fingerprints(ids)
+        if fingerprints is not None:
+            return fingerprints_distance_matrix(fingerprints)
 
         ret = np.zeros((len(ids), len(ids)))
-
-        for i in range(len(ids) - 1):
-            for j in range(i, len(ids)):
-                ret[i, j] = self.distance(ids[i], ids[j])
-                ret[j, i] = ret[i, j]
+        pairs = list(itertools.combinations(range(len(ids)), 2))
+        ids_pairs = [(ids[i], ids[j]) for i, j in pairs]
+        # Workers inherit the population (and its database connection) from the parent process,
+        # that is only possible when processes are created with 'fork'
+        if nproc > 1 and len(pairs) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+            with context.Pool(nproc, initializer=_set_worker_population, initargs=(self,)) as pool:
+                distances = pool.map(_worker_distance, ids_pairs, chunksize=max(1, len(pairs) // (4 * nproc)))
+        else:
+            distances = [self.distance(entry_id, entry_jd) for entry_id, entry_jd in ids_pairs]
+        for (i, j), distance in zip(pairs, distances):
+            ret[i, j] = distance
+            ret[j, i] = distance
         return ret
 
+    def get_fingerprints(self, ids):
+        """
+        Populations where the 'distance' is the cosine distance between fingerprints (see
+        'fingerprints_distance_matrix') return the list of fingerprints for the identifiers 'ids'
+
+        :param ids: List of identifiers
+        :return: (list) One fingerprint for each identifier, or None if the population does not use fingerprints
+        """
+        return None
+
     def get_duplicates(self, ids, tolerance=None, fast=True):
         """
         For a given list of identifiers 'ids' checks the values for the function 'distance' and return a dictionary
@@ -183,6 +217,18 @@ class Population:
             tolerance = self.distance_tolerance
         ids = self.ids_sorted(ids)
         ret = {}
+        index = self.duplicates_index(ids)
+        if index is not None:
+            for i, j in index.pairs(tolerance):
+                if fast:
+                    if ids[i] not in ret:
+                        ret[ids[j]] = ids[i]
+                elif ids[j] in ret:
+                    ret[ids[j]].append(ids[i])
+                else:
+                    ret[ids[j]] = [ids[i]]
+            return ret
+
         for i in range(len(ids)-1):
             if fast and ids[i] in ret:
                 continue
@@ -197,6 +243,17 @@ class Population:
                             ret[ids[j]] = [ids[i]]
         return ret
 
+    def duplicates_index(self, ids):
+        """
+        Populations where the 'distance' between two candidates can be computed from vectors associated to each
+        candidate can return a DuplicatesIndex for the identifiers 'ids', in that case 'get_duplicates' avoids the
+        comparison of all pairs of candidates.
+
+        :param ids: List of identifiers in the order used by 'get_duplicates'
+        :return: (DuplicatesIndex) or None if the population does not support it
+        """
+        return None
+
     @abstractmethod
     def add_random(self):
         pass
@@ -289,3 +346,15 @@ class Population:
 
     def refine_progressive(self, entry_id):
         pass
+
+
+_worker_population = None
+
+
+def _set_worker_population(population):
+    global _worker_population
+    _worker_population = population
+
+
+def _worker_distance(ids_pair):
+    return _worker_population.distance(*ids_pair)
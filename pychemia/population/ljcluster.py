@@ -1,11 +1,12 @@
 
 import math
+import multiprocessing
 import sys
 import numpy as np
 import scipy.spatial
-from pychemia import Composition, Structure, pcm_log
+from pychemia import Composition, Structure, pcm_log, HAS_PYMONGO, use_agg_backend
 from pychemia.analysis import ClusterAnalysis, ClusterMatch
-from pychemia.code.lennardjones import lj_compact_evaluate
+from pychemia.code.lennardjones import lj_compact_evaluate, lj_compact_evaluate_batch
 from pychemia.utils.mathematics import unit_vector, length_vectors, unit_vectors, rotate_towards_axis, length_vector
 from pychemia.utils.periodic import covalent_radius, atomic_number
 from pychemia.utils.serializer import generic_serializer
@@ -14,6 +15,9 @@ from pychemia.external.symmol import get_point_group
 from ._population import Population
 from ._distances import FingerPrints, StructureDistances
 
+if HAS_PYMONGO:
+    from pymongo import UpdateOne
+
 
 class LJCluster(Population):
 
@@ -90,6 +94,31 @@ class LJCluster(Population):
 
         return entry_id, entry_jd
 
+    def get_fingerprint(self, entry_id):
+        """
+        Return the fingerprint for the cluster 'entry_id', it is computed and stored in the database if not present
+
+        :param entry_id: Identifier of the entry
+        :return: (dict) One list for each pair of species, the keys encode the atomic numbers of the pair
+        """
+        fingerprint = self.fingerprinter.get_fingerprint(entry_id)
+        if fingerprint is None:
+            structure = self.get_structure(entry_id)
+            analysis = ClusterAnalysis(structure)
+            x, ys = analysis.discrete_radial_distribution_function()
+            fingerprint = {'_id': entry_id}
+            for k in ys:
+                atomic_number1 = atomic_number(k[0])
+                atomic_number2 = atomic_number(k[1])
+                pair = '%06d' % min(atomic_number1 * 1000 + atomic_number2,
+                                    atomic_number2 * 1000 + atomic_number1)
+                fingerprint[pair] = list(ys[k])
+            self.fingerprinter.set_fingerprint(fingerprint)
+        return fingerprint
+
+    def get_fingerprints(self, ids):
+        return [self.get_fingerprint(i) for i in ids]
+
     def distance(self, entry_id, entry_jd, rcut=50):
         """
         Return a measure of the distance between two clusters by computing
@@ -108,26 +137,7 @@ class LJCluster(Population):
         if distance_entry is None:
             fingerprints = {}
             for entry_ijd in [entry_id, entry_jd]:
-
-                if self.fingerprinter.get_fingerprint(entry_ijd) is None:
-                    structure = self.get_structure(entry_ijd)
-                    analysis = ClusterAnalysis(structure)
-                    x, ys = analysis.discrete_radial_distribution_function()
-                    fingerprint = {'_id': entry_ijd}
-                    for k in ys:
-                        atomic_number1 = atomic_number(k[0])
-                        atomic_number2 = atomic_number(k[1])
-                        pair = '%06d' % min(atomic_number1 * 1000 + atomic_number2,
-                                            atomic_number2 * 1000 + atomic_number1)
-                        fingerprint[pair] = list(ys[k])
-
-                    if self.fingerprinter.get_fingerprint(entry_ijd) is None:
-                        self.fingerprinter.set_fingerprint(fingerprint)
-                    else:
-                        self.fingerprinter.update(entry_ijd, fingerprint)
-                    fingerprints[entry_ijd] = fingerprint
-                else:
-                    fingerprints[entry_ijd] = self.fingerprinter.get_fingerprint(entry_ijd)
+                fingerprints[entry_ijd] = self.get_fingerprint(entry_ijd)
 
             dij = []
             for pair in fingerprints[entry_id]:
@@ -282,17 +292,64 @@ class LJCluster(Population):
             gtol = self.target_forces
 
         positions, forces, energy = lj_compact_evaluate(structure, gtol, self.minimal_density)
+        return self._evaluated(structure, positions, forces, energy)
 
+    @staticmethod
+    def _evaluated(structure, positions, forces, energy):
+        # Common orientation and order of sites for the relaxed clusters
         structure.set_positions(positions)
         structure.relocate_to_cm()
         if structure.natom > 2:
             structure.align_inertia_momenta()
         sorted_indices = structure.sort_sites()
-        forces = forces[sorted_indices]
+        forces = np.array(forces).reshape((-1, 3))[sorted_indices]
         pg = get_point_group(structure, executable='symmol')
         properties = {'forces': generic_serializer(forces), 'energy': energy, 'point_group': pg}
         return structure, properties
 
+    def evaluate_batch(self, ids=None, method='fire', nproc=None, gtol=None):
+        """
+        Evaluates several clusters at once and stores all the results with a single bulk update of the database.
+        With method='fire' the clusters are relaxed simultaneously with a FIRE minimization vectorized over the
+        clusters, with method='pool' each cluster is relaxed as in 'evaluate' using a pool of processes
+
+        :param ids: (list) Identifiers of the clusters, by default all the active clusters not evaluated
+        :param method: (str) 'fire' or 'pool'
+        :param nproc: (int) Number of processes for method='pool', by default the number of CPUs
+        :param gtol: (float) Target for the maximal force over the atoms, by default 'target_forces'
+        :return: (list) Identifiers of the clusters evaluated
+        """
+        if gtol is None:
+            gtol = self.target_forces
+        if ids is None:
+            ids = self.actives_no_evaluated
+        if len(ids) == 0:
+            return []
+        entries = {entry['_id']: entry for entry in self.pcdb.entries.find({'_id': {'$in': list(ids)}},
+                                                                            {'structure': 1})}
+        structures = [Structure.from_dict(entries[i]['structure']) for i in ids]
+
+        if method == 'fire':
+            results = lj_compact_evaluate_batch(structures, gtol, self.minimal_density)
+        elif method == 'pool':
+            pool = multiprocessing.get_context('fork').Pool(nproc)
+            try:
+                results = pool.starmap(lj_compact_evaluate, [(x, gtol, self.minimal_density) for x in structures])
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            raise ValueError("Unknown method '%s', use 'fire' or 'pool'" % method)
+
+        requests = []
+        for entry_id, structure, (positions, forces, energy) in zip(ids, structures, results):
+            structure, properties = self._evaluated(structure, positions, forces, energy)
+            requests.append(UpdateOne({'_id': entry_id}, {'$set': {'structure': structure.to_dict,
+                                                                    'properties': properties}}))
+        self.pcdb.entries.bulk_write(requests, ordered=False)
+        pcm_log.debug('Evaluated %d clusters with method %s' % (len(ids), method))
+        return list(ids)
+
     def evaluate_entry(self, entry_id):
         pcm_log.debug('Evaluating %s target density= %7.3F' % (entry_id, self.minimal_density))
         structure = self.get_structure(entry_id)
@@ -423,6 +480,7 @@ def direct_move(pos_orig, pos_dest, fraction):
 
 
 def movement_sweep(pos_orig, pos_dest, symbols, figname='figure.pdf'):
+    use_agg_backend()
     import matplotlib.pyplot as plt
     fig, ax = plt.subplots(ncols=1, nrows=3, sharex=True, figsize=(11, 8.5))
     plt.subplots_adjust(left=0.07, bottom=0.07, right=0.98, top=0.98, wspace=0.08, hspace=0.08)
@@ -6,7 +6,8 @@ import subprocess
 import random
 import numpy as np
 from .._population import Population
-from pychemia import pcm_log
+from .._distances import DuplicatesIndex
+from pychemia import pcm_log, use_agg_backend
 from pychemia.code.abinit import AbinitInput, AbinitOutput
 from pychemia.utils.mathematics import gram_smith_qr, gea_all_angles, gea_orthogonal_from_angles, unit_vector
 from pychemia.utils.netcdf import netcdf2dict
@@ -313,6 +314,21 @@ class OrbitalDFTU(Population):
 
         return dist_euler
 
+    def duplicates_index(self, ids):
+        """
+        Index for the duplicates search, the squared euclidean distance between the unit vectors of the Euler
+        angles divided by square root of 2 is equal to the value returned by 'distance'
+
+        :param ids: List of identifiers
+        :return: (DuplicatesIndex)
+        """
+        vectors = []
+        for entry_id in ids:
+            euler_angles = self.get_correlation_params(entry_id)['euler_angles']
+            uvect = unit_vector(np.concatenate((np.cos(euler_angles), np.sin(euler_angles))).flatten())
+            vectors.append(uvect / np.sqrt(2.0))
+        return DuplicatesIndex(vectors, metric='sqeuclidean')
+
     def evaluate_entry(self, entry_id):
         """
         Evaluation externalized, no implemented
@@ -548,6 +564,7 @@ class OrbitalDFTU(Population):
 
     def plot_distance_matrix(self, filename=None, ids=None):
 
+        use_agg_backend()
         import matplotlib.pyplot as plt
         if ids is None:
             ids = self.members
@@ -3,6 +3,7 @@ import uuid
 import numpy as np
 import scipy.optimize
 from ._population import Population
+from ._distances import DuplicatesIndex
 from pychemia.utils.mathematics import unit_vector
 
 
@@ -99,6 +100,9 @@ class RealFunction(Population):
         x2 = self.db[jmember]['x']
         return np.linalg.norm(x2 - x1)
 
+    def duplicates_index(self, ids):
+        return DuplicatesIndex([self.db[i]['x'] for i in ids], metric='euclidean')
+
     def enable(self, ident):
         if ident not in self.actives:
             self.actives.append(ident)
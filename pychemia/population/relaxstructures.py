@@ -3,11 +3,12 @@ import uuid
 from math import gcd
 import numpy as np
 from ._population import Population
+from ._distances import DuplicatesIndex
 from pychemia import Composition, Structure, pcm_log
 from pychemia.analysis import StructureAnalysis, StructureChanger, StructureMatch
 from pychemia.analysis.splitting import SplitMatch
 from pychemia.utils.mathematics import unit_vector
-from pychemia.utils.periodic import atomic_number, covalent_radius
+from pychemia.utils.periodic import covalent_radius
 from pymongo import ASCENDING
 from pychemia.db import get_database
 from pychemia.crystal import CrystalSymmetry
@@ -20,7 +21,8 @@ class RelaxStructures(Population):
 
     def __init__(self, name, composition=None, tag='global', target_forces=1E-3, value_tol=1E-2,
                  distance_tolerance=0.3, min_comp_mult=2, max_comp_mult=8, pcdb_source=None, pressure=0.0,
-                 target_stress=None, target_diag_stress=None, target_nondiag_stress=None):
+                 target_stress=None, target_diag_stress=None, target_nondiag_stress=None, fingerprint_cache=None,
+                 random_method='stretching', spacegroups=None):
         """
         Defines a population of PyChemia Structures,
 
@@ -33,6 +35,11 @@ class RelaxStructures(Population):
         :param name: The name of the population. ie the name of the database
         :param composition: The composition uniform for all the members
         :param tag: A tag to differentiate different instances running concurrently
+        :param fingerprint_cache: (pychemia.analysis.FingerprintCache) Cache on disk for the fingerprints, shared with
+                                  other populations and analysis using the same directory
+        :param random_method: Method used to create random structures, 'stretching', 'scaling' or 'symmetry'
+                              (see Structure.random_cell)
+        :param spacegroups: (int, list) Space groups allowed for random structures with the method 'symmetry'
         :return: A new StructurePopulation object
         """
         if composition is not None:
@@ -46,6 +53,9 @@ class RelaxStructures(Population):
         self.max_comp_mult = max_comp_mult
         self.pcdb_source = pcdb_source
         self.pressure = pressure
+        self.fingerprint_cache = fingerprint_cache
+        self.random_method = random_method
+        self.spacegroups = spacegroups
         if target_stress is None:
             self.target_stress = target_forces
         else:
@@ -123,10 +133,15 @@ class RelaxStructures(Population):
         else:
             return False
 
-    def add_random(self, random_probability=0.3):
+    def add_random(self, random_probability=0.3, method=None):
         """
         Add one random structure to the population
+
+        :param random_probability: Probability of a random structure instead of one from the source database
+        :param method: Method used to create the random structure, by default the 'random_method' of the population
         """
+        if method is None:
+            method = self.random_method
         entry_id = None
         structure = Structure()
         if self.composition is None:
@@ -150,8 +165,8 @@ class RelaxStructures(Population):
                 rnd = 0
             if self.pcdb_source is None or rnd < random_probability:
                 pcm_log.debug('Random Structure')
-                structure = Structure.random_cell(new_comp, method='stretching', stabilization_number=5, nparal=5,
-                                                  periodic=True)
+                structure = Structure.random_cell(new_comp, method=method, stabilization_number=5, nparal=5,
+                                                  periodic=True, spacegroups=self.spacegroups)
                 break
             else:
                 pcm_log.debug('From source')
@@ -211,29 +226,48 @@ class RelaxStructures(Population):
 
     def get_duplicates(self, ids, tolerance, fast=False):
         dupes_dict = {}
-        dupes_list = []
-        values = {}
-        for i in ids:
-            values[i] = self.value(i)
+        dupes_set = set()
         selection = self.ids_sorted(ids)
         print('Searching duplicates in %d structures' % len(selection))
-        for i in range(len(selection) - 1):
+        for i, j in self.duplicates_index(selection).pairs(tolerance):
             entry_id = selection[i]
-            value_i = values[entry_id]
-            for j in range(i + 1, len(selection)):
-                entry_jd = selection[j]
-                if fast and entry_jd in dupes_list:
-                    continue
-                value_j = values[entry_jd]
-                if abs(value_i - value_j) < self.value_tol:
-                    distance = self.distance(entry_id, entry_jd)
-                    if distance < tolerance:
-                        if entry_id in dupes_dict:
-                            dupes_dict[entry_id].append(entry_jd)
-                        else:
-                            dupes_dict[entry_id] = [entry_jd]
-                        dupes_list.append(entry_jd)
-        return dupes_dict, [x for x in selection if x in dupes_list]
+            entry_jd = selection[j]
+            if fast and entry_jd in dupes_set:
+                continue
+            if entry_id in dupes_dict:
+                dupes_dict[entry_id].append(entry_jd)
+            else:
+                dupes_dict[entry_id] = [entry_jd]
+            dupes_set.add(entry_jd)
+        return dupes_dict, [x for x in selection if x in dupes_set]
+
+    def duplicates_index(self, ids, rcut=50):
+        """
+        Index for the duplicates search over the fingerprints of the structures 'ids', sorted by value.
+        The fingerprint for each pair of species is normalized and all of them are concatenated, so the squared
+        euclidean distance between the vectors is equal to the value returned by 'distance'.
+        Only structures with the same pairs of species and values closer than 'value_tol' are compared.
+
+        :param ids: List of identifiers sorted by value
+        :param rcut: (float) Radius used to compute the fingerprints
+        :return: (DuplicatesIndex)
+        """
+        values = [self.value(i) for i in ids]
+        fingerprints = [self.get_fingerprint(i, rcut=rcut) for i in ids]
+        groups = [tuple(sorted(x for x in fp if x != '_id')) for fp in fingerprints]
+        size = max([len(fp[pair]) for fp in fingerprints for pair in fp if pair != '_id'], default=0)
+        vectors = np.zeros((len(ids), max([len(x) for x in groups], default=0) * size))
+        for i in range(len(ids)):
+            for k, pair in enumerate(groups[i]):
+                uvect = np.array(fingerprints[i][pair], dtype=float)
+                norm = np.linalg.norm(uvect)
+                if norm > 0:
+                    uvect = uvect / norm
+                vectors[i, k * size:k * size + len(uvect)] = uvect
+            # distance is the mean over pairs of species of 0.5 * (1 - cos)
+            vectors[i] /= 2.0 * np.sqrt(max(1, len(groups[i])))
+        return DuplicatesIndex(vectors, values=values, value_tol=self.value_tol, groups=groups,
+                               metric='sqeuclidean')
 
     def cleaned_from_duplicates(self, ids):
         selection = self.ids_sorted(ids)
@@ -255,6 +289,31 @@ class RelaxStructures(Population):
                 ret[j, i] = ret[i, j]
         return ret
 
+    def get_fingerprint(self, entry_id, rcut=50):
+        """
+        Return the fingerprint for the structure 'entry_id', it is computed and stored in the database if not
+        present
+
+        :param entry_id: Identifier of the entry
+        :param rcut: (float) Radius used to compute the fingerprint
+        :return: (dict) One list for each pair of species, the keys encode the atomic numbers of the pair
+        """
+        fingerprint = self.pcdb.db.fingerprints.find_one({'_id': entry_id})
+        if fingerprint is None:
+            structure = self.get_structure(entry_id)
+            analysis = StructureAnalysis(structure, radius=rcut)
+            x, ys = analysis.fp_oganov(cache=self.fingerprint_cache)
+            fingerprint = {'_id': entry_id}
+            for k in ys:
+                # The keys are already the atomic numbers of each pair of species
+                pair = '%06d' % (min(k) * 1000 + max(k))
+                fingerprint[pair] = list(ys[k])
+            self.pcdb.db.fingerprints.replace_one({'_id': entry_id}, fingerprint, upsert=True)
+        return fingerprint
+
+    def get_fingerprints(self, ids, rcut=50):
+        return [self.get_fingerprint(i, rcut=rcut) for i in ids]
+
     def distance(self, entry_id, entry_jd, rcut=50):
 
         ids_pair = [entry_id, entry_jd]
@@ -266,26 +325,7 @@ class RelaxStructures(Population):
             print('Distance not in DB')
             fingerprints = {}
             for entry_ijd in [entry_id, entry_jd]:
-
-                if self.pcdb.db.fingerprints.find_one({'_id': entry_ijd}) is None:
-                    structure = self.get_structure(entry_ijd)
-                    analysis = StructureAnalysis(structure, radius=rcut)
-                    x, ys = analysis.fp_oganov()
-                    fingerprint = {'_id': entry_ijd}
-                    for k in ys:
-                        atomic_number1 = atomic_number(structure.species[k[0]])
-                        atomic_number2 = atomic_number(structure.species[k[1]])
-                        pair = '%06d' % min(atomic_number1 * 1000 + atomic_number2,
-                                            atomic_number2 * 1000 + atomic_number1)
-                        fingerprint[pair] = list(ys[k])
-
-                    if self.pcdb.db.fingerprints.find_one({'_id': entry_ijd}) is None:
-                        self.pcdb.db.fingerprints.insert(fingerprint)
-                    else:
-                        self.pcdb.db.fingerprints.update({'_id': entry_ijd}, fingerprint)
-                    fingerprints[entry_ijd] = fingerprint
-                else:
-                    fingerprints[entry_ijd] = self.pcdb.db.fingerprints.find_one({'_id': entry_ijd})
+                fingerprints[entry_ijd] = self.get_fingerprint(entry_ijd, rcut=rcut)
 
             dij = []
             for pair in fingerprints[entry_id]:
@@ -294,7 +334,7 @@ class RelaxStructures(Population):
                     uvect2 = unit_vector(fingerprints[entry_jd][pair])
                     dij.append(0.5 * (1.0 - np.dot(uvect1, uvect2)))
             distance = float(np.mean(dij))
-            self.pcdb.db.distances.insert({'pair': ids_pair, 'distance': distance})
+            self.pcdb.db.distances.insert_one({'pair': ids_pair, 'distance': distance})
         else:
             distance = distance_entry['distance']
         return distance
@@ -410,14 +450,19 @@ class RelaxStructures(Population):
                 'tag': self.tag,
                 'target_forces': self.target_forces,
                 'value_tol': self.value_tol,
-                'distance_tolerance': self.distance_tolerance}
+                'distance_tolerance': self.distance_tolerance,
+                'random_method': self.random_method,
+                'spacegroups': self.spacegroups}
 
     def from_dict(self, population_dict):
+        # The random method and the space groups are not stored on older records
         return RelaxStructures(name=population_dict['name'],
                                tag=population_dict['tag'],
                                target_forces=population_dict['target_forces'],
                                value_tol=population_dict['value_tol'],
-                               distance_tolerance=population_dict['distance_tolerance'])
+                               distance_tolerance=population_dict['distance_tolerance'],
+                               random_method=population_dict.get('random_method', 'stretching'),
+                               spacegroups=population_dict.get('spacegroups'))
 
     def cross(self, ids):
 
@@ -11,5 +11,6 @@ from .harmony import HarmonySearch
 from .swarm import ParticleSwarm
 from .mhm import MinimaHoppingMethod
 from .ant import AntColony
+from .events import PollingEvents, QueueEvents, MongoChangeEvents
 
 # __all__ = filter(lambda s: not s.startswith('_'), dir())
@@ -0,0 +1,119 @@
+"""
+Sources of events used by the searchers to know when candidates were evaluated.
+The searchers wait on one of these objects instead of sleeping a fixed amount of time between queries to the
+population, so they wake up as soon as an evaluator reports new results.
+"""
+
+import queue
+import time
+
+from pychemia import pcm_log, HAS_PYMONGO
+
+if HAS_PYMONGO:
+    import pymongo.errors
+
+
+class PollingEvents:
+    """
+    No events at all, waiting just sleeps for the given time and the searcher must check all the candidates
+    again. This is the behaviour used when no source of events is given to a searcher.
+    """
+
+    def wait(self, timeout):
+        """
+        Blocks until some candidate changes or the timeout expires
+
+        :param timeout: (float) Maximal time to wait in seconds
+        :return: (list) Identifiers of the candidates that changed, or None if the source cannot tell which
+                 candidates changed
+        """
+        time.sleep(timeout)
+        return None
+
+    def close(self):
+        pass
+
+
+class QueueEvents(PollingEvents):
+    """
+    Events received from a queue, evaluators running on the same machine call 'notify' (or put the identifier
+    on the queue) each time one candidate is evaluated.
+    Any object with the 'put' and 'get' methods of queue.Queue can be used, for example a multiprocessing.Queue
+    shared with evaluators on other processes.
+
+    >>> events = QueueEvents()
+    >>> events.notify('a')
+    >>> events.notify('b')
+    >>> events.wait(1)
+    ['a', 'b']
+    >>> events.wait(0.01)
+    []
+    """
+
+    def __init__(self, channel=None):
+        if channel is None:
+            channel = queue.Queue()
+        self.channel = channel
+
+    def notify(self, entry_id):
+        """
+        Reports that the candidate 'entry_id' changed
+
+        :param entry_id: Identifier of the candidate
+        """
+        self.channel.put(entry_id)
+
+    def wait(self, timeout):
+        ret = []
+        try:
+            ret.append(self.channel.get(timeout=timeout))
+            while True:
+                ret.append(self.channel.get_nowait())
+        except queue.Empty:
+            pass
+        return ret
+
+
+class MongoChangeEvents(PollingEvents):
+    """
+    Events from a MongoDB change stream over the entries of a PyChemiaDB database, any update made by the
+    evaluators wakes up the searcher.
+    Change streams are only available on replica sets, for standalone servers this source falls back to polling.
+    """
+
+    def __init__(self, pcdb, max_await_time=1.0):
+        """
+        Opens a change stream over the entries of a database
+
+        :param pcdb: (PyChemiaDB) The database used by the population
+        :param max_await_time: (float) Maximal time in seconds for each query of the stream to the server
+        """
+        self.stream = None
+        pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace']}}}]
+        try:
+            self.stream = pcdb.entries.watch(pipeline, max_await_time_ms=int(1000 * max_await_time))
+        except pymongo.errors.PyMongoError as exc:
+            pcm_log.warning('Change streams not available (%s), falling back to polling' % str(exc))
+
+    def wait(self, timeout):
+        if self.stream is None:
+            return PollingEvents.wait(self, timeout)
+        ret = []
+        deadline = time.time() + timeout
+        try:
+            while True:
+                change = self.stream.try_next()
+                if change is not None:
+                    ret.append(change['documentKey']['_id'])
+                elif len(ret) > 0 or time.time() >= deadline:
+                    break
+        except pymongo.errors.PyMongoError as exc:
+            pcm_log.warning('Change stream closed (%s), falling back to polling' % str(exc))
+            self.stream = None
+            return None
+        return ret
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
@@ -159,3 +159,36 @@ class FireFly(Searcher):
                 self.population.enable(new_selection[entry_id])
             else:
                 self.pass_to_new_generation(entry_id, reason='The best')
+
+    def steady_state_new(self, entry_id, survived):
+        """
+        New position for the steady-state search, the firefly just evaluated (or the winner of a tournament if
+        it was discarded) moves in the direction of the brighter survivors, or only the closest one if
+        'multi_move' is False
+        """
+        mobile = entry_id if survived else self.tournament()
+        if mobile is None:
+            return Searcher.steady_state_new(self, entry_id, survived)
+        value = self.population.value(mobile)
+        brighter = [x for x in self.population.ids_sorted(self.survivors) if self.population.value(x) < value]
+        distances = [self.population.distance(mobile, entry_jd) for entry_jd in brighter]
+        factor = self.alpha0 * (self.delta ** self.current_generation)
+        if len(brighter) == 0:
+            new_entry_id = self.population.move_random(mobile, factor=factor, in_place=False)
+        else:
+            if self.multi_move:
+                # From the closest in brightness to the brightest, as in 'run_one'
+                targets = list(zip(brighter, distances))[::-1]
+            else:
+                targets = [(brighter[distances.index(min(distances))], min(distances))]
+            new_entry_id = None
+            for entry_jd, distance in targets:
+                beta = self.beta0 * math.exp(-self.gamma * distance * distance)
+                if new_entry_id is None:
+                    new_entry_id = self.population.move(mobile, entry_jd, factor=beta, in_place=False)
+                else:
+                    self.population.move(new_entry_id, entry_jd, factor=beta, in_place=True)
+                if self.alpha0 > 0:
+                    self.population.move_random(new_entry_id, factor=factor, in_place=True)
+        self.write_change(mobile, {'change': 'modified', 'to': new_entry_id, 'reason': 'steady state'})
+        return new_entry_id
@@ -1,3 +1,4 @@
+import random
 from numpy import sum
 from .searcher import Searcher
 from pychemia import pcm_log
@@ -94,3 +95,16 @@ class GeneticAlgorithm(Searcher):
 
                 discarded_index += 1
             jump += self.crossing_sets[i]
+
+    def steady_state_new(self, entry_id, survived):
+        """
+        New candidate for the steady-state search, with probability 'cross_prob' it is the child of two parents
+        selected by tournament, otherwise it is a mutation of the winner of a tournament
+        """
+        if len(self.survivors) > 1 and random.random() < self.cross_prob:
+            parent1 = self.tournament()
+            parent2 = self.tournament()
+            if parent1 == parent2:
+                parent2 = random.choice([x for x in self.survivors if x != parent1])
+            return self.steady_state_cross(parent1, parent2)
+        return Searcher.steady_state_new(self, entry_id, survived)
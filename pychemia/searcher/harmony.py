@@ -95,3 +95,29 @@ class HarmonySearch(Searcher):
                 pcm_log.debug('[HS](%s) Tail entry: discarded' % entry_id)
                 self.replace_by_random(entry_id, reason='Tail %d' % self.tail)
                 # assert(len(self.get_generation(self.current_generation+1)) == self.generation_size)
+
+    def steady_state_new(self, entry_id, survived):
+        """
+        New harmony for the steady-state search. With probability 'hmcr' the harmony is built from the memory (the
+        survivors), adjusting the pitch of one member (a random change) with probability 'par' or crossing two
+        members otherwise. With probability 1 - 'hmcr' a new random member is created.
+        The bandwidth of the pitch adjustment is a random fraction of the distance between two members of the
+        memory, at most 'delta_change', so the changes become finer as the memory converges.
+        """
+        rnd = random.random()
+        if rnd <= self.hmcr and len(self.survivors) > 1:
+            rnd = random.random()
+            if rnd < self.par:
+                entry_jd, entry_kd = random.sample(self.survivors, 2)
+                bandwidth = min(self.delta_change, self.population.distance(entry_jd, entry_kd))
+                new_entry_id = self.population.move_random(entry_jd, factor=random.random() * bandwidth,
+                                                           in_place=False, kind='change')
+                self.write_change(entry_jd, {'change': 'modified', 'to': new_entry_id,
+                                             'reason': 'rnd= %4.3f < par= %4.3f' % (rnd, self.par)})
+            else:
+                new_entry_id = self.steady_state_cross(*random.sample(self.survivors, 2))
+        else:
+            new_entry_id, origin = self.population.add_random()
+            self.write_change(entry_id, {'change': 'random', 'to': new_entry_id, 'origin': origin,
+                                         'reason': 'rnd= %4.3f > hmcr= %4.3f' % (rnd, self.hmcr)})
+        return new_entry_id
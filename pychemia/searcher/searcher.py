@@ -1,7 +1,8 @@
 
-import time
+import random
 from abc import ABCMeta, abstractmethod
 from pychemia import pcm_log, HAS_PYMONGO
+from .events import PollingEvents
 
 if HAS_PYMONGO:
     import bson
@@ -23,6 +24,9 @@ class Searcher:
         self.current_generation = 0
         self.generation = {}
         self.sleep_time = 2
+        self.events = PollingEvents()
+        self.survivors = []
+        self.offspring = []
         self.delta_change = 0.2
         self.lineage = {}
         self.lineage_inv = {}
@@ -388,15 +392,7 @@ class Searcher:
 
             self.print_status()
 
-            number_evaluated = len(self.population.actives_evaluated)
-            while self.population.fraction_evaluated < 1.0:
-                if len(self.population.actives_evaluated) != number_evaluated:
-                    msg = "Population '%s' still not evaluated. %4.0f %%"
-                    pcm_log.debug(msg % (self.population.name, 100 * self.population.fraction_evaluated))
-                    self.print_status()
-                    number_evaluated = len(self.population.actives_evaluated)
-                self.population.replace_failed()
-                time.sleep(self.sleep_time)
+            self.wait_evaluations()
             pcm_log.info("Population '%s' evaluated. %4.0f %%" % (self.population.name,
                                                                   100 * self.population.fraction_evaluated))
 
@@ -457,6 +453,222 @@ class Searcher:
         print('Searcher ended after %d iterations' % self.current_generation)
         print('Best candidate: [%s]:\n%s' % (best_member, self.population.str_entry(best_member)))
 
+    def wait_evaluations(self, pending=None, number=None):
+        """
+        Waits until 'number' candidates from 'pending' are evaluated, by default all of them.
+        Each wait on the source of events 'events' lasts at most 'sleep_time' seconds. Only the candidates reported
+        by the events are checked again, all the pending candidates are checked when the source cannot tell which
+        candidates changed or when no event arrives before the timeout.
+        Candidates disabled or removed while waiting are not waited anymore. The status is printed each time the
+        number of evaluated candidates changes while waiting for all of them.
+
+        :param pending: List of identifiers of candidates not evaluated, by default the active candidates not
+                        evaluated, including the ones that become active while waiting (like the replacements of
+                        failed candidates)
+        :param number: (int) Number of evaluated candidates needed to return, by default all of them
+        :return: (list) Identifiers of the candidates from 'pending' that are evaluated
+        """
+        refresh = pending is None
+        if refresh:
+            seen = set(self.population.actives)
+            pending = self.population.actives_no_evaluated
+        pending = list(pending)
+        evaluated = [x for x in pending if self.population.is_evaluated(x)]
+        pending = [x for x in pending if x not in evaluated]
+        while (number is None or len(evaluated) < number) and len(pending) > 0:
+            self.population.replace_failed()
+            actives = self.population.actives
+            active_set = set(actives)
+            pending = [x for x in pending if x in active_set]
+            new_actives = []
+            if refresh:
+                new_actives = [x for x in actives if x not in seen]
+                seen.update(new_actives)
+                pending += new_actives
+            if len(pending) == 0:
+                break
+            changed = self.events.wait(self.sleep_time)
+            if changed:
+                changed = set(changed)
+                candidates = [x for x in pending if x in changed or x in new_actives]
+            else:
+                candidates = pending
+            new_evaluated = [x for x in candidates if self.population.is_evaluated(x)]
+            if len(new_evaluated) > 0:
+                evaluated += new_evaluated
+                pending = [x for x in pending if x not in new_evaluated]
+                msg = "Population '%s' still not evaluated, %d candidates pending"
+                pcm_log.debug(msg % (self.population.name, len(pending)))
+                if number is None:
+                    self.print_status()
+        return evaluated
+
+    def run_steady_state(self, max_evaluations=None):
+        """
+        Execute the search without waiting for complete generations.
+        Each time one active candidate is evaluated 'steady_state_step' decides if it survives and creates a new
+        candidate, so the evaluators never wait for the slowest candidate of a generation.
+        The searchers define their own rules for the new candidates on 'steady_state_new'.
+        Every 'generation_size' evaluations are counted as one generation for the stabilization criteria.
+
+        :param max_evaluations: (int) Maximal number of candidates evaluated, no limit by default
+        :return:
+        """
+        print("Population Information")
+        print("======================")
+        print(self.population)
+        print("Searcher Information")
+        print("====================")
+        print(self)
+        self.save_info()
+        self.population.save_info()
+
+        processed = set()
+        self.survivors = []
+        self.offspring = []
+        number_evaluations = 0
+        best_member = None
+        best_since = 0
+        while True:
+            actives = self.population.actives
+            if len(actives) < self.generation_size and len(processed) == 0:
+                self.population.random_population(self.generation_size - len(actives))
+                actives = self.population.actives
+            candidates = [x for x in actives if x not in processed]
+            if len(candidates) == 0:
+                pcm_log.debug('[%s] No candidates pending, adding random ones' % self.searcher_name)
+                self.population.random_population(self.generation_size)
+                continue
+            evaluated = [x for x in candidates if self.population.is_evaluated(x)]
+            if len(evaluated) == 0:
+                evaluated = self.wait_evaluations(candidates, number=1)
+
+            for entry_id in evaluated:
+                processed.add(entry_id)
+                self.set_generation(entry_id, self.current_generation)
+                self.steady_state_step(entry_id)
+                number_evaluations += 1
+                if number_evaluations % self.generation_size == 0:
+                    self.current_generation += 1
+                    self.save_generations()
+
+            candidate = self.population.best_candidate
+            if candidate != best_member:
+                best_member = candidate
+                best_since = number_evaluations
+                pcm_log.info('New best candidate: [%s]:\n%s' % (best_member, self.population.str_entry(best_member)))
+            if number_evaluations - best_since >= self.stabilization_limit * self.generation_size:
+                print('This candidate have survived for %d evaluations' % (number_evaluations - best_since))
+                break
+            if self.target_value is not None and self.population.value(best_member) <= self.target_value:
+                print('Target value achieved: target=%9.3f best=%9.3f' % (self.target_value,
+                                                                          self.population.value(best_member)))
+                break
+            if max_evaluations is not None and number_evaluations >= max_evaluations:
+                break
+
+        self.save_generations()
+        print('Searcher ended after %d evaluations' % number_evaluations)
+        print('Best candidate: [%s]:\n%s' % (best_member, self.population.str_entry(best_member)))
+
+    def steady_state_replace(self, entry_id):
+        """
+        Decides if the candidate 'entry_id', just evaluated, enters into the set of 'survivors', the evaluated
+        candidates that remain active during a steady-state search.
+        Duplicates of the survivors are disabled. Once the set is complete with 'generation_size' candidates the new
+        candidate replaces the worst survivor if it is better, otherwise it is disabled.
+
+        :param entry_id: Identifier of the candidate evaluated
+        :return: (bool) True if the candidate remains active
+        """
+        for entry_jd in self.survivors:
+            if self.population.distance(entry_id, entry_jd) < self.population.distance_tolerance:
+                self.write_change(entry_id, {'change': 'duplicate', 'to': entry_jd, 'reason': None})
+                self.population.disable(entry_id)
+                return False
+        if len(self.survivors) < self.generation_size:
+            self.survivors.append(entry_id)
+            return True
+        worst = self.population.ids_sorted(self.survivors)[-1]
+        if self.population.value(entry_id) < self.population.value(worst):
+            self.write_change(worst, {'change': 'replace_by_other', 'to': entry_id, 'reason': 'steady state'})
+            self.population.disable(worst)
+            self.survivors.remove(worst)
+            self.survivors.append(entry_id)
+            return True
+        self.write_change(entry_id, {'change': 'discarded', 'reason': 'steady state'})
+        self.population.disable(entry_id)
+        return False
+
+    def steady_state_step(self, entry_id):
+        """
+        Update rule applied each time the candidate 'entry_id' is evaluated during a steady-state search.
+        The candidate is processed by 'steady_state_replace' and one new candidate takes its place, the second child
+        of a previous crossing if there is one waiting or a candidate created by 'steady_state_new' otherwise.
+
+        :param entry_id: Identifier of the candidate evaluated
+        :return: Identifier of the new candidate
+        """
+        survived = self.steady_state_replace(entry_id)
+        if len(self.offspring) > 0:
+            entry_jd = self.offspring.pop(0)
+            self.population.enable(entry_jd)
+        else:
+            entry_jd = self.steady_state_new(entry_id, survived)
+        self.set_generation(entry_jd, self.current_generation)
+        return entry_jd
+
+    def steady_state_new(self, entry_id, survived):
+        """
+        Creates one new candidate during a steady-state search after the evaluation of 'entry_id'.
+        This rule moves randomly the winner of a tournament between the survivors, searchers override this method
+        with their own rules.
+
+        :param entry_id: Identifier of the candidate evaluated
+        :param survived: (bool) If the candidate evaluated remains active
+        :return: Identifier of the new candidate
+        """
+        parent = self.tournament()
+        if parent is None:
+            entry_jd, origin = self.population.add_random()
+            change = {'change': 'random', 'to': entry_jd, 'reason': 'steady state', 'origin': origin}
+            self.write_change(entry_id, change)
+        else:
+            entry_jd = self.population.move_random(parent, factor=self.delta_change, in_place=False, kind='move')
+            self.write_change(parent, {'change': 'modified', 'to': entry_jd, 'reason': 'steady state'})
+        return entry_jd
+
+    def steady_state_cross(self, entry_id, entry_jd):
+        """
+        Crosses two candidates during a steady-state search. Only the first child remains active, the second one is
+        activated later by 'steady_state_step', so the number of candidates waiting for evaluation does not grow.
+
+        :param entry_id: Identifier of the first parent
+        :param entry_jd: Identifier of the second parent
+        :return: Identifier of the first child
+        """
+        child1, child2 = self.population.cross([entry_id, entry_jd])
+        self.population.enable(child1)
+        self.population.disable(child2)
+        self.offspring.append(child2)
+        reason = 'Cross between %s and %s' % (entry_id, entry_jd)
+        self.write_change(entry_id, {'change': 'cross', 'to': child1, 'reason': reason})
+        self.write_change(entry_jd, {'change': 'cross', 'to': child2, 'reason': reason})
+        return child1
+
+    def tournament(self, size=2):
+        """
+        Selects one candidate as the best of 'size' candidates chosen randomly from the survivors of a steady-state
+        search
+
+        :param size: (int) Number of candidates in the tournament
+        :return: Identifier of the winner or None if there are no survivors
+        """
+        if len(self.survivors) == 0:
+            return None
+        contenders = random.sample(self.survivors, min(size, len(self.survivors)))
+        return self.population.ids_sorted(contenders)[0]
+
     def write_change(self, entry_id, change):
         if self.pcdb is not None:
             change['method'] = self.searcher_name
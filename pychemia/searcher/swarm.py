@@ -81,3 +81,21 @@ class ParticleSwarm(Searcher):
             else:
                 pcm_log.debug('[%s] Promoted to new generation' % str(entry_id))
                 self.pass_to_new_generation(entry_id, reason='The best')
+
+    def steady_state_new(self, entry_id, survived):
+        """
+        New position for the steady-state search, the particle just evaluated (or the winner of a tournament if
+        it was discarded) moves in the direction of the best survivor plus a random movement
+        """
+        mobile = entry_id if survived else self.tournament()
+        if mobile is None:
+            return Searcher.steady_state_new(self, entry_id, survived)
+        best = self.population.ids_sorted(self.survivors)[0]
+        factor = self.alpha0 * (self.delta ** self.current_generation)
+        if mobile == best:
+            new_entry_id = self.population.move_random(mobile, factor=factor, in_place=False)
+        else:
+            new_entry_id = self.population.move(mobile, best, factor=self.beta0, in_place=False)
+            self.population.move_random(new_entry_id, factor=factor, in_place=True)
+        self.write_change(mobile, {'change': 'modified', 'to': new_entry_id, 'reason': 'Moved to %s' % best})
+        return new_entry_id
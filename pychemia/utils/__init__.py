@@ -2,12 +2,9 @@
 Utilery definitions
 """
 
-from . import computing
-from . import constants
-from . import mathematics
-from . import metaheuristics
-from . import periodic
-from . import serializer
-from . import netcdf
+from pychemia import lazy_import
+
+__getattr__, __dir__ = lazy_import(__name__, ['computing', 'constants', 'mathematics', 'metaheuristics', 'periodic',
+                                              'serializer', 'netcdf'])
 
 # __all__ = filter(lambda s: not s.startswith('_'), dir())
@@ -375,6 +375,60 @@ def integral_gaussian(a, b, mu, sigma):
     return val_ceil - val_floor
 
 
+def gaussian_histogram(centers, delta, sigma, nbins, weights=None, integrated=True, width=8, chunk_size=1000000):
+    """
+    Computes a discrete distribution with one gaussian centered in each value of 'centers'.
+    The bins start at zero and have a size 'delta', each gaussian contributes only to the bins within
+    'width' times sigma from its center. When 'integrated' is True each bin receives the integral of the
+    gaussian over the bin (computed as difference of error functions), otherwise the value of the
+    gaussian at the beginning of the bin.
+    All the gaussians are evaluated together, in chunks of at most 'chunk_size' values.
+
+    :param centers: (numpy.ndarray) Centers of the gaussians
+    :param delta: (float) Size of the bins
+    :param sigma: (float) Standard deviation of the gaussians
+    :param nbins: (int) Number of bins
+    :param weights: (numpy.ndarray) Multiplicative factor for each gaussian, by default 1
+    :param integrated: (bool) If the gaussians are integrated over each bin
+    :param width: (float) Number of sigmas considered around each center
+    :param chunk_size: (int) Maximal number of values computed simultaneously
+    :return: (numpy.ndarray) The distribution with 'nbins' values
+
+    >>> hist = gaussian_histogram([1.0], delta=0.01, sigma=0.05, nbins=200)
+    >>> round(float(hist.sum()), 6)
+    1.0
+    >>> int(hist.argmax())
+    99
+    """
+    from scipy.special import erf
+
+    centers = np.array(centers, dtype=float).reshape(-1)
+    if weights is None:
+        weights = np.ones(len(centers))
+    else:
+        weights = np.array(weights, dtype=float).reshape(-1)
+
+    ret = np.zeros(nbins)
+    imin = np.maximum(0, (centers - width * sigma) / delta).astype(int)
+    imax = np.minimum(nbins, (centers + width * sigma) / delta).astype(int)
+    window = np.arange(max(1, int(np.max(imax - imin, initial=0))))
+    step = max(1, int(chunk_size // len(window)))
+
+    for start in range(0, len(centers), step):
+        mu = centers[start:start + step, None]
+        indices = imin[start:start + step, None] + window[None, :]
+        inside = indices < imax[start:start + step, None]
+        x = indices * delta
+        if integrated:
+            values = 0.5 * (erf((x + delta - mu) / (sigma * sqrt(2.0))) - erf((x - mu) / (sigma * sqrt(2.0))))
+        else:
+            values = np.exp(-((x - mu) ** 2) / (2 * sigma * sigma))
+        values *= weights[start:start + step, None]
+        ret += np.bincount(indices[inside], weights=values[inside], minlength=nbins)[:nbins]
+
+    return ret
+
+
 def frexp10(x):
     exp = int(math.floor(math.log10(abs(x))))
     return x / 10 ** exp, exp
@@ -621,6 +621,51 @@ oxidation_states_common = [(),
                            ()]  # Og
 
 
+def _array_table(table):
+    """
+    Read-only array with the values of a table indexed by atomic number, the missing values are NaN
+    """
+    ret = _np.array([_np.nan if x is None else x for x in table], dtype=float)
+    ret.flags.writeable = False
+    return ret
+
+
+# Tables as arrays, the properties of many atoms are obtained with a single indexing operation, for example
+# covalent_radii_array[atomic_numbers(structure.symbols)]
+covalent_radii_array = _array_table(covalent_radii)
+masses_array = _array_table(masses)
+valences_array = _array_table(valences)
+electronegativities_array = _array_table(electronegativities)
+
+_symbol_numbers = {atomic_symbols[i]: i for i in range(1, len(atomic_symbols))}
+_electronegativities = [0 if x is None else x for x in electronegativities]
+
+
+def atomic_numbers(symbols):
+    """
+    Atomic numbers for an array of atomic symbols, each different symbol is searched only once
+
+    :param symbols: (list, numpy.ndarray) Atomic symbols, atomic numbers are returned unchanged
+    :return: (numpy.ndarray) Array of integers with the shape of symbols
+
+    >>> atomic_numbers(['Na', 'Cl', 'Na'])
+    array([11, 17, 11])
+    >>> covalent_radii_array[atomic_numbers(['Au', 'Sb'])]
+    array([1.36, 1.39])
+    """
+    symbols = _np.asarray(symbols)
+    if symbols.dtype.kind in 'iuf':
+        return symbols.astype(int)
+    if symbols.size == 0:
+        return _np.zeros(symbols.shape, dtype=int)
+    unique, inverse = _np.unique(symbols, return_inverse=True)
+    try:
+        numbers = _np.array([_symbol_numbers[str(x)] for x in unique], dtype=int)
+    except KeyError as exc:
+        raise ValueError('Atomic symbol not found: %s' % exc.args[0])
+    return numbers[inverse].reshape(symbols.shape)
+
+
 def cpk_color(arg):
     return _get_property(cpk_colors, arg)
 
@@ -650,20 +695,19 @@ def _get_property(table, value=None, scale_factor=1):
         ret = (scale_factor * table[value]) if value is not None else None
     elif isinstance(value, float):
         ret = (scale_factor * table[int(value)]) if value is not None else None
-    elif isinstance(value, str) and value in atomic_symbols:
-        if table[atomic_number(value)] is None:
+    elif isinstance(value, str) and value in _symbol_numbers:
+        if table[_symbol_numbers[value]] is None:
             ret = float('nan')
         else:
-            ret = scale_factor * table[atomic_number(value)]
+            ret = scale_factor * table[_symbol_numbers[value]]
     else:
         try:
             ret = [scale_factor * table[int(x)] for x in value]
         except ValueError:
-            if not all([(x in atomic_symbols) for x in value]):
+            if not all([(x in _symbol_numbers) for x in value]):
                 raise ValueError('Not all the values are valid:', value)
             else:
-                ret = [scale_factor * table[int(x)] for x in
-                       atomic_number(value)]
+                ret = [scale_factor * table[_symbol_numbers[x]] for x in value]
     return ret
 
 
@@ -828,14 +872,7 @@ def electronegativity(value=None):
     [2.2, 0, 0.98, 1.57, 2.04, 2.55, 3.04, 3.44, 3.98, 0, 0.93]
 
     """
-    table = []
-    for i in electronegativities:
-        if i is None:
-            table.append(0)
-        else:
-            table.append(i)
-
-    return _get_property(table, value)
+    return _get_property(_electronegativities, value)
 
 
 def covalent_radius(value=None):
@@ -950,13 +987,12 @@ def atomic_number(arg):
     [11, 8, 47, 57]
 
     """
-    symbol_dict = dict(atomic_symbol())
     if hasattr(arg, 'decode'):
         arg = arg.decode()
     if isinstance(arg, str):
-        if arg not in atomic_symbols:
+        if arg not in _symbol_numbers:
             raise ValueError('Atomic symbol not found')
-        return symbol_dict[str(arg)]
+        return _symbol_numbers[arg]
     try:
         return [atomic_number(x) for x in arg]
     except TypeError:  # catch when for loop fails
@@ -1,7 +1,11 @@
 """
 Routines related to Report generation
 """
-from pychemia import HAS_MATPLOTLIB, HAS_MAYAVI
+from pychemia import HAS_MATPLOTLIB, HAS_MAYAVI, use_agg_backend
+
+if HAS_MATPLOTLIB:
+    use_agg_backend()
+
 from .dos import DensityOfStates, plot_one_dos, plot_many_dos
 from .povray import StructurePovray
 
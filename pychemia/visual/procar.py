@@ -32,8 +32,15 @@ Implemented Classes:
 
 """
 # basic modules. Should be present
+import collections
+import itertools
 import logging
+import multiprocessing
+import os
 import re
+import struct
+import tempfile
+import zipfile
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -57,6 +64,9 @@ class UtilsProcar:
 
     """
 
+    # Approximated number of characters read for each piece of the files
+    chunkSize = 32 * 1024 ** 2
+
     def __init__(self, loglevel=logging.WARNING):
         self.log = logging.getLogger("UtilsProcar")
         self.log.setLevel(loglevel)
@@ -91,11 +101,28 @@ Tries to open a gzipped file "PROCAR-spd.gz"
 
         If unable to open a file, it raises a "IOError" exception.
     """
-        import os
         import gzip
 
         self.log.debug("open_file()")
-        self.log.debug("Filename :" + filename)
+        filename = self.find_file(filename)
+        # Checking if compressed
+        if filename[-2:] == "gz":
+            self.log.info("A gzipped file found")
+            in_file = gzip.open(filename, "rt")
+        else:
+            self.log.debug("A normal file found")
+            in_file = open(filename, "r")
+        self.log.debug("OpenFile()...done")
+        return in_file
+
+    def find_file(self, filename=None):
+        """
+        Finds the file that `open_file` opens, with the same defaults
+
+        :param filename: (str) Filename or directory of the PROCAR file
+        :return: (str) Name of an existing file
+        """
+        self.log.debug("Filename :" + str(filename))
 
         if filename is None:
             filename = "PROCAR"
@@ -105,37 +132,24 @@ Tries to open a gzipped file "PROCAR-spd.gz"
         # appended
         elif os.path.isdir(filename):
             self.log.info("The filename is a directory")
-            if filename[-1] != r"/":
-                filename += "/"
-            filename += "PROCAR"
+            filename = os.path.join(filename, "PROCAR")
             self.log.debug("I will try  to open :" + filename)
 
         # checking that the file exist
         if os.path.isfile(filename):
             self.log.debug("The File does exist")
-            # Checking if compressed
-            if filename[-2:] == "gz":
-                self.log.info("A gzipped file found")
-                in_file = gzip.open(filename, "r")
-            else:
-                self.log.debug("A normal file found")
-                in_file = open(filename, "r")
-            return in_file
+            return filename
 
         # otherwise a gzipped version may exist
         elif os.path.isfile(filename + ".gz"):
             self.log.info("File not found, however a .gz version does exist and will"
                           " be used")
-            in_file = gzip.open(filename + ".gz")
+            return filename + ".gz"
 
-        else:
-            self.log.debug("File not exist, neither a gzipped version")
-            raise IOError("File not found")
+        self.log.debug("File not exist, neither a gzipped version")
+        raise IOError("File not found")
 
-        self.log.debug("OpenFile()...done")
-        return in_file
-
-    def MergeFiles(self, in_files, out_file, gzipOut=False):
+    def MergeFiles(self, in_files, out_file, gzipOut=False, nproc=1, cache=False):
         """
         Concatenate two or more PROCAR files. This methods
         takes care of the k-indexes.
@@ -150,13 +164,15 @@ Tries to open a gzipped file "PROCAR-spd.gz"
 
         -gzipOut: whether gzip or not the outout file.
 
+        -nproc: number of processes renumbering the pieces of the files.
+
+        -cache: also writes the parsed output for `ProcarParser.readFile`
+
         Warning: spin polarized case is not Ok!
 
         """
-        import gzip
-
         self.log.debug("MergeFiles()")
-        self.log.debug("infiles: " " ,".join(in_files))
+        self.log.debug("infiles: " + " ,".join(in_files))
 
         in_files = [self.open_file(x) for x in in_files]
         header = [x.readline() for x in in_files]
@@ -165,7 +181,7 @@ Tries to open a gzipped file "PROCAR-spd.gz"
         self.log.debug("All the input metalines are:\n " + "".join(metas))
         # parsing metalines
 
-        parsedMeta = [map(int, re.findall(r"#[^:]+:([^#]+)", x)) for x in metas]
+        parsedMeta = [list(map(int, re.findall(r"#[^:]+:([^#]+)", x))) for x in metas]
         kpoints = [x[0] for x in parsedMeta]
         bands = set([x[1] for x in parsedMeta])
         ions = set([x[2] for x in parsedMeta])
@@ -180,34 +196,25 @@ Tries to open a gzipped file "PROCAR-spd.gz"
         newMeta = metas[0].replace(str(kpoints[0]), str(newKpoints), 1)
         self.log.debug("New meta line:\n" + newMeta)
 
-        if gzipOut:
-            self.log.debug("gzipped output")
-            out_file = gzip.open(out_file, 'w')
-        else:
-            self.log.debug("normal output")
-            out_file = open(out_file, 'w')
-        out_file.write(header[0])
-        out_file.write(newMeta)
-
-        # embedded function to change old k-point indexes by the correct
-        # ones. The `kreplace.k` syntax is for making the variable 'static'
-        def kreplace(matchobj):
-            # self.log.debug(print matchobj.group(0))
-            kreplace.k += 1
-            kreplace.localCounter += 1
-            return matchobj.group(0).replace(str(kreplace.localCounter),
-                                             str(kreplace.k))
-
-        kreplace.k = 0
+        # The pieces of each file with the first k-point index, in the
+        # merged file and in its own file
+        def tasks():
+            k = 0
+            for inFile in in_files:
+                localCounter = 0
+                for piece in _split_kpoints(inFile, self.chunkSize):
+                    yield piece, k, localCounter
+                    count = len(re.findall(r'(\s+k-point\s*\d+\s*:)', '\n' + piece))
+                    k += count
+                    localCounter += count
+
         self.log.debug("Going to replace K-points indexes")
-        for inFile in in_files:
-            lines = inFile.read()
-            kreplace.localCounter = 0
-            lines = re.sub('(\s+k-point\s*\d+\s*:)', kreplace, lines)
-            out_file.write(lines)
-
-        self.log.debug("Closing output file")
-        out_file.close()
+        try:
+            pieces = itertools.chain([header[0] + newMeta], _ordered_map(_renumber_kpoints, tasks(), nproc))
+            _write_procar(out_file, pieces, gzipOut, cache)
+        finally:
+            for inFile in in_files:
+                inFile.close()
         self.log.debug("MergeFiles()...done")
         return
 
@@ -316,6 +323,9 @@ class ProcarParser:
 
     """
 
+    # Version of the layout of the cache files, caches with other versions are ignored
+    cacheVersion = 1
+
     def __init__(self, loglevel=logging.WARNING):
         # array with k-points, they have the following values
         # -None: if not parsed (yet) or parsed with a `permissive` flag on
@@ -337,11 +347,11 @@ class ProcarParser:
         # Number of ions+1 the +1 is the 'tot' field, ie: the sum over all atoms
         self.ionsCount = None
 
-        self.fileStr = None  # the actual file, stored in memory
         self.spd = None  # the atom/orbital projected data
         self.orbitalName = ["s", "py", "pz", "px", "dxy", "dyz", "dz2", "dxz",
                             "dx2", "tot"]
         self.orbitalCount = None  # number of orbitals
+        self.orbitalNames = None  # orbitals found in the file
 
         # number of spin components (blocks of data), 1: non-magnetic non
         # polarized, 2: spin polarized collinear, 4: non-collinear
@@ -363,8 +373,86 @@ class ProcarParser:
         self.log.debug("Procar instanciated")
         return
 
+    def _readBlocks(self, f, chunk_lines=65536):
+        """Reads the rest of the file line by line. The k-point and band
+        headers are collected as lists of strings and the projected data
+        is converted by chunks into a preallocated array with one row for
+        each ion (the 'tot' line is the ion 0), the whole file is never
+        kept in memory.
+
+        :param f: file object placed after the metadata line
+        :param chunk_lines: number of lines of projected data converted at once
+        """
+        self.log.debug("readBlocks")
+        kpoint_re = re.compile(r"k-point\s+\d+\s*:\s+([-.\d\s]+)")
+        band_re = re.compile(r"band\s*(\d+)\s*#\s*energy\s*([-.\d\s]+)")
+        self.kpoints = []
+        self.bands = []
+        self.orbitalNames = None
+        self.spd = None
+        nrows = 0
+        pending = []
+        for line in f:
+            stripped = line.lstrip()
+            if not stripped:
+                continue
+            if stripped[0].isdigit():
+                pending.append(stripped)
+            elif stripped.startswith('tot'):
+                # With only one atom the 'tot' line is not part of the data
+                if self.ionsCount != 1:
+                    pending.append('0' + stripped[3:])
+            elif stripped.startswith('k-point'):
+                match = kpoint_re.match(stripped)
+                if match:
+                    self.kpoints.append(match.group(1))
+            elif stripped.startswith('band'):
+                match = band_re.match(stripped)
+                if match:
+                    self.bands.append(match.groups())
+            elif stripped.startswith('ion') and self.orbitalNames is None:
+                self.orbitalNames = stripped.split()[1:]
+                self.orbitalCount = len(self.orbitalNames)
+            if len(pending) >= chunk_lines:
+                nrows = self._appendRows(pending, nrows)
+                pending = []
+        nrows = self._appendRows(pending, nrows)
+        if self.orbitalNames is None or nrows == 0:
+            raise RuntimeError("No projected data found")
+        self.spd = self.spd[:nrows]
+        self.log.debug("Rows of projected data: " + str(nrows))
+        self.log.debug(str(len(self.kpoints)) + " K-point headers found")
+        self.log.debug(str(len(self.bands)) + " bands headers found")
+        return
+
+    def _appendRows(self, lines, nrows):
+        """Converts lines of projected data and stores them on self.spd
+        from the row `nrows`, the array doubles its size when full.
+        Returns the new number of rows"""
+        if not lines:
+            return nrows
+        if self.orbitalNames is None:
+            raise RuntimeError("Projected data found before the 'ion' header")
+        ncols = self.orbitalCount + 1
+        values = np.fromstring(''.join(lines), sep=' ')
+        if len(values) != len(lines) * ncols:
+            self.log.error("Expected " + str(ncols) + " fields on each line of "
+                           "projected data, found " + str(len(values)) +
+                           " values on " + str(len(lines)) + " lines")
+            raise RuntimeError("Bad projected data")
+        if self.spd is None:
+            capacity = max(self.kpointsCount * self.bandsCount * self.ionsCount, len(lines))
+            self.spd = np.empty((capacity, ncols))
+        if nrows + len(lines) > len(self.spd):
+            capacity = max(2 * len(self.spd), nrows + len(lines))
+            spd = np.empty((capacity, ncols))
+            spd[:nrows] = self.spd[:nrows]
+            self.spd = spd
+        self.spd[nrows:nrows + len(lines)] = values.reshape((-1, ncols))
+        return nrows + len(lines)
+
     def _readKpoints(self, permissive=False):
-        """Reads the k-point headers. A typical k-point line is:
+        """Processes the k-point headers. A typical k-point line is:
         k-point    1 :    0.00000000 0.00000000 0.00000000  weight = 0.00003704\n
 
         fills self.kpoint[kpointsCount][3]
@@ -372,12 +460,10 @@ class ProcarParser:
         The weights are discarded (are they useful?)
         """
         self.log.debug("readKpoints")
-        if not self.fileStr:
+        if self.kpoints is None:
             self.log.warning("You should invoke `procar.readFile()` instead. Returning")
             return
 
-        # finding all the K-points headers
-        self.kpoints = re.findall(r"k-point\s+\d+\s*:\s+([-.\d\s]+)", self.fileStr)
         self.log.debug(str(len(self.kpoints)) + " K-point headers found")
         self.log.debug("The first match found is: " + str(self.kpoints[0]))
 
@@ -435,28 +521,20 @@ class ProcarParser:
 
         self.log.debug(str(self.kpoints))
         self.log.info("The kpoints shape is " + str(self.kpoints.shape))
-
-        if self.recLattice is not None:
-            self.log.info("Changing to cartesians coordinates")
-            self.kpoints = np.dot(self.kpoints, self.recLattice)
-            self.log.debug("New kpoints: \n" + str(self.kpoints))
         return
 
     def _readBands(self):
-        """Reads the bands header. A typical bands is:
+        """Processes the bands headers. A typical bands is:
         band   1 # energy   -7.11986315 # occ.  1.00000000
 
         fills self.bands[kpointsCount][bandsCount]
 
         The occupation numbers are discarded (are they useful?)"""
         self.log.debug("readBands")
-        if not self.fileStr:
-            self.log.warning("You should invoke `procar.read()` instead. Returning")
+        if self.bands is None:
+            self.log.warning("You should invoke `procar.readFile()` instead. Returning")
             return
 
-        # finding all bands
-        self.bands = re.findall(r"band\s*(\d+)\s*#\s*energy\s*([-.\d\s]+)",
-                                self.fileStr)
         self.log.debug(str(len(self.bands)) +
                        " bands headers found, bands*Kpoints = " +
                        str(self.bandsCount * self.kpointsCount))
@@ -507,7 +585,7 @@ class ProcarParser:
         return
 
     def _readOrbital(self):
-        """Reads all the spd-projected data. A typical/expected block is:
+        """Processes all the spd-projected data. A typical/expected block is:
         ion      s     py     pz     px    dxy    dyz    dz2    dxz    dx2    tot
           1  0.079  0.000  0.001  0.000  0.000  0.000  0.000  0.000  0.000  0.079
           2  0.152  0.000  0.000  0.000  0.000  0.000  0.000  0.000  0.000  0.152
@@ -523,39 +601,27 @@ class ProcarParser:
         Undefined behavior in case of phase factors (LORBIT = 12).
         """
         self.log.debug("readOrbital")
-        if not self.fileStr:
+        if self.spd is None:
             self.log.warning("You should invoke `procar.readFile()` instead. Returning")
             return
 
-        # finding all orbital headers
-        self.spd = re.findall(r"ion(.+)", self.fileStr)
-        self.log.info("the first orbital match reads: " + self.spd[0])
-        self.log.debug("And I found " + str(len(self.spd)) + " orbitals headers")
-
         # testing if the orbital names are known (the standard ones)
-        FoundOrbs = self.spd[0].split()
+        FoundOrbs = self.orbitalNames
         size = len(FoundOrbs)
         # only the first 'size' orbital
         StdOrbs = self.orbitalName[:size - 1] + self.orbitalName[-1:]
         if FoundOrbs != StdOrbs:
             self.log.warning(str(size) + " orbitals. (Some of) They are unknow (if "
                                          "you did 'filter' them it is OK).")
-        self.orbitalCount = size
-        self.orbitalNames = self.spd[0].split()
         self.log.debug("Anyway, I will use the following set of orbitals: "
                        + str(self.orbitalNames))
 
-        # Now reading the bulk of data
-        self.log.debug("Now searching the values")
-        # The case of just one atom is handled differently since the VASP
-        # output is a little different
-        if self.ionsCount is 1:
-            self.spd = re.findall(r"^(\s*1\s+.+)$", self.fileStr, re.MULTILINE)
-        else:
-            self.spd = re.findall(r"([-.\d\se]+tot.+)\n", self.fileStr)
-        # free the memory (could be a lot)
-        self.fileStr = None
-        self.log.debug("the first entry is \n" + self.spd[0])
+        # One entry for each block of ions
+        if len(self.spd) % self.ionsCount != 0:
+            self.log.error("The number of lines of projected data is not a "
+                           "multiple of the number of ions: " + str(len(self.spd)))
+            raise RuntimeError("Bad projected data")
+        self.spd = self.spd.reshape((-1, self.ionsCount * (self.orbitalCount + 1)))
 
         # Now the method will try to find the value of self.ispin,
         # previously it was set to either 1 or 2. If "1", it could be 1 or
@@ -582,21 +648,6 @@ class ProcarParser:
             self.log.info("KpointsCount: " + str(self.kpointsCount))
             raise RuntimeError("Shit happens")
 
-        # checking for consistency
-        for line in self.spd:
-            if len(line.split()) != self.ionsCount * (self.orbitalCount + 1):
-                self.log.error("Expected: " + str(self.ionsCount) + "*" +
-                               str(self.orbitalCount + 1) + " = " +
-                               str(self.ionsCount * (self.orbitalCount + 1)) +
-                               " Fields. Present block: " + str(len(line.split())))
-                print(line)
-                raise RuntimeError("Flats happens")
-
-        # replacing the "tot" string by a number, to allows a conversion
-        # to numpy
-        self.spd = [x.replace('tot', '0') for x in self.spd]
-        self.spd = [x.split() for x in self.spd]
-        self.spd = np.array(self.spd, dtype=float)
         self.log.debug("The spd (old) array shape is:" + str(self.spd.shape))
 
         # handling collinear polarized case
@@ -607,10 +658,10 @@ class ProcarParser:
             # bands.
             up, down = np.vsplit(self.spd, 2)
             # ispin = 1 for a while, we will made the distinction
-            up.shape = (self.kpointsCount, self.bandsCount / 2, 1,
-                        self.ionsCount, self.orbitalCount + 1)
-            down.shape = (self.kpointsCount, self.bandsCount / 2, 1,
-                          self.ionsCount, self.orbitalCount + 1)
+            up = up.reshape((self.kpointsCount, self.bandsCount // 2, 1,
+                             self.ionsCount, self.orbitalCount + 1))
+            down = down.reshape((self.kpointsCount, self.bandsCount // 2, 1,
+                                 self.ionsCount, self.orbitalCount + 1))
             # concatenating bandwise. Density and magntization, their
             # meaning is obvious, and do uses 2 times more memory than
             # required, but I *WANT* to keep it as close as possible to the
@@ -623,20 +674,81 @@ class ProcarParser:
 
         # otherwise, just a reshaping suffices
         else:
-            self.spd.shape = (self.kpointsCount, self.bandsCount, self.ispin,
-                              self.ionsCount, self.orbitalCount + 1)
+            self.spd = self.spd.reshape((self.kpointsCount, self.bandsCount, self.ispin,
+                                         self.ionsCount, self.orbitalCount + 1))
 
         self.log.info("spd array ready. Its shape is:" + str(self.spd.shape))
         return
 
-    def readFile(self, procar=None, permissive=False, recLattice=None):
+    def _loadCache(self, cache_file, filename, permissive=False, mmap_mode=None):
+        """Loads the arrays from a cache written by `_saveCache`. Returns
+        False if the cache does not exist or it does not correspond to the
+        current PROCAR file"""
+        if not os.path.isfile(cache_file):
+            return False
+        try:
+            with np.load(cache_file) as data:
+                if int(data['version']) != self.cacheVersion:
+                    return False
+                if data['source'].tolist() != _file_stamp(filename):
+                    self.log.info("The cache is older than the PROCAR file")
+                    return False
+                has_kpoints = bool(data['has_kpoints'])
+                if not has_kpoints and not permissive:
+                    return False
+                counts = [int(x) for x in data['counts']]
+                self.kpointsCount, self.bandsCount, self.ionsCount, self.orbitalCount = counts
+                self.ispin = int(data['ispin'])
+                self.orbitalNames = [str(x) for x in data['orbitalNames']]
+                self.kpoints = data['kpoints'] if has_kpoints else None
+                self.bands = data['bands']
+                if mmap_mode is None:
+                    self.spd = data['spd']
+            if mmap_mode is not None:
+                self.spd = _npz_memmap(cache_file, 'spd', mmap_mode)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as exc:
+            self.log.warning("Unable to read the cache '" + cache_file + "': " + str(exc))
+            return False
+        self.log.info("Data loaded from the cache: " + cache_file)
+        return True
+
+    def _saveCache(self, cache_file, filename):
+        """Stores the parsed arrays without compression on `cache_file`, the
+        file is written with a temporary name and renamed at the end"""
+        has_kpoints = self.kpoints is not None
+        arrays = {'version': self.cacheVersion,
+                  'source': _file_stamp(filename),
+                  'counts': [self.kpointsCount, self.bandsCount, self.ionsCount, self.orbitalCount],
+                  'ispin': self.ispin,
+                  'orbitalNames': np.array(self.orbitalNames),
+                  'has_kpoints': has_kpoints,
+                  'kpoints': self.kpoints if has_kpoints else np.zeros((0, 3)),
+                  'bands': self.bands,
+                  'spd': self.spd}
+        tmp_file = None
+        try:
+            fd, tmp_file = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(os.path.abspath(cache_file)))
+            with os.fdopen(fd, 'wb') as wf:
+                np.savez(wf, **arrays)
+            os.replace(tmp_file, cache_file)
+        except OSError as exc:
+            self.log.warning("Unable to write the cache '" + cache_file + "': " + str(exc))
+            if tmp_file is not None and os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return
+        self.log.info("Cache written: " + cache_file)
+
+    def readFile(self, procar=None, permissive=False, recLattice=None, cache=True, mmap_mode=None):
         """
         Reads and parses the whole PROCAR file. This method is a sort
         of metamethod: it opens the file, reads the meta data and call the
         respective functions for parsing kpoints, bands, and projected
         data.
 
-        The only method of the API it load the file completely.
+        The file is read line by line and the projected data goes by chunks
+        to a preallocated array. The parsed arrays are stored on a cache
+        next to the PROCAR file ('PROCAR.npz' for 'PROCAR') and later calls
+        load them from there while the PROCAR file is not modified.
 
         :param procar: name of the PROCAR file, can be a gzipped file (the extension is no required).
                         The default covers a wide range of obvious alternatives. The file name, if `None`
@@ -657,6 +769,12 @@ class ProcarParser:
                             given by hand, see `UtilsProcar.RecLatProcar`. If given, the
                             kpoints will be converted from direct coordinates to cartesian
                             ones. Default=None
+
+        :param cache: Use (and write) the cache of parsed arrays. Default=True
+
+        :param mmap_mode: If given ('r' or 'c') the projected data is memory-mapped from
+                            the cache instead of being read in memory, see `numpy.memmap`.
+                            Only used when the data comes from the cache. Default=None
         :return:
 
         """
@@ -664,32 +782,301 @@ class ProcarParser:
 
         self.recLattice = recLattice
 
-        self.log.debug("Opening file: '" + str(procar) + "'")
-        f = self.utils.open_file(procar)
+        filename = self.utils.find_file(procar)
+        cache_file = filename + ".npz"
+        if not (cache and self._loadCache(cache_file, filename, permissive, mmap_mode)):
+            self._parseFile(filename, permissive)
+            if cache:
+                self._saveCache(cache_file, filename)
+
+        if self.recLattice is not None and self.kpoints is not None:
+            self.log.info("Changing to cartesians coordinates")
+            self.kpoints = np.dot(self.kpoints, self.recLattice)
+            self.log.debug("New kpoints: \n" + str(self.kpoints))
+        self.log.debug("readfile...done")
+        return
+
+    def _parseFile(self, filename, permissive=False):
+        """Parses the PROCAR file `filename` into the arrays"""
+        self.log.debug("Opening file: '" + str(filename) + "'")
+        with self.utils.open_file(filename) as f:
+            self._parseLines(f, permissive)
+
+    def _parseLines(self, f, permissive=False):
+        """Parses the lines of a PROCAR from `f`, a file object or any
+        iterator over the lines"""
+        f = iter(f)
         # Line 1: PROCAR lm decomposed
-        f.readline()  # throwaway
+        next(f)  # throwaway
         # Line 2: # of k-points:  816   # of bands:  52   # of ions:   8
-        metaLine = f.readline()  # metadata
+        metaLine = next(f)  # metadata
         self.log.debug("The metadata line is: " + metaLine)
-        re.findall(r"#[^:]+:([^#]+)", metaLine)
         self.kpointsCount, self.bandsCount, self.ionsCount = \
             map(int, re.findall(r"#[^:]+:([^#]+)", metaLine))
         self.log.info("kpointsCount = " + str(self.kpointsCount))
         self.log.info("bandsCount = " + str(self.bandsCount))
         self.log.info("ionsCount = " + str(self.ionsCount))
-        if self.ionsCount is 1:
+        if self.ionsCount == 1:
             self.log.warning("Special case: only one atom found. The program may not work as expected")
         else:
             self.log.debug("An extra ion representing the  total value will be added")
             self.ionsCount += 1
 
-        # reading all the rest of the file to be parsed below
-        self.fileStr = f.read()
+        self._readBlocks(f)
         self._readKpoints(permissive)
         self._readBands()
         self._readOrbital()
-        self.log.debug("readfile...done")
+
+
+def _file_stamp(filename):
+    """Size and modification time of a file, to check if a cache is up to date"""
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _npz_memmap(filename, name, mode='r'):
+    """Memory-maps an array stored without compression on a .npz file"""
+    with zipfile.ZipFile(filename) as zf:
+        info = zf.getinfo(name + '.npy')
+    if info.compress_type != zipfile.ZIP_STORED:
+        raise ValueError("The array '" + name + "' is compressed")
+    with open(filename, 'rb') as f:
+        # Local header of the member: 30 bytes plus the name and the extra field
+        f.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(filename, dtype=dtype, mode=mode, shape=shape, offset=offset,
+                     order='F' if fortran_order else 'C')
+
+
+def _open_output(filename, gzipOut=None):
+    """Opens a text file for writing, gzipped if `gzipOut` or, when it is
+    None, if the name ends with '.gz'"""
+    import gzip
+
+    if gzipOut is None:
+        gzipOut = filename[-3:] == '.gz'
+    if gzipOut:
+        return gzip.open(filename, 'wt', compresslevel=6)
+    return open(filename, 'w')
+
+
+def _split_kpoints(fin, size):
+    """Reads the rest of a PROCAR by blocks of `size` characters and
+    yields its text in pieces that end just before a k-point line. A
+    piece can be larger than `size` if a single k-point is larger"""
+    pending = ''
+    while True:
+        block = fin.read(size)
+        if not block:
+            break
+        pending += block
+        # The last k-point could be incomplete, it stays for the next piece
+        start = pending.rfind('k-point ')
+        cut = pending.rfind('\n', 0, start) + 1 if start > 0 else 0
+        if cut > 0:
+            yield pending[:cut]
+            pending = pending[cut:]
+    if pending:
+        yield pending
+
+
+def _ordered_map(function, tasks, nproc):
+    """Applies `function(*task)` to each task keeping the order of the
+    results, with a process pool at most 2*nproc tasks are in memory"""
+    if nproc <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        for task in tasks:
+            yield function(*task)
         return
+    pending = collections.deque()
+    pool = multiprocessing.get_context('fork').Pool(nproc)
+    try:
+        for task in tasks:
+            pending.append(pool.apply_async(function, task))
+            if len(pending) >= 2 * nproc:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        for result in pending:
+            result.wait()
+        pool.close()
+        pool.join()
+
+
+class _PieceError(Exception):
+    """Error producing the pieces of a PROCAR, the original error is the
+    cause"""
+
+
+def _write_pieces(fout, pieces):
+    """Writes the pieces of text on `fout` and yields their lines, the
+    errors producing the pieces are raised as `_PieceError` to keep them
+    apart from the errors of the consumer of the lines"""
+    pieces = iter(pieces)
+    while True:
+        try:
+            piece = next(pieces)
+        except StopIteration:
+            return
+        except Exception as exc:
+            raise _PieceError() from exc
+        fout.write(piece)
+        for line in piece.splitlines(True):
+            yield line
+
+
+def _renumber_kpoints(text, k, localCounter):
+    """Changes the indexes of the k-points on a piece of a PROCAR, the
+    k-point number `localCounter` + i becomes `k` + i"""
+
+    # embedded function to change old k-point indexes by the correct
+    # ones. The `kreplace.k` syntax is for making the variable 'static'
+    def kreplace(matchobj):
+        kreplace.k += 1
+        kreplace.localCounter += 1
+        return matchobj.group(0).replace(str(kreplace.localCounter),
+                                         str(kreplace.k))
+
+    kreplace.k = k
+    kreplace.localCounter = localCounter
+    # The piece always follows a new line, needed by the pattern
+    return re.sub(r'(\s+k-point\s*\d+\s*:)', kreplace, '\n' + text)[1:]
+
+
+def _filter_orbitals(text, orbitals, orbitalsNames):
+    """Groups the orbitals on a piece of a PROCAR, see `ProcarFileFilter.FilterOrbitals`"""
+    output = []
+    for line in text.splitlines(True):
+        if re.match(r"\s*ion\s*", line):
+            line = " ".join(['ion'] + orbitalsNames + ['tot']) + "\n"
+
+        elif re.match(r"\s*\d+\s*", line) or re.match(r"\s*tot\s*", line):
+            line = line.split()
+            # all floats to an array
+            data = np.array(line[1:], dtype=float)
+            # setting a new line, keeping just the first value
+            line = line[:1]
+            for orbset in orbitals:
+                line.append(data[orbset].sum())
+            # the last value ("tot") always  should be written
+            line.append(data[-1])
+            # converting to str
+            line = [str(x) for x in line]
+            line = " ".join(line) + "\n"
+        output.append(line)
+    return ''.join(output)
+
+
+def _filter_atoms(text, atomsGroups):
+    """Groups the atoms on a piece of a PROCAR, see `ProcarFileFilter.FilterAtoms`"""
+    output = []
+    data = []
+    for line in text.splitlines(True):
+        # if line has data just capture it
+        if re.match(r"\s*\d+\s*", line):
+            data.append(line)
+        # if `line` is a end of th block (begins with 'tot'), do the
+        # work. And clean up data then
+        elif re.match(r"\s*tot\s*", line):
+            # making an array
+            data = [x.split() for x in data]
+            data = np.array(data, dtype=float)
+            # iterating on the atoms groups
+            for index in range(len(atomsGroups)):
+                atoms = atomsGroups[index]
+                # summing colum-wise
+                atomLine = data[atoms].sum(axis=0)
+                atomLine = [str(x) for x in atomLine]
+                # the atom index should not be averaged (anyway now is
+                # meaningless)
+                atomLine[0] = str(index + 1)
+                output.append(' '.join(atomLine) + '\n')
+
+            # clean the buffer
+            data = []
+            # and write the `tot` line
+            output.append(line)
+        # otherwise just write this line
+        else:
+            output.append(line)
+    return ''.join(output)
+
+
+def _filter_bands(text, Min, Max):
+    """Keeps the bands from `Min` to `Max` on a piece of a PROCAR, see `ProcarFileFilter.FilterBands`"""
+    output = []
+    write = True
+    for line in text.splitlines(True):
+        if re.match(r"\s*band\s*", line):
+            band = int(re.match(r"\s*band\s*(\d+)", line).group(1))
+            if band < Min or band > Max:
+                write = False
+            else:
+                write = True
+        if re.match(r"\s*k-point\s*", line):
+            write = True
+        if write:
+            output.append(line)
+    return ''.join(output)
+
+
+def _filter_spin(text, components):
+    """Keeps some spin components on a piece of a PROCAR, see `ProcarFileFilter.FilterSpin`"""
+    output = []
+    counter = 0
+    for line in text.splitlines(True):
+        # if any data found
+        if re.match(r"\s*\d", line):
+            # check if should be written
+            if counter in components:
+                output.append(line)
+        elif re.match(r"\s*tot", line):
+            if counter in components:
+                output.append(line)
+            # the next block will belong to other component
+            counter += 1
+        elif re.match(r"\s*ion", line):
+            output.append(line)
+            counter = 0
+        else:
+            output.append(line)
+    return ''.join(output)
+
+
+def _write_procar(filename, pieces, gzipOut=None, cache=False):
+    """Writes the pieces of text of a PROCAR on `filename`. With `cache`
+    the lines are also parsed while they are written and the cache of
+    `ProcarParser.readFile` is stored next to the file, if the output
+    can be parsed"""
+    with _open_output(filename, gzipOut) as fout:
+        if not cache:
+            for piece in pieces:
+                fout.write(piece)
+            return
+        parser = ProcarParser()
+        lines = _write_pieces(fout, pieces)
+        parsed = True
+        try:
+            try:
+                parser._parseLines(lines, permissive=True)
+            except (RuntimeError, ValueError) as exc:
+                parser.log.warning("Unable to parse '" + filename + "', the cache is not written: " + str(exc))
+                parsed = False
+                # the rest of the file is written anyway
+                for _ in lines:
+                    pass
+        except _PieceError as exc:
+            # Errors of the filters are never hidden
+            raise exc.__cause__
+    if parsed:
+        parser._saveCache(filename + ".npz", filename)
 
 
 class ProcarFileFilter:
@@ -731,15 +1118,28 @@ class ProcarFileFilter:
      >>> a = ProcarFileFilter("PROCAR", "PROCAR-new")
      >>> a.FilterSpin([0])
 
+    The input is read by pieces of whole k-points, processed by `nproc`
+    processes and written in order, gzipped if the name of the output
+    ends with '.gz'. With `cache=True` the output is also parsed while
+    it is written and the cache of `ProcarParser.readFile` is stored next
+    to it.
+
     """
+    # Approximated number of characters read for each piece of the file
+    chunkSize = 32 * 1024 ** 2
 
-    def __init__(self, infile=None, outfile=None, loglevel=logging.WARNING):
+    def __init__(self, infile=None, outfile=None, loglevel=logging.WARNING, nproc=1, cache=False):
         """Initialize the class.
 
         Params: `infile=None`, input fileName
+                `outfile=None`, output fileName
+                `nproc=1`, number of processes for the pieces of the file
+                `cache=False`, also writes the parsed output for `ProcarParser`
         """
         self.infile = infile
         self.outfile = outfile
+        self.nproc = nproc
+        self.cache = cache
 
         # We want a logging to tell us what is happening
         self.log = logging.getLogger("ProcarFileFilter")
@@ -790,35 +1190,7 @@ class ProcarFileFilter:
                 included. Do not needs to be called
 
         """
-        # setting iostuff, this method -and class- should not made any
-        # checking about IO, that is the job of the caller
-        self.log.info("In File: " + self.infile)
-        self.log.info("Out File: " + self.outfile)
-        # open the files
-        fout = open(self.outfile, 'w')
-        fopener = UtilsProcar()
-        fin = fopener.open_file(self.infile)
-        for line in fin:
-            if re.match(r"\s*ion\s*", line):
-                # self.log.debug("orbital line found: " + line)
-                line = " ".join(['ion'] + orbitalsNames + ['tot']) + "\n"
-
-            elif re.match(r"\s*\d+\s*", line) or re.match(r"\s*tot\s*", line):
-                # self.log.debug("data line found: " + line)
-                line = line.split()
-                # all floats to an array
-                data = np.array(line[1:], dtype=float)
-                # setting a new line, keeping just the first value
-                line = line[:1]
-                for orbset in orbitals:
-                    line.append(data[orbset].sum())
-                # the last value ("tot") always  should be written
-                line.append(data[-1])
-                # converting to str
-                line = [str(x) for x in line]
-                line = " ".join(line) + "\n"
-            fout.write(line)
-
+        self._filter(_filter_orbitals, (orbitals, orbitalsNames))
         return
 
     def FilterAtoms(self, atomsGroups):
@@ -839,58 +1211,15 @@ class ProcarFileFilter:
           -The output has a dummy atom index, without any intrisic meaning
 
         """
-        # setting iostuff, this method -and class- should not made any
-        # checking about IO, that is the job of the caller
-        self.log.info("In File: " + self.infile)
-        self.log.info("Out File: " + self.outfile)
-        # open the files
-        fout = open(self.outfile, 'w')
-        fopener = UtilsProcar()
-        with fopener.open_file(self.infile) as fin:
-            # I need to change the numbers of ions, it will needs the second
-            # line. The first one is not needed
-            fout.write(fin.readline())
-            line = fin.readline()
+        # I need to change the numbers of ions, it will needs the second
+        # line. The first one is not needed
+        def meta(line):
             line = line.split()
             # the very last value needs to be changed
             line[-1] = str(len(atomsGroups))
-            line = ' '.join(line)
-            fout.write(line + '\n')
-
-            # now parsing the rest of the file
-            data = []
-            for line in fin:
-                # if line has data just capture it
-                if re.match(r"\s*\d+\s*", line):
-                    # self.log.debug("atoms line found: " + line)
-                    data.append(line)
-                # if `line` is a end of th block (begins with 'tot'), do the
-                # work. And clean up data then
-                elif re.match(r"\s*tot\s*", line):
-                    # self.log.debug("tot line found: " + line)
-                    # making an array
-                    data = [x.split() for x in data]
-                    data = np.array(data, dtype=float)
-                    # iterating on the atoms groups
-                    for index in range(len(atomsGroups)):
-                        atoms = atomsGroups[index]
-                        # summing colum-wise
-                        atomLine = data[atoms].sum(axis=0)
-                        atomLine = [str(x) for x in atomLine]
-                        # the atom index should not be averaged (anyway now is
-                        # meaningless)
-                        atomLine[0] = str(index + 1)
-                        atomLine = ' '.join(atomLine)
-                        fout.write(atomLine + '\n')
-
-                    # clean the buffer
-                    data = []
-                    # and write the `tot` line
-                    fout.write(line)
-                # otherwise just write this line
-                else:
-                    fout.write(line)
+            return ' '.join(line) + '\n'
 
+        self._filter(_filter_atoms, (atomsGroups,), meta)
         return
 
     def FilterBands(self, Min, Max):
@@ -910,41 +1239,17 @@ class ProcarFileFilter:
           consider a large region and made some trial and error
 
         """
-        # setting iostuff, this method -and class- should not made any
-        # checking about IO, that is the job of the caller
-        self.log.info("In File: " + self.infile)
-        self.log.info("Out File: " + self.outfile)
-        # open the files
-        fout = open(self.outfile, 'w')
-        fopener = UtilsProcar()
-        fin = fopener.open_file(self.infile)
-
         # I need to change the numbers of kpoints, it will needs the second
         # line. The first one is not needed
-        fout.write(fin.readline())
-        line = fin.readline()
-        # the third value needs to be changed, however better print it
-        self.log.debug("The line contaning bands number is " + line)
-        line = line.split()
-        self.log.debug("The number of bands is: " + line[7])
-        line[7] = str(Max - Min + 1)
-        line = ' '.join(line)
-        fout.write(line + '\n')
-
-        # now parsing the rest of the file
-        write = True
-        for line in fin:
-            if re.match(r"\s*band\s*", line):
-                # self.log.debug("bands line found: " + line)
-                band = int(re.match(r"\s*band\s*(\d+)", line).group(1))
-                if band < Min or band > Max:
-                    write = False
-                else:
-                    write = True
-            if re.match(r"\s*k-point\s*", line):
-                write = True
-            if write:
-                fout.write(line)
+        def meta(line):
+            # the third value needs to be changed, however better print it
+            self.log.debug("The line contaning bands number is " + line)
+            line = line.split()
+            self.log.debug("The number of bands is: " + line[7])
+            line[7] = str(Max - Min + 1)
+            return ' '.join(line) + '\n'
+
+        self._filter(_filter_bands, (Min, Max), meta)
         return
 
     def FilterSpin(self, components):
@@ -962,31 +1267,27 @@ class ProcarFileFilter:
         even a warning message!
 
         """
+        self._filter(_filter_spin, (components,))
+        return
+
+    def _filter(self, function, args, meta=None):
+        """Applies `function(piece, *args)` to the pieces of the input
+        file split at the k-points, in parallel if `nproc` > 1, and
+        writes the results in order. The function `meta` changes the
+        metadata line (the second one)"""
         # setting iostuff, this method -and class- should not made any
         # checking about IO, that is the job of the caller
         self.log.info("In File: " + self.infile)
         self.log.info("Out File: " + self.outfile)
-        # open the files
-        fout = open(self.outfile, 'w')
         fopener = UtilsProcar()
         with fopener.open_file(self.infile) as fin:
-            counter = 0
-            for line in fin:
-                # if any data found
-                if re.match(r"\s*\d", line):
-                    # check if should be written
-                    if counter in components:
-                        fout.write(line)
-                elif re.match(r"\s*tot", line):
-                    if counter in components:
-                        fout.write(line)
-                    # the next block will belong to other component
-                    counter += 1
-                elif re.match(r"\s*ion", line):
-                    fout.write(line)
-                    counter = 0
-                else:
-                    fout.write(line)
+            header = fin.readline()
+            metaLine = fin.readline()
+            if meta is not None:
+                metaLine = meta(metaLine)
+            tasks = ((piece,) + tuple(args) for piece in _split_kpoints(fin, self.chunkSize))
+            pieces = itertools.chain([header + metaLine], _ordered_map(function, tasks, self.nproc))
+            _write_procar(self.outfile, pieces, cache=self.cache)
         return
 
 
@@ -1003,15 +1304,23 @@ class ProcarSelect:
     The selection of components should be done in order, says, first
     "ispin", then "atom", and at last "orbital".
 
-    Note: once any selection has been performed, the data itself
-    changes. Say, if you want compare atom [0] and [1,2], you need two
-    instances of this class.
+    The selections are not applied immediately, they are composed and
+    evaluated in a single reduction when `spd` is used. The reduction
+    goes by chunks of k-points, so the projected data of ProcarData
+    (that could be memory-mapped, see `ProcarParser.readFile`) is never
+    copied nor loaded at once.
+
+    Note: once any selection has been performed, the data of the
+    instance changes. Say, if you want compare atom [0] and [1,2], you
+    need two instances of this class.
 
 
     Example to compare the bandstructure of two set of atoms
     >>>
 
     """
+    # Approximated size in bytes of the chunks of projected data reduced at once
+    chunkBytes = 64 * 1024 ** 2
 
     def __init__(self, ProcarData=None, deepCopy=True, loglevel=logging.WARNING):
 
@@ -1034,25 +1343,73 @@ class ProcarSelect:
             self.setData(ProcarData, deepCopy)
         return
 
+    @property
+    def spd(self):
+        """Projected data with the selections done so far"""
+        if self._weights:
+            self._source = self._reduce()
+            self._weights = []
+        return self._source
+
+    @spd.setter
+    def spd(self, value):
+        self._source = value
+        # weights over the axes 2, 3, ... of the source, one for each
+        # selection not evaluated yet
+        self._weights = []
+
+    def _reduce(self):
+        """Evaluates the pending selections over the source, k-points by chunks"""
+        source = self._source
+        nsel = len(self._weights)
+        axes = 'abcdefghij'[:source.ndim]
+        subscripts = axes + ',' + ','.join(axes[2:2 + nsel]) + '->' + axes[:2] + axes[2 + nsel:]
+        spd = np.empty(source.shape[:2] + source.shape[2 + nsel:])
+        step = max(1, self.chunkBytes // max(1, source[:1].nbytes))
+        self.log.debug("Reducing " + subscripts + " by chunks of " + str(step) + " k-points")
+        for start in range(0, len(source), step):
+            chunk = np.asarray(source[start:start + step])
+            spd[start:start + step] = np.einsum(subscripts, chunk, *self._weights, optimize=True)
+        return spd
+
+    def _select(self, value, ndim, name):
+        """Adds a selection over the first axis not reduced of the source,
+        the number of dimensions left before the selection should be
+        `ndim`"""
+        dimen = self._source.ndim - len(self._weights)
+        if dimen != ndim:
+            self.log.error("The array is " + str(dimen) + " dimensional, expecting a " +
+                           str(ndim) + " dimensional array.")
+            self.log.error("You should call selectIspin->selecAtom->selectOrbitals, "
+                           "in this order.")
+            raise RuntimeError('Wrong dimensionality of the array')
+        size = self._source.shape[len(self._weights) + 2]
+        # Repeated indices are summed as many times as they appear
+        index = np.atleast_1d(np.arange(size)[value])
+        self._weights.append(np.bincount(index, minlength=size).astype(float))
+        self.log.info(name + " selection added, new shape =" +
+                      str(self._source.shape[:2] + self._source.shape[len(self._weights) + 2:]))
+
     def setData(self, ProcarData, deepCopy=True):
         """
-        The data from ProcarData is deepCopy-ed by default (ie: their
-        elements are not modified by this class.
+        The data from ProcarData is never modified by this class and the
+        projected data is not copied. The bands and k-points are
+        deepCopy-ed by default.
 
         Args:
 
         -ProcarData: is a ProcarParser instance (or anything with similar
          functionality, duck typing)
 
-        -deepCopy=True: If false a shallow copy will be made (saves memory).
+        -deepCopy=True: If false a shallow copy of bands and k-points will
+         be made.
         """
         self.log.debug("setData: ...")
+        self.spd = ProcarData.spd
         if deepCopy is True:
-            self.spd = ProcarData.spd.copy()
             self.bands = ProcarData.bands.copy()
-            self.kpoints = ProcarData.kpoints.copy()
+            self.kpoints = None if ProcarData.kpoints is None else ProcarData.kpoints.copy()
         else:
-            self.spd = ProcarData.spd
             self.bands = ProcarData.bands
             self.kpoints = ProcarData.kpoints
         self.log.debug("setData: ... Done")
@@ -1071,19 +1428,8 @@ class ProcarSelect:
         """
         # all kpoint, all bands, VALUE spin, all the rest
         self.log.debug("selectIspin: ...")
-        self.log.debug("old spd shape =" + str(self.spd.shape))
-        # first, testing if the domensionaluty is rigth:
-        dimen = len(self.spd.shape)
-        if dimen != 5:
-            self.log.error("The array is " + str(dimen) + " dimensional, expecting a"
-                                                          " 5 dimensional array.")
-            self.log.error("You should call selectIspin->selecAtom->selectOrbitals, "
-                           "in this order.")
-            raise RuntimeError('Wrong dimensionality of the array')
         self.log.debug("ispin value = " + str(value))
-        self.spd = self.spd[:, :, value]
-        self.spd = self.spd.sum(axis=2)
-        self.log.info("new spd shape =" + str(self.spd.shape))
+        self._select(value, 5, "Ispin")
         self.log.debug("selectIspin: ...Done")
         return
 
@@ -1110,19 +1456,7 @@ class ProcarSelect:
             value = [x - 1 for x in value]
 
         # all kpoint, all bands, VALUE atoms, all the rest
-        self.log.debug("old shape =" + str(self.spd.shape))
-
-        # testing if the dimensionaluty is rigth:
-        dimen = len(self.spd.shape)
-        if dimen != 4:
-            self.log.error("The array is " + str(dimen) + " dimensional, expecting a"
-                                                          " 4 dimensional array.")
-            self.log.error("You should call selectIspin->selecAtom->selectOrbitals, "
-                           "in this order.")
-            raise RuntimeError('Wrong dimensionality of the array')
-        self.spd = self.spd[:, :, value]
-        self.spd = self.spd.sum(axis=2)
-        self.log.info("new shape =" + str(self.spd.shape))
+        self._select(value, 4, "Atoms")
         self.log.debug("selectAtoms: ...Done")
         return
 
@@ -1151,27 +1485,12 @@ class ProcarSelect:
         # an orbital, therefore the orbital index is an affective 1-based
         # therefore all `value` indexes += 1 (well, negative values do not
         # change )
-        for i in range(len(value)):
-            if value[i] >= 0:
-                value[i] += 1
+        value = [x + 1 if x >= 0 else x for x in value]
 
         self.log.debug("New values (indexes to select) :" + str(value))
 
         # all kpoint, all bands, VALUE orbitals, nothing else?
-        self.spd = self.spd[:, :, value]
-        self.log.debug("old shape =" + str(self.spd.shape))
-
-        # testing if the dimensionaluty is rigth:
-        dimen = len(self.spd.shape)
-        if dimen != 3:
-            self.log.error("The array is " + str(dimen) + " dimensional, expecting a"
-                                                          " 3 dimensional array.")
-            self.log.error("You should call selectIspin->selecAtom->selectOrbitals, "
-                           "in this order.")
-            raise RuntimeError('Wrong dimensionality of the array')
-
-        self.spd = self.spd.sum(axis=2)
-        self.log.info("new shape =" + str(self.spd.shape))
+        self._select(value, 3, "Orbital")
         self.log.debug("selectOrbital: ...Done")
         return
 
@@ -1682,7 +2001,7 @@ def scriptCat(args):
         if args.verbose:
             print("verbosity     : ", args.verbose)
 
-    if args.gz and args.outFile[-3:] is not '.gz':
+    if args.gz and args.outFile[-3:] != '.gz':
         args.outFile += '.gz'
         if args.quiet is False:
             print(".gz extension appended to the outFile")
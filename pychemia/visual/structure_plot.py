@@ -39,13 +39,13 @@ class StructurePlot:
             mlab.plot3d(line2[:, 0], line2[:, 1], line2[:, 2], tube_radius=.02, color=(1, 1, 1))
             mlab.plot3d(line3[:, 0], line3[:, 1], line3[:, 2], tube_radius=.02, color=(1, 1, 1))
         else:
+            symbols = self.structure.symbols
             for i in range(self.structure.natom - 1):
                 for j in range(i + 1, self.structure.natom):
                     vector = self.structure.positions[i] - self.structure.positions[j]
                     mvector = np.linalg.norm(vector)
                     uvector = 1.0 / mvector * vector
-                    if 2 * mvector < covalent_radius(self.structure.symbols[i]) + \
-                            covalent_radius(self.structure.symbols[j]):
+                    if 2 * mvector < covalent_radius(symbols[i]) + covalent_radius(symbols[j]):
                         pair = np.concatenate(
                             (self.structure.positions[i] - 0.1 * uvector,
                              self.structure.positions[j] + 0.1 * uvector)).reshape((-1, 3))
@@ -8,3 +8,17 @@ def test_good():
     from pychemia import pcm_log
     pcm_log.debug('DEBUGGING')
     pass
+
+
+def test_lazy():
+    """
+    Test import pychemia loads the subpackages on first use     :
+    """
+    import os
+    import subprocess
+    import sys
+    code = "import sys, pychemia; assert 'pychemia.code' not in sys.modules; assert 'matplotlib' not in sys.modules; " \
+           "pychemia.code.vasp; assert 'pychemia.code.vasp' in sys.modules; " \
+           "assert 'pychemia.code.abinit' not in sys.modules; assert pychemia.Structure is pychemia.core.Structure"
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    subprocess.check_call([sys.executable, '-c', code], env=env)
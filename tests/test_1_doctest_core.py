@@ -14,6 +14,24 @@ def test_structure():
     assert dt.failed == 0
 
 
+def test_neighbors():
+    """
+    DocTests (pychemia.core.neighbors)                           :
+    """
+    import pychemia.core.neighbors
+    dt = doctest.testmod(pychemia.core.neighbors, verbose=True)
+    assert dt.failed == 0
+
+
+def test_trajectory():
+    """
+    DocTests (pychemia.core.trajectory)                          :
+    """
+    import pychemia.core.trajectory
+    dt = doctest.testmod(pychemia.core.trajectory, verbose=True)
+    assert dt.failed == 0
+
+
 def test_composition():
     """
     DocTests (pychemia.core.composition)                         :
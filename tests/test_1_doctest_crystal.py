@@ -19,3 +19,12 @@ def test_lattice():
     import pychemia.crystal.lattice
     dt = doctest.testmod(pychemia.crystal.lattice, verbose=True, optionflags=doctest.NORMALIZE_WHITESPACE)
     assert dt.failed == 0
+
+
+def test_spacegroup():
+    """
+    DocTests (pychemia.crystal.spacegroup)                       :
+    """
+    import pychemia.crystal.spacegroup
+    dt = doctest.testmod(pychemia.crystal.spacegroup, verbose=True)
+    assert dt.failed == 0
@@ -35,3 +35,82 @@ def test_distances():
     distances = sa.all_distances()
     assert len(distances) == int(st.natom*(st.natom+1)/2)
 
+
+def test_fingerprint_cache():
+    """
+    Test (pychemia.analysis.fingerprint)                        :
+    """
+    import tempfile
+    import numpy as np
+    st = Al2O3()
+    cache = pychemia.analysis.FingerprintCache(tempfile.mkdtemp())
+    sa = pychemia.analysis.StructureAnalysis(st, radius=10)
+    x, fp = sa.fp_oganov(delta=0.1, sigma=0.1, cache=cache)
+    assert len(cache) == 1
+    x2, fp2 = pychemia.analysis.FingerprintCache(cache.path).get(st.copy(), radius=10, delta=0.1, sigma=0.1)
+    assert np.allclose(x, x2)
+    assert list(fp.keys()) == list(fp2.keys())
+    for key in fp:
+        assert np.allclose(fp[key], fp2[key])
+    assert cache.get(st, radius=10, delta=0.1, sigma=0.2) is None
+
+
+def test_match_atoms():
+    """
+    Test (pychemia.analysis.matching) [match_atoms]             :
+    """
+    import numpy as np
+    st = Al2O3().supercell((2, 2, 1))
+    rng = np.random.RandomState(3)
+    permutation = np.arange(st.natom)
+    for specie in st.species:
+        index = np.nonzero(np.array(st.symbols) == specie)[0]
+        permutation[index] = rng.permutation(index)
+    st2 = st.copy()
+    st2.sort_sites_using_list(permutation)
+    st2.set_reduced(st2.reduced + 0.01 * rng.rand(st.natom, 3))
+    sm = pychemia.analysis.StructureMatch(st, st2)
+    sm.match_atoms()
+    assert np.max(np.abs(sm.reduced_displacement())) < 0.0101
+    permutations, distances = pychemia.analysis.match_atoms_many(st, [st, st2])
+    assert permutations[0].tolist() == list(range(st.natom))
+    assert np.array_equal(permutation[permutations[1]], np.arange(st.natom))
+    assert distances[0] < 1E-10 < distances[1]
+
+    cluster = pychemia.Structure(symbols=st.symbols, positions=st.positions, periodicity=False)
+    cluster2 = pychemia.Structure(symbols=st2.symbols, positions=st2.positions, periodicity=False)
+    cm = pychemia.analysis.ClusterMatch(cluster, cluster2)
+    cm.match()
+    displacements = np.linalg.norm(cm.structure1.positions - cm.structure2.positions, axis=1)
+    assert np.max(displacements) < 0.2
+
+
+def test_bonds():
+    """
+    Test (pychemia.analysis.bonds)                              :
+    """
+    import numpy as np
+    st = Al2O3()
+    sa = pychemia.analysis.StructureAnalysis(st)
+    bonds, coordination, distances, tolerances, cutoff = sa.get_bonds_coordination(initial_cutoff_radius=0.5)
+    assert abs(cutoff - 1.07) < 1E-10
+    assert coordination == [len(x) for x in bonds]
+    network = pychemia.analysis.BondNetwork.from_structure(st, radius=10.0)
+    assert network.is_connected(cutoff)
+    assert not network.is_connected(network.connectivity_tolerance() - 1E-6)
+    assert np.array_equal(network.coordination(cutoff), coordination)
+    # The hardness is the same for a supercell, the product of many bonds does not underflow
+    hardness, cutoff, coordination = sa.hardness(verbose=False)
+    sa = pychemia.analysis.StructureAnalysis(st, supercell=(2, 2, 2))
+    assert sa.hardness(verbose=False)[0] == hardness == 20.458
+
+
+def test_hardness_without_bonds():
+    """
+    Test (pychemia.analysis.hardness) [no bonds]                :
+    """
+    import pytest
+    st = pychemia.Structure(symbols=['C', 'C'], cell=20.0, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+    sa = pychemia.analysis.StructureAnalysis(st)
+    with pytest.raises(ValueError):
+        sa.hardness(verbose=False, use_laplacian=False)
@@ -0,0 +1,54 @@
+import doctest
+import numpy as np
+import pychemia
+from pychemia.code.lennardjones import LennardJones, lj_energy_gradient, lj_relax_batch
+
+
+def test_lj_utils():
+    """
+    DocTests (pychemia.code.lennardjones.lj_utils)              :
+    """
+    import pychemia.code.lennardjones.lj_utils
+    dt = doctest.testmod(pychemia.code.lennardjones.lj_utils, verbose=True)
+    assert dt.failed == 0
+
+
+def test_lennardjones():
+    """
+    Test (pychemia.code.lennardjones) [LJ13 minimization]       :
+    """
+    # Icosahedron plus central atom, the global minimum for 13 atoms
+    phi = 0.5 * (1 + np.sqrt(5))
+    vertices = [[0, x, y * phi] for x in [-1, 1] for y in [-1, 1]]
+    vertices += [[x, y * phi, 0] for x in [-1, 1] for y in [-1, 1]]
+    vertices += [[x * phi, 0, y] for x in [-1, 1] for y in [-1, 1]]
+    positions = np.concatenate(([[0, 0, 0]], 0.55 * np.array(vertices)))
+    structure = pychemia.Structure(symbols=13 * ['Ar'], positions=positions, periodicity=False)
+    lj = LennardJones(structure)
+    relax = lj.local_minimization(gtol=1E-4)
+    assert abs(relax.fun - (-44.326801)) < 1E-4
+
+    energy, gradient = lj_energy_gradient(relax.x, lj.sigmas, lj.epsilons, cutoff=10.0)
+    assert abs(energy - relax.fun) < 1E-3
+    assert np.allclose(gradient, relax.jac, atol=1E-3)
+
+
+def test_lj_relax_batch():
+    """
+    Test (pychemia.code.lennardjones) [batch FIRE relaxation]   :
+    """
+    np.random.seed(0)
+    structures = [pychemia.Structure.random_cluster(composition={'Ar': n}) for n in [3, 4, 6, 6]]
+    potentials = [LennardJones(x) for x in structures]
+    positions, gradients, energies, maxforces = lj_relax_batch([x.positions for x in structures],
+                                                               [x.sigmas for x in potentials],
+                                                               [x.epsilons for x in potentials], gtol=1E-5)
+    assert np.all(maxforces < 1E-5)
+    # Global minima for 3 and 4 atoms, LJ6 has two minima (octahedron and trigonal prism)
+    assert np.allclose(energies[:2], [-3.0, -6.0], atol=1E-6)
+    assert np.all(energies[2:] < -12.30)
+    for k in range(len(structures)):
+        assert positions[k].shape == (structures[k].natom, 3)
+        energy, gradient = lj_energy_gradient(positions[k], potentials[k].sigmas, potentials[k].epsilons)
+        assert abs(energy - energies[k]) < 1E-8
+        assert np.allclose(gradient, gradients[k].flatten())
@@ -75,6 +75,70 @@ class MyTestCase(unittest.TestCase):
         print(vo)
         self.assertTrue(vo.has_forces_stress_energy())
 
+    def test_vasprun(self):
+        """
+        Test (pychemia.code.vasp) [streaming vasprun.xml]           :
+        """
+        import numpy as np
+        filename = 'tests/data/vasp_09/vasprun.xml'
+        vx = pychemia.code.vasp.VaspXML(filename)
+        header = {}
+        steps = list(pychemia.code.vasp.iter_vasprun(filename, sections=['structure', 'forces'], header=header))
+        self.assertEqual(len(steps), len(vx.data['structures']))
+        self.assertEqual(header['atom_info']['natom'], 12)
+        self.assertTrue('final_structure' in header)
+        self.assertEqual(steps[-1]['forces'], vx.forces[-1])
+        self.assertTrue(all(['dos' not in x['general'] and x['scsteps'] == [] for x in steps]))
+
+        streamed = pychemia.code.vasp.VaspXML(filename, streaming=True)
+        self.assertEqual(streamed.energies, vx.energies)
+        self.assertEqual(streamed.forces, vx.forces)
+        self.assertEqual(streamed.convergence_ionic, vx.convergence_ionic)
+        self.assertEqual(streamed.vasp_parameters, vx.vasp_parameters)
+        self.assertTrue(np.allclose(streamed.trajectory.positions, vx.trajectory.positions))
+        self.assertTrue(np.allclose(streamed.trajectory.energies, vx.trajectory.energies))
+        self.assertTrue(np.allclose(streamed.final_structure.positions, vx.final_structure.positions))
+        self.assertTrue(streamed._data is None)
+
+    def test_outcar_reader(self):
+        """
+        Test (pychemia.code.vasp) [incremental OUTCAR]              :
+        """
+        import numpy as np
+        vo = pychemia.code.vasp.VaspOutput('tests/data/vasp_04/OUTCAR')
+        with open('tests/data/vasp_04/OUTCAR', 'rb') as rf:
+            data = rf.read()
+        tmpdir = tempfile.mkdtemp()
+        filename = tmpdir + os.sep + 'OUTCAR'
+        reader = pychemia.code.vasp.OutcarReader(filename)
+        self.assertEqual(reader.nsteps, 0)
+
+        # The job is running, the last ionic step is incomplete
+        with open(filename, 'wb') as wf:
+            wf.write(data[:len(data) // 2])
+        self.assertTrue(0 < reader.update() < len(vo.forces))
+        nsteps = reader.nsteps
+        offset = reader.offset
+        self.assertFalse(reader.finished)
+        with open(filename, 'ab') as wf:
+            wf.write(data[len(data) // 2:])
+        self.assertEqual(reader.update(), len(vo.forces) - nsteps)
+        self.assertTrue(reader.offset > offset)
+        self.assertTrue(reader.finished)
+        self.assertTrue(np.allclose(reader.forces, vo.forces))
+        self.assertTrue(np.allclose(reader.positions, vo.positions))
+        self.assertTrue(np.allclose(reader.stress, vo.stress))
+        self.assertEqual(reader.energies, vo.energies)
+        self.assertEqual(reader.update(), 0)
+
+        # A new run replaces the file
+        os.rename(filename, filename + '.1')
+        with open(filename, 'wb') as wf:
+            wf.write(data[:len(data) // 2])
+        reader.update()
+        self.assertEqual(reader.nsteps, nsteps)
+        shutil.rmtree(tmpdir)
+
     def test_poscar(self):
         """
         Test (pychemia.code.vasp) [poscar]                          :
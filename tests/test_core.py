@@ -44,6 +44,134 @@ class TestCore(unittest.TestCase):
         spc = fcc.supercell((3, 3, 3))
         self.assertEqual(spc.natom, 27)
 
+    def test_structure_lazy(self):
+        """
+        Test (pychemia.core.structure) [lazy coordinates]           :
+        """
+        st = pychemia.Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]])
+        self.assertEqual(st.numbers.tolist(), [11, 17])
+        self.assertTrue(np.allclose(st.positions, [[0, 0, 0], [2.82, 2.82, 2.82]]))
+        self.assertTrue(abs(st.volume - 5.64 ** 3) < 1E-8)
+        # Reduced coordinates are kept when the cell changes, cached properties are recomputed
+        st.set_cell(6.0)
+        self.assertTrue(np.allclose(st.reduced, [[0, 0, 0], [0.5, 0.5, 0.5]]))
+        self.assertTrue(abs(st.volume - 216.0) < 1E-8)
+        st.reduced2positions()
+        self.assertTrue(np.allclose(st.positions[1], [3.0, 3.0, 3.0]))
+        # Changing the positions invalidates the reduced coordinates
+        st.positions = np.array([[0, 0, 0], [1.5, 1.5, 1.5]])
+        self.assertTrue(np.allclose(st.reduced[1], [0.25, 0.25, 0.25]))
+        # The list of symbols returned is a copy, the cached formula follows the assignments
+        st.symbols[0] = 'K'
+        self.assertEqual(st.symbols, ['Na', 'Cl'])
+        self.assertEqual(st.formula, 'ClNa')
+        st.symbols = ['K', 'Cl']
+        self.assertEqual(st.formula, 'ClK')
+        st.del_atom(0)
+        self.assertEqual(st.symbols, ['Cl'])
+        self.assertEqual(len(st.reduced), 1)
+
+    def test_structure_copy(self):
+        """
+        Test (pychemia.core.structure) [copy-on-write]              :
+        """
+        st = pychemia.Structure(symbols=['H', 'O', 'H'], positions=[[1, 0, 0], [0, 0, 0], [0, 1.5, 0]],
+                                periodicity=False)
+        positions = st.positions
+        copy = st.copy()
+        self.assertTrue(np.shares_memory(st.positions, copy.positions))
+        self.assertRaises(ValueError, positions.__setitem__, (1, 0), 99.0)
+        self.assertRaises(ValueError, copy.positions.__setitem__, 0, [0, 0, 1])
+        copy.sort_sites()
+        copy.add_atom('He', [5, 5, 5])
+        self.assertFalse(np.shares_memory(st.positions, copy.positions))
+        self.assertEqual(st.symbols, ['H', 'O', 'H'])
+        self.assertEqual(copy.symbols, ['H', 'H', 'O', 'He'])
+        self.assertTrue(np.allclose(st.positions, [[1, 0, 0], [0, 0, 0], [0, 1.5, 0]]))
+        st.relocate_to_cm()
+        self.assertTrue(np.allclose(copy.positions[2], [0, 0, 0]))
+
+    def test_supercell(self):
+        """
+        Test (pychemia.core.structure) [supercell matrix]           :
+        """
+        st = pychemia.Structure(symbols=['Na', 'Cl'], cell=5.64, reduced=[[0, 0, 0], [0.5, 0.5, 0.5]],
+                                mag_moments=[[0, 0, 1], [0, 0, -1]])
+        spc = st.supercell((2, 3, 1))
+        self.assertEqual(spc.symbols, 6 * ['Na', 'Cl'])
+        self.assertTrue(np.allclose(spc.positions[3], st.positions[1] + st.cell[1]))
+        self.assertEqual(spc.vector_info['mag_moments'].shape, (12, 3))
+        spc = st.supercell([[1, 1, 0], [-1, 1, 0], [0, 0, 2]])
+        self.assertEqual(spc.natom, 8)
+        self.assertAlmostEqual(spc.volume, 4 * st.volume)
+        self.assertTrue(np.all((spc.reduced >= 0) & (spc.reduced < 1)))
+        distances = spc.distance_matrix() + 100 * np.eye(8)
+        self.assertAlmostEqual(np.min(distances), 0.5 * np.sqrt(3) * 5.64)
+        self.assertEqual(spc.vector_info['mag_moments'][:, 2].tolist(), 4 * [1.0, -1.0])
+
+    def test_random_structures(self):
+        """
+        Test (pychemia.core.structure) [random structures]          :
+        """
+        from pychemia.core.structure import random_structures
+        from pychemia.utils.periodic import covalent_radius
+        for method in ['stretching', 'scaling']:
+            sts = list(random_structures('Li2Al2Cl8', 5, method=method, seed=7, batch_size=4))
+            self.assertEqual(len(sts), 5)
+            for st in sts:
+                radii = np.array(covalent_radius(st.symbols))
+                ret = st.lattice.pair_distances(st.reduced, radius=2 * np.max(radii))
+                different = ret['i'] != ret['j']
+                covalent = radii[ret['i']] + radii[ret['j']]
+                self.assertTrue(np.all(ret['distance'][different] >= covalent[different]))
+        # The same seed gives the same structures with any number of processes
+        sts2 = list(random_structures('Li2Al2Cl8', 5, method='scaling', seed=7, batch_size=4, nproc=3))
+        self.assertTrue(all([x == y for x, y in zip(sts, sts2)]))
+        sts = list(random_structures('Li2Al2Cl8', 10, max_volume=1.0, max_trials=20))
+        self.assertEqual(len(sts), 0)
+        sts = list(random_structures('H2O', 3, periodic=False, seed=0))
+        self.assertTrue(all([not x.is_periodic for x in sts]))
+
+    def test_trajectory(self):
+        """
+        Test (pychemia.core.trajectory)                             :
+        """
+        import tempfile
+        from pychemia.code.vasp import VaspXML
+        traj = VaspXML('tests/data/vasp_09/vasprun.xml').trajectory
+        self.assertEqual(traj.positions.shape, (traj.nframes, 12, 3))
+        self.assertEqual(traj.forces.shape, traj.positions.shape)
+        path = tempfile.mkdtemp() + '/trajectory'
+        traj[::2].save(path)
+        loaded = pychemia.core.Trajectory.load(path)
+        self.assertTrue(isinstance(loaded.positions, np.memmap))
+        self.assertEqual(len(loaded), (traj.nframes + 1) // 2)
+        self.assertTrue(loaded[1] == traj[2])
+        loaded.append(traj[-1], energy=traj.energies[-1], forces=traj.forces[-1])
+        self.assertEqual(len(loaded), (traj.nframes + 3) // 2)
+        self.assertTrue(np.allclose(loaded.cells[-1], traj.cells[-1]))
+
+    @unittest.skipIf(not pychemia.HAS_H5PY, 'h5py is not installed')
+    def test_trajectory_hdf5(self):
+        """
+        Test (pychemia.core.trajectory) [HDF5 files]                :
+        """
+        import tempfile
+        from pychemia.code.vasp import VaspXML
+        traj = VaspXML('tests/data/vasp_09/vasprun.xml').trajectory
+        path = tempfile.mkdtemp() + '/trajectory.h5'
+        traj.save(path)
+        loaded = pychemia.core.Trajectory.load(path, mmap_mode=None)
+        self.assertTrue(isinstance(loaded.positions, np.ndarray))
+        self.assertTrue(np.allclose(loaded.forces - traj.forces, 0))
+        with pychemia.core.Trajectory.load(path) as lazy:
+            self.assertEqual(len(lazy), traj.nframes)
+            self.assertTrue(lazy[-1] == traj[-1])
+            self.assertTrue(np.allclose(np.asarray(lazy.energies), traj.energies))
+        self.assertIsNone(lazy._h5file)
+        # The file can be written again once closed
+        loaded.save(path)
+
     def test_from_file_1(self):
         """
         Test (pychemia.core.from_file)                              :
@@ -67,3 +195,34 @@ class TestCore(unittest.TestCase):
         filename = 'tests/data/abinit_05/structure.json'
         st = pychemia.structure_from_file(filename)
         self.assertEqual(st.nsites, 20)
+
+    def test_neighbor_list(self):
+        """
+        Test (pychemia.core.neighbors)                              :
+        """
+        from .samples import Al2O3
+        st = Al2O3()
+        cutoff = 4.0
+        nl = pychemia.core.NeighborList(st, cutoff=cutoff, skin=0.5)
+        ret = st.lattice.pair_distances(st.reduced, radius=cutoff)
+        nonzero = ret['distance'] > 0
+        # Brute force pairs are counted once, the neighbor list stores both directions
+        self.assertEqual(nl.npairs, 2 * np.sum(nonzero) - np.sum(ret['i'][nonzero] == ret['j'][nonzero]))
+        i, j, images, distances = nl.pairs()
+        self.assertTrue(np.all(distances <= cutoff))
+        self.assertAlmostEqual(np.min(distances), np.min(ret['distance'][nonzero]))
+
+        positions = st.positions.copy()
+        positions[0] += [0.1, 0.0, 0.0]
+        positions[5] += [0.0, 0.5, 0.3]
+        self.assertEqual(nl.update(positions), 1)
+        st2 = pychemia.Structure(symbols=st.symbols, cell=st.cell, positions=positions)
+        nl2 = pychemia.core.NeighborList(st2, cutoff=cutoff)
+        self.assertEqual(nl.npairs, nl2.npairs)
+        self.assertTrue(np.allclose(np.sort(nl.pairs()[3]), np.sort(nl2.pairs()[3])))
+        self.assertTrue(np.array_equal(nl.coordination(species=('Al', 'O')), nl2.coordination(species=('Al', 'O'))))
+
+        cluster = pychemia.Structure(symbols=st.symbols, positions=st.positions, periodicity=False)
+        nl = pychemia.core.NeighborList(cluster, cutoff=cutoff)
+        dm = cluster.distance_matrix()
+        self.assertEqual(nl.npairs, np.sum((dm > 0) & (dm <= cutoff)))
@@ -19,3 +19,21 @@ class CrystalSymmetryTest(unittest.TestCase):
         assert cs.crystal_system() == u'Trigonal'
         ss = cs.symmetrize()
         assert np.abs(st.volume - ss.volume) < 1E-6
+
+    def test_random_symmetric(self):
+        """
+        Test (pychemia.crystal.spacegroup) [random structures]      :
+        """
+        from pychemia.core.structure import random_structures
+        sg = pychemia.crystal.SpaceGroup(194)
+        self.assertEqual(sg.multiplicities, [2, 4, 6, 12, 24])
+        for number in [14, 136, 139, 166, 194]:
+            sg = pychemia.crystal.SpaceGroup(number)
+            sts = list(random_structures('Ti2O4', 2, method='symmetry', spacegroups=number, seed=number))
+            self.assertEqual(len(sts), 2)
+            for st in sts:
+                self.assertEqual(st.natom, 6)
+                # Accidental higher symmetry is possible, lower symmetry is not
+                found = pychemia.crystal.SpaceGroup(pychemia.crystal.CrystalSymmetry(st).number(symprec=1E-3))
+                self.assertGreaterEqual(found.nops // found.ncentering, sg.nops // sg.ncentering)
+        self.assertRaises(ValueError, next, random_structures('Ti2O4', method='symmetry', spacegroups=225))
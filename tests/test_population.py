@@ -31,6 +31,17 @@ class PopulationTest(unittest.TestCase):
         popu.add_random()
         popu.add_random()
         popu.pcdb.clean()
+        # The options for random structures are restored from the population info
+        popu = RelaxStructures('test', 'NaCl', random_method='symmetry', spacegroups=[225])
+        info = popu.to_dict
+        restored = popu.from_dict(info)
+        self.assertEqual(restored.random_method, 'symmetry')
+        self.assertEqual(restored.spacegroups, [225])
+        del info['random_method'], info['spacegroups']
+        restored = popu.from_dict(info)
+        self.assertEqual(restored.random_method, 'stretching')
+        self.assertIsNone(restored.spacegroups)
+        popu.pcdb.clean()
 
     def test_noncoll(self):
         """
@@ -65,6 +76,47 @@ class PopulationTest(unittest.TestCase):
         popu.add_random()
         popu.add_random()
 
+    def test_distance_matrix(self):
+        """
+        Test (pychemia.population.Population.distance_matrix)       :
+        """
+        import numpy as np
+        from pychemia.population._distances import fingerprints_distance_matrix
+        popu = RealFunction(funx2, 2, [-1, 1])
+        ids = [popu.add_random()[0] for i in range(6)]
+        dm = popu.distance_matrix(ids)
+        self.assertTrue(np.allclose(dm, dm.T))
+        self.assertTrue(np.all(np.diag(dm) == 0))
+        self.assertAlmostEqual(dm[1, 4], popu.distance(ids[1], ids[4]))
+        self.assertTrue(np.allclose(popu.distance_matrix(ids, nproc=2), dm))
+        rng = np.random.RandomState(0)
+        fps = [{'_id': i, '011011': rng.rand(10), '011017': rng.rand(10)} for i in range(5)]
+        dm = fingerprints_distance_matrix(fps)
+        uvects = [np.array(fp['011017']) / np.linalg.norm(fp['011017']) for fp in fps]
+        uvects2 = [np.array(fp['011011']) / np.linalg.norm(fp['011011']) for fp in fps]
+        expected = 0.25 * (2 - np.dot(uvects[0], uvects[3]) - np.dot(uvects2[0], uvects2[3]))
+        self.assertAlmostEqual(dm[0, 3], expected)
+
+    def test_duplicates_index(self):
+        """
+        Test (pychemia.population.DuplicatesIndex)                  :
+        """
+        import numpy as np
+        from pychemia.population._distances import DuplicatesIndex
+        rng = np.random.RandomState(0)
+        vectors = rng.rand(300, 4)
+        values = np.sort(rng.rand(300))
+        groups = rng.randint(0, 3, 300)
+        dist = np.linalg.norm(vectors[:, None] - vectors[None, :], axis=2)
+        close = (dist < 0.2) & (np.abs(values[:, None] - values[None, :]) < 0.1)
+        close &= groups[:, None] == groups[None, :]
+        expected = [(i, j) for i, j in zip(*np.nonzero(np.triu(close, 1)))]
+        index = DuplicatesIndex(vectors, values=values, value_tol=0.1, groups=groups, block_size=16)
+        self.assertEqual([(int(i), int(j)) for i, j in index.pairs(0.2)], expected)
+        index = DuplicatesIndex(vectors)
+        expected = [(i, j) for i, j in zip(*np.nonzero(np.triu(dist < 0.2, 1)))]
+        self.assertEqual([(int(i), int(j)) for i, j in index.pairs(0.2)], expected)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -4,7 +4,7 @@ import unittest
 import numpy as np
 import logging
 from pychemia import pcm_log
-from pychemia.searcher import FireFly, HarmonySearch, ParticleSwarm, GeneticAlgorithm
+from pychemia.searcher import FireFly, HarmonySearch, ParticleSwarm, GeneticAlgorithm, QueueEvents
 from pychemia.population import RealFunction
 from pychemia.utils.metaheuristics import Sphere
 
@@ -70,3 +70,66 @@ class SearcherTest(unittest.TestCase):
         searcher = GeneticAlgorithm(popu, generation_size=16, stabilization_limit=5)
         searcher.run()
         assert np.linalg.norm(np.array(searcher.population.db[searcher.population.best_candidate]['x']) - mini) < 0.2
+
+    def test_steady_state(self):
+        """
+        Test (pychemia.searcher.Searcher.run_steady_state)          :
+        """
+        pcm_log.debug('Steady state')
+        mini = Sphere().minimum(3)
+        for searcher_class in [HarmonySearch, ParticleSwarm, GeneticAlgorithm, FireFly]:
+            popu = RealFunction(Sphere.function, 3, [-1, 1], local_minimization=False)
+            searcher = searcher_class(popu, generation_size=16, stabilization_limit=5)
+            searcher.run_steady_state(max_evaluations=2000)
+            assert len(searcher.survivors) <= 16
+            assert all([x in popu.actives for x in searcher.survivors])
+            assert np.linalg.norm(np.array(popu.db[popu.best_candidate]['x']) - mini) < 0.2
+
+    def test_events(self):
+        """
+        Test (pychemia.searcher.QueueEvents)                        :
+        """
+        import threading
+        import time
+        popu = RealFunction(Sphere.function, 3, [-1, 1])
+        pending = [popu.add_random()[0] for i in range(3)]
+        for entry_id in pending:
+            popu.db[entry_id]['fx'] = None
+        searcher = GeneticAlgorithm(popu, generation_size=16)
+        searcher.sleep_time = 60
+        searcher.events = QueueEvents()
+
+        def evaluator():
+            for ident in pending:
+                time.sleep(0.05)
+                popu.evaluate_entry(ident)
+                searcher.events.notify(ident)
+
+        start = time.time()
+        thread = threading.Thread(target=evaluator)
+        thread.start()
+        assert len(searcher.wait_evaluations(pending, number=1)) >= 1
+        assert sorted(searcher.wait_evaluations(pending)) == sorted(pending)
+        thread.join()
+        assert time.time() - start < 30
+
+        # A candidate disabled while waiting is not waited anymore
+        pending = [popu.add_random()[0] for i in range(3)]
+        for entry_id in pending:
+            popu.db[entry_id]['fx'] = None
+
+        def evaluator_disable():
+            time.sleep(0.05)
+            popu.evaluate_entry(pending[0])
+            searcher.events.notify(pending[0])
+            time.sleep(0.05)
+            popu.disable(pending[1])
+            popu.disable(pending[2])
+            searcher.events.notify(pending[1])
+
+        start = time.time()
+        thread = threading.Thread(target=evaluator_disable)
+        thread.start()
+        assert searcher.wait_evaluations() == [pending[0]]
+        thread.join()
+        assert time.time() - start < 30
@@ -0,0 +1,151 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from pychemia.visual.procar import ProcarParser, ProcarSelect, ProcarFileFilter, UtilsProcar
+
+
+class TestProcar(unittest.TestCase):
+
+    def test_procar_parser(self):
+        """
+        Test (pychemia.visual.procar) [PROCAR parser and cache]     :
+        """
+        tmpdir = tempfile.mkdtemp()
+        filename = os.path.join(tmpdir, 'PROCAR')
+        shutil.copy('tests/data/vasp_06/PROCAR', filename)
+
+        # Spin-polarized PROCAR, the bands of both spins are joined
+        procar = ProcarParser()
+        procar.readFile(filename)
+        self.assertEqual(procar.ispin, 2)
+        self.assertEqual(procar.kpoints.shape, (120, 3))
+        self.assertEqual(procar.bands.shape, (120, 32))
+        self.assertEqual(procar.spd.shape, (120, 32, 2, 5, 11))
+        self.assertTrue(np.allclose(procar.spd[:, :16, 0], procar.spd[:, :16, 1]))
+        self.assertTrue(np.allclose(procar.spd[:, 16:, 0], -procar.spd[:, 16:, 1]))
+        self.assertTrue(os.path.isfile(filename + '.npz'))
+
+        # Second reading comes from the cache
+        cached = ProcarParser()
+        cached.readFile(tmpdir, recLattice=2 * np.eye(3), mmap_mode='r')
+        self.assertTrue(isinstance(cached.spd, np.memmap))
+        self.assertTrue(np.array_equal(cached.spd, procar.spd))
+        self.assertTrue(np.array_equal(cached.bands, procar.bands))
+        self.assertTrue(np.allclose(cached.kpoints, 2 * procar.kpoints))
+        self.assertEqual(cached.orbitalNames, procar.orbitalNames)
+        self.assertEqual(cached.bandsCount, 32)
+
+        # A modified PROCAR is parsed again, also when compressed
+        os.remove(filename)
+        with open('tests/data/vasp_06/PROCAR', 'rb') as rf:
+            with gzip.open(filename + '.gz', 'wb') as wf:
+                wf.write(rf.read())
+        compressed = ProcarParser()
+        compressed.readFile(tmpdir, cache=False)
+        self.assertTrue(np.array_equal(compressed.spd, procar.spd))
+        self.assertFalse(os.path.isfile(filename + '.gz.npz'))
+        shutil.rmtree(tmpdir)
+
+    def test_procar_select(self):
+        """
+        Test (pychemia.visual.procar) [lazy selection of PROCAR]    :
+        """
+        tmpdir = tempfile.mkdtemp()
+        shutil.copy('tests/data/vasp_06/PROCAR', tmpdir)
+        ProcarParser().readFile(tmpdir)
+        procar = ProcarParser()
+        procar.readFile(tmpdir, mmap_mode='r')
+        spd = np.array(procar.spd)
+
+        select = ProcarSelect(procar)
+        # Small chunks to reduce the k-points in several steps
+        select.chunkBytes = 10000
+        select.selectIspin([1])
+        select.selectAtoms([1, 2], fortran=True)
+        orbitals = [1, 2, 3, -1]
+        select.selectOrbital(orbitals)
+        self.assertEqual(orbitals, [1, 2, 3, -1])
+        expected = spd[:, :, [1]].sum(axis=2)[:, :, [0, 1]].sum(axis=2)[:, :, [2, 3, 4, -1]].sum(axis=2)
+        self.assertEqual(select.spd.shape, (120, 32))
+        self.assertTrue(np.allclose(select.spd, expected))
+        self.assertTrue(np.array_equal(procar.spd, spd))
+
+        # The selections are checked in order and can be evaluated at any step
+        select = ProcarSelect(procar)
+        self.assertRaises(RuntimeError, select.selectAtoms, [0])
+        select.selectIspin([0, 0])
+        self.assertTrue(np.allclose(select.spd, 2 * spd[:, :, 0]))
+        select.selectAtoms([-1])
+        self.assertRaises(RuntimeError, select.selectIspin, [0])
+        select.selectOrbital([-1])
+        self.assertTrue(np.allclose(select.spd, 2 * spd[:, :, 0, -1, -1]))
+        shutil.rmtree(tmpdir)
+
+    def test_procar_filter(self):
+        """
+        Test (pychemia.visual.procar) [PROCAR filter and merge]     :
+        """
+        tmpdir = tempfile.mkdtemp()
+        procar = ProcarParser()
+        procar.readFile('tests/data/vasp_06/PROCAR', cache=False)
+
+        # Pieces of a few k-points processed on a pool, gzipped output with cache
+        filename = os.path.join(tmpdir, 'PROCAR-atoms.gz')
+        serial = ProcarFileFilter('tests/data/vasp_06/PROCAR', os.path.join(tmpdir, 'PROCAR-atoms'))
+        serial.FilterAtoms([[0, 1], [2, 3]])
+        parallel = ProcarFileFilter('tests/data/vasp_06/PROCAR', filename, nproc=2, cache=True)
+        parallel.chunkSize = 5000
+        parallel.FilterAtoms([[0, 1], [2, 3]])
+        with open(os.path.join(tmpdir, 'PROCAR-atoms')) as rf:
+            with gzip.open(filename, 'rt') as gf:
+                self.assertEqual(rf.read(), gf.read())
+        self.assertTrue(os.path.isfile(filename + '.npz'))
+        atoms = ProcarParser()
+        atoms.readFile(filename)
+        self.assertEqual(atoms.spd.shape, (120, 32, 2, 3, 11))
+        self.assertTrue(np.allclose(atoms.spd[:, :, :, 1, 1:], procar.spd[:, :, :, [2, 3], 1:].sum(axis=3)))
+
+        # The k-points of the second file are renumbered, using only the first spin of the PROCAR
+        with open('tests/data/vasp_06/PROCAR') as rf:
+            text = rf.read()
+        with open(os.path.join(tmpdir, 'PROCAR-up'), 'w') as wf:
+            wf.write(text[:text.index('# of k-points', 100)])
+        utils = UtilsProcar()
+        utils.chunkSize = 5000
+        filename = os.path.join(tmpdir, 'PROCAR-merged')
+        utils.MergeFiles([tmpdir + '/PROCAR-up', tmpdir + '/PROCAR-up'], filename, nproc=2, cache=True)
+        with open(filename) as rf:
+            lines = [x.split() for x in rf if x.startswith(' k-point ')]
+        self.assertEqual([int(x[1]) for x in lines], list(range(1, 241)))
+        merged = ProcarParser()
+        merged.readFile(filename)
+        self.assertEqual(merged.kpointsCount, 240)
+        self.assertTrue(np.array_equal(merged.spd[120:], merged.spd[:120]))
+        self.assertTrue(np.array_equal(merged.spd[:120, :, 0], procar.spd[:, :16, 0]))
+        shutil.rmtree(tmpdir)
+
+    def test_procar_filter_errors(self):
+        """
+        Test (pychemia.visual.procar) [PROCAR filter malformed]     :
+        """
+        tmpdir = tempfile.mkdtemp()
+        with open('tests/data/vasp_06/PROCAR') as rf:
+            lines = rf.readlines()
+        # One corrupted value far from the beginning of the file
+        index = [i for i, x in enumerate(lines) if x.startswith('  2 ')][500]
+        lines[index] = lines[index].replace('0.', 'x.', 1)
+        filename = os.path.join(tmpdir, 'PROCAR')
+        with open(filename, 'w') as wf:
+            wf.writelines(lines)
+        for nproc in [1, 2]:
+            for cache in [False, True]:
+                procar_filter = ProcarFileFilter(filename, filename + '-orbitals', nproc=nproc, cache=cache)
+                procar_filter.chunkSize = 5000
+                self.assertRaises(ValueError, procar_filter.FilterOrbitals, [[0], [1, 2, 3]], ['s', 'p'])
+                self.assertFalse(os.path.isfile(filename + '-orbitals.npz'))
+        shutil.rmtree(tmpdir)